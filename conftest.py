@@ -41,11 +41,21 @@ def make_authed_client(mock_tapis_auth, mock_tapis_token):
 
 @pytest.fixture(autouse=True)
 def isolated_cache_dir(tmp_path, monkeypatch):
-    """Use a temporary cache directory for each test."""
+    """Use temporary cache directories for each test."""
     test_cache = tmp_path / "cache_images"
     test_cache.mkdir()
     monkeypatch.setattr("imageinf.utils.config.CACHE_DIR", str(test_cache))
     monkeypatch.setattr("imageinf.utils.io.CACHE_DIR", str(test_cache))
+    test_embeddings = tmp_path / "cache_embeddings"
+    monkeypatch.setattr(
+        "imageinf.inference.embeddings.EMBEDDINGS_DIR", str(test_embeddings)
+    )
+    monkeypatch.setattr(
+        "imageinf.inference.pixel_cache.PIXEL_CACHE_DIR", str(tmp_path / "pixels")
+    )
+    monkeypatch.setattr(
+        "imageinf.inference.result_store.RESULT_DB_PATH", str(tmp_path / "results.db")
+    )
     yield test_cache
     # Cleanup happens automatically via tmp_path - nothing needed here
 
@@ -59,6 +69,9 @@ def mock_celery_task(monkeypatch):
         def __init__(self, result):
             self.result = result
 
+        def ready(self):
+            return True
+
         def get(self, timeout=None):
             return self.result
 
@@ -67,7 +80,16 @@ def mock_celery_task(monkeypatch):
         result = tasks.run_inference_task(*args, **kwargs)
         return FakeAsyncResult(result)
 
+    def fake_apply_async(task):
+        def _apply_async(args=(), kwargs=None, task_id=None, **options):
+            # Run eagerly so the task sees its own id (self.request.id)
+            return task.apply(args=args, kwargs=kwargs, task_id=task_id)
+
+        return _apply_async
+
     monkeypatch.setattr(tasks.run_inference_task, "delay", fake_delay)
+    for task in (tasks.run_inference_task, tasks.extract_metadata_task):
+        monkeypatch.setattr(task, "apply_async", fake_apply_async(task))
 
 
 @pytest.fixture
@@ -88,3 +110,26 @@ def mock_vit(monkeypatch):
     monkeypatch.setattr(
         processor, "MODEL_REGISTRY", {"google/vit-base-patch16-224": FakeViT}
     )
+
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """Checkpoints of the tiny test models, built once per session."""
+    return str(tmp_path_factory.mktemp("tiny_models"))
+
+
+@pytest.fixture
+def tiny_models(tiny_model_dir, monkeypatch):
+    """Serve the tiny random-weight test models (imageinf.inference.tiny_models)."""
+    from imageinf.inference import processor, tiny_models
+    from imageinf.inference.manifest import MODEL_MANIFEST, TINY_MODEL_MANIFEST
+    from imageinf.inference.registry import MODEL_METADATA, model_metadata
+
+    monkeypatch.setattr(tiny_models, "TINY_MODEL_DIR", tiny_model_dir)
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+    for model_name, entry in TINY_MODEL_MANIFEST.items():
+        monkeypatch.setitem(MODEL_MANIFEST, model_name, entry)
+        monkeypatch.setitem(
+            MODEL_METADATA, model_name, model_metadata(model_name, entry)
+        )
+    return list(TINY_MODEL_MANIFEST)
@@ -1,6 +1,14 @@
 import os
 
 from celery import Celery
+from kombu import Queue
+from celery.signals import worker_init, worker_process_init
+
+# Priority lanes: sync requests and similarity queries go to the interactive
+# queue, async jobs to the bulk queue. Run at least one worker consuming only
+# the interactive queue so it never waits behind a bulk backlog.
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
 
 celery = Celery(
     "imageinf",
@@ -9,6 +17,8 @@ celery = Celery(
     include=["imageinf.inference.tasks"],
 )
 
+# Large results can be stored compactly via RESULT_ENCODING=compact
+# (see imageinf.inference.compact); they are still JSON documents to Celery.
 celery.conf.update(
     task_serializer="json",
     result_serializer="json",
@@ -16,4 +26,26 @@ celery.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5 min hard limit
     task_soft_time_limit=240,  # 4 min soft limit, raises SoftTimeLimitExceeded
+    task_queues=(Queue(INTERACTIVE_QUEUE), Queue(BULK_QUEUE)),
+    task_default_queue=BULK_QUEUE,
+    task_routes={"imageinf.inference.tasks.embed_query_task": INTERACTIVE_QUEUE},
+    # Reserve one task at a time and acknowledge it when done, so a worker
+    # busy with bulk work does not hold queued tasks other workers could run
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
 )
+
+
+# Imported lazily so the API process (which only enqueues tasks) never loads torch
+@worker_init.connect
+def preload_shared_models(**kwargs):
+    from imageinf.inference.shared_weights import preload_models_for_fork
+
+    preload_models_for_fork()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    from imageinf.inference.shared_weights import init_forked_child
+
+    init_forked_child()
@@ -39,7 +39,16 @@ def mock_tapis_files_factory(monkeypatch):
     def _create_mock(photo_file):
         mock_client = MagicMock()
         mock_files = MagicMock()
-        mock_files.getContents.side_effect = lambda systemId, path: photo_file
+
+        def _get_contents(systemId, path, _tapis_headers=None):
+            # Honors Tapis ranged reads ("range=first,last", inclusive)
+            if _tapis_headers and "range" in _tapis_headers:
+                spec = _tapis_headers["range"].split("=", 1)[-1]
+                first, last = (int(v) for v in spec.split(","))
+                return photo_file[first : last + 1]  # noqa: E203
+            return photo_file
+
+        mock_files.getContents.side_effect = _get_contents
         mock_client.files = mock_files
 
         monkeypatch.setattr(
@@ -60,3 +69,34 @@ def mock_tapis_files_with_location(
     mock_tapis_files_factory, mock_photo_file_with_location
 ):
     return mock_tapis_files_factory(mock_photo_file_with_location)
+
+
+@pytest.fixture
+def tapis_standin(tmp_path):
+    """A running local Tapis stand-in (imageinf.fixtures.tapis_server) serving
+    `tmp_path / "system"`; copy images there before use."""
+    import threading
+
+    import uvicorn
+
+    from imageinf.fixtures.tapis_server import StandInTapis
+
+    root = tmp_path / "system"
+    root.mkdir()
+    standin = StandInTapis(str(root), base_url="http://127.0.0.1")
+    server = uvicorn.Server(
+        uvicorn.Config(
+            standin.create_app(), host="127.0.0.1", port=0, log_level="warning"
+        )
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    port = server.servers[0].sockets[0].getsockname()[1]
+    standin.base_url = f"http://127.0.0.1:{port}"
+    yield standin
+
+    server.should_exit = True
+    thread.join()
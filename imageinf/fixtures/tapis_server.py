@@ -0,0 +1,218 @@
+"""Local stand-in for the Tapis endpoints imageinf uses.
+
+Serves a directory of images as a Tapis storage system, over real HTTP, so
+load tests and benchmarks can run offline (including the tapipy client, token
+validation, connection reuse and streamed downloads):
+
+- GET  /v3/sites, /v3/tenants        tenant list with the server's public key
+- POST /v3/oauth2/tokens             mint a signed access token
+- GET  /v3/files/ops/{system}/{path} directory listing (limit/offset)
+- GET  /v3/files/content/{system}/{path}  file contents (`range` header)
+
+Every system id maps to the same root directory. `latency` is added to each
+request and file contents are streamed at most at `bandwidth` bytes/s.
+
+Run it with
+
+    python -m imageinf.fixtures.tapis_server ./images --port 8900 --latency 0.05
+
+and point the API at it with TAPIS_ALLOWED_TENANT_HOSTS=http://localhost:8900
+(tokens for it are printed on startup).
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+TENANT_ID = "standin"
+SITE_ID = "standin"
+CHUNK_SIZE = 64 * 1024
+
+
+class StandInTapis:
+    def __init__(
+        self,
+        root: str,
+        base_url: str,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes/s, None = unlimited
+
+        self._private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        self.public_key = (
+            self._private_key.public_key()
+            .public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode()
+        )
+
+    def mint_token(self, username: str, ttl: int = 4 * 3600) -> str:
+        payload = {
+            "iss": f"{self.base_url}/v3/tokens",
+            "sub": f"{username}@{TENANT_ID}",
+            "tapis/tenant_id": TENANT_ID,
+            "tapis/token_type": "access",
+            "tapis/username": username,
+            "tapis/account_type": "user",
+            "exp": int(time.time()) + ttl,
+        }
+        return jwt.encode(payload, self._private_key, algorithm="RS256")
+
+    def local_path(self, path: str) -> str:
+        local = os.path.abspath(os.path.join(self.root, path.lstrip("/")))
+        if os.path.commonpath([local, self.root]) != self.root:
+            raise HTTPException(403, detail="Path outside of the system root")
+        if not os.path.exists(local):
+            raise HTTPException(404, detail=f"{path} not found")
+        return local
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI(title="Tapis stand-in")
+
+        @app.middleware("http")
+        async def add_latency(request: Request, call_next):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return await call_next(request)
+
+        @app.get("/v3/sites")
+        def list_sites():
+            return _ok(
+                [{"site_id": SITE_ID, "primary": True, "base_url": self.base_url}]
+            )
+
+        @app.get("/v3/tenants")
+        def list_tenants():
+            return _ok(
+                [
+                    {
+                        "tenant_id": TENANT_ID,
+                        "site_id": SITE_ID,
+                        "base_url": self.base_url,
+                        "public_key": self.public_key,
+                        "token_service": f"{self.base_url}/v3/tokens",
+                        "security_kernel": f"{self.base_url}/v3/security",
+                        "status": "active",
+                    }
+                ]
+            )
+
+        @app.post("/v3/oauth2/tokens")
+        async def create_token(request: Request):
+            body = await request.json()
+            token = self.mint_token(body.get("username", "standin-user"))
+            return _ok({"access_token": {"access_token": token}})
+
+        @app.get("/v3/files/ops/{system_id}/{path:path}")
+        def list_files(system_id: str, path: str, limit: int = 1000, offset: int = 0):
+            local = self.local_path(path)
+            names = sorted(os.listdir(local)) if os.path.isdir(local) else [""]
+            end = offset + limit
+            entries = []
+            for name in names[offset:end]:
+                entry_path = os.path.join(local, name) if name else local
+                stat = os.stat(entry_path)
+                entries.append(
+                    {
+                        "name": os.path.basename(entry_path),
+                        "path": os.path.relpath(entry_path, self.root),
+                        "type": "dir" if os.path.isdir(entry_path) else "file",
+                        "size": stat.st_size,
+                        "lastModified": datetime.fromtimestamp(
+                            stat.st_mtime, timezone.utc
+                        ).isoformat(),
+                    }
+                )
+            return _ok(entries)
+
+        @app.get("/v3/files/content/{system_id}/{path:path}")
+        def get_contents(
+            system_id: str,
+            path: str,
+            byte_range: Optional[str] = Header(None, alias="range"),
+        ):
+            local = self.local_path(path)
+            if os.path.isdir(local):
+                raise HTTPException(400, detail="Cannot download a directory")
+            size = os.path.getsize(local)
+            start, end = _parse_range(byte_range, size)
+            return StreamingResponse(
+                self._stream(local, start, end),
+                media_type="application/octet-stream",
+                headers={"Content-Length": str(end - start)},
+            )
+
+        return app
+
+    async def _stream(self, local: str, start: int, end: int):
+        with open(local, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                if self.bandwidth:
+                    await asyncio.sleep(len(chunk) / self.bandwidth)
+                yield chunk
+
+
+def _parse_range(value: Optional[str], size: int):
+    """[start, end) for a Tapis `range` header ("range=min,max", inclusive;
+    "min,max" and HTTP "bytes=min-max" are accepted too)."""
+    if not value:
+        return 0, size
+    spec = value.split("=", 1)[-1].replace("-", ",")
+    try:
+        first, last = (int(v) for v in spec.split(","))
+    except ValueError:
+        raise HTTPException(400, detail=f"Invalid range header: {value}")
+    return min(first, size), min(last + 1, size)
+
+
+def _ok(result):
+    return {"status": "success", "message": "ok", "result": result, "version": "dev"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Tapis stand-in server")
+    parser.add_argument("root", help="Directory served as every Tapis system")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds/request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes/s")
+    parser.add_argument(
+        "--base-url", help="URL clients reach the server at (default from host/port)"
+    )
+    parser.add_argument("--users", default="standin-user", help="Tokens to print")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    base_url = args.base_url or f"http://{args.host}:{args.port}"
+    server = StandInTapis(args.root, base_url, args.latency, args.bandwidth)
+    for username in args.users.split(","):
+        print(f"{username}: {server.mint_token(username)}", flush=True)
+    uvicorn.run(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
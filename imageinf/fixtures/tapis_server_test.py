@@ -0,0 +1,29 @@
+import os
+
+from tapipy.tapis import Tapis
+
+from imageinf.utils.io import get_image_file
+from imageinf.utils.tapis_listing import stat_remote_files
+
+
+def test_standin_validates_tokens_and_serves_files(
+    tapis_standin, mock_photo_file_with_location
+):
+    with open(os.path.join(tapis_standin.root, "photo.jpg"), "wb") as f:
+        f.write(mock_photo_file_with_location)
+    token = tapis_standin.mint_token("alice")
+
+    claims = Tapis(base_url=tapis_standin.base_url).validate_token(token)
+    assert claims["tapis/username"] == "alice"
+
+    tapis = Tapis(base_url=tapis_standin.base_url, access_token=token)
+    stats = stat_remote_files(tapis, [("project", "/photo.jpg")])
+    head = tapis.files.getContents(
+        systemId="project", path="/photo.jpg", _tapis_headers={"range": "range=0,9"}
+    )
+    image, metadata = get_image_file(tapis, "project", "/photo.jpg")
+
+    assert stats[("project", "/photo.jpg")].size == len(mock_photo_file_with_location)
+    assert head == mock_photo_file_with_location[:10]
+    assert image.size[0] > 0
+    assert metadata.latitude is not None
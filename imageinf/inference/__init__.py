@@ -1,5 +1,4 @@
 from .config import DEFAULT_MODEL_NAME
-from .processor import run_model_on_tapis_images
 from .registry import MODEL_REGISTRY, MODEL_METADATA
 
 __all__ = [
@@ -8,3 +7,12 @@ __all__ = [
     "MODEL_REGISTRY",
     "MODEL_METADATA",
 ]
+
+
+def __getattr__(name):
+    # The processor pulls in the ML stack; import it only when asked for
+    if name == "run_model_on_tapis_images":
+        from .processor import run_model_on_tapis_images
+
+        return run_model_on_tapis_images
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,105 @@
+"""Memory-aware admission of models into a worker's model cache.
+
+Model sizes are estimated from the parameter counts in MODEL_MANIFEST. Before
+a model is loaded, resident models are evicted (least recently used first)
+until it fits both the worker's WORKER_MODEL_MEMORY_BUDGET_MB (if set) and
+the memory the OS reports as available. If it still does not fit, the load is
+refused with `ModelAdmissionError` so the task can be deferred instead of the
+worker being OOM-killed.
+"""
+
+import os
+from typing import Iterable, List, Optional
+
+from .manifest import MODEL_MANIFEST
+
+MIB = 1024 * 1024
+
+# 0 = no fixed budget, only the system's available memory is checked
+WORKER_MODEL_MEMORY_BUDGET_MB = int(os.getenv("WORKER_MODEL_MEMORY_BUDGET_MB", "0"))
+
+# fp32 weights plus slack for activations, processors and allocator overhead
+BYTES_PER_PARAM = 4
+MEMORY_OVERHEAD_FACTOR = 1.3
+
+# Tasks refused admission are retried (possibly on a less loaded worker)
+MODEL_ADMISSION_RETRY_DELAY = int(os.getenv("MODEL_ADMISSION_RETRY_DELAY", "30"))
+MODEL_ADMISSION_MAX_RETRIES = int(os.getenv("MODEL_ADMISSION_MAX_RETRIES", "10"))
+
+
+class ModelAdmissionError(RuntimeError):
+    def __init__(self, model_name: str, needed: int, available: int, retryable: bool):
+        self.model_name = model_name
+        self.needed = needed
+        self.available = available
+        # False if the model can never fit this worker's budget
+        self.retryable = retryable
+        # All constructor arguments, so Celery can rebuild the error from its
+        # result backend (it calls the class with `args`)
+        super().__init__(model_name, needed, available, retryable)
+
+    def __str__(self):
+        return (
+            f"Not enough memory to load '{self.model_name}': needs "
+            f"~{self.needed // MIB} MiB, {self.available // MIB} MiB available"
+        )
+
+
+def estimate_model_bytes(model_name: str) -> int:
+    params = MODEL_MANIFEST.get(model_name, {}).get("params", 0)
+    return int(params * BYTES_PER_PARAM * MEMORY_OVERHEAD_FACTOR)
+
+
+def available_memory_bytes() -> Optional[int]:
+    """MemAvailable from /proc/meminfo, or None where it is not available."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def plan_admission(
+    model_name: str, resident: List[str], pinned: Iterable[str] = ()
+) -> List[str]:
+    """Return the resident models to evict (oldest first) so `model_name` fits.
+
+    `resident` is in least- to most-recently used order; `pinned` models are in
+    use by the current job and are never evicted.
+    """
+    needed = estimate_model_bytes(model_name)
+    budget = WORKER_MODEL_MEMORY_BUDGET_MB * MIB
+
+    if budget and needed > budget:
+        raise ModelAdmissionError(model_name, needed, budget, retryable=False)
+
+    candidates = [m for m in resident if m not in set(pinned)]
+    evict = []
+
+    if budget:
+        resident_bytes = sum(estimate_model_bytes(m) for m in resident)
+        while resident_bytes + needed > budget and candidates:
+            victim = candidates.pop(0)
+            evict.append(victim)
+            resident_bytes -= estimate_model_bytes(victim)
+        if resident_bytes + needed > budget:
+            raise ModelAdmissionError(
+                model_name, needed, budget - resident_bytes, retryable=True
+            )
+
+    available = available_memory_bytes()
+    if available is not None:
+        freed = sum(estimate_model_bytes(m) for m in evict)
+        while available + freed < needed and candidates:
+            victim = candidates.pop(0)
+            evict.append(victim)
+            freed += estimate_model_bytes(victim)
+        if available + freed < needed:
+            raise ModelAdmissionError(
+                model_name, needed, available + freed, retryable=True
+            )
+
+    return evict
@@ -0,0 +1,78 @@
+import pytest
+
+from imageinf.inference import admission, processor
+from imageinf.inference.admission import MIB, ModelAdmissionError, plan_admission
+
+VIT_BASE = "google/vit-base-patch16-224"
+VIT_LARGE = "google/vit-large-patch16-224"
+CLIP_H = "laion/CLIP-ViT-H-14-laion2B-s32B-b79K"
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    """Set the worker budget and the memory the OS reports as available (MiB)."""
+
+    def _set(budget_mb=0, available_mb=None):
+        monkeypatch.setattr(admission, "WORKER_MODEL_MEMORY_BUDGET_MB", budget_mb)
+        available = None if available_mb is None else available_mb * admission.MIB
+        monkeypatch.setattr(admission, "available_memory_bytes", lambda: available)
+
+    return _set
+
+
+def test_evicts_least_recently_used_models_to_fit_budget(memory):
+    memory(budget_mb=2500)
+
+    # vit-base (~430 MiB) + 2x vit-large (~1.5 GiB each) leave no room for another
+    assert plan_admission(VIT_LARGE, [VIT_BASE, "google/vit-large-patch16-384"]) == [
+        VIT_BASE,
+        "google/vit-large-patch16-384",
+    ]
+    assert plan_admission(VIT_BASE, [VIT_LARGE]) == []
+
+
+def test_model_larger_than_budget_is_not_retryable(memory):
+    memory(budget_mb=2000)
+
+    with pytest.raises(ModelAdmissionError) as exc_info:
+        plan_admission(CLIP_H, [])
+    assert not exc_info.value.retryable
+
+
+def test_low_system_memory_defers_after_evicting_unpinned_models(memory):
+    memory(available_mb=1200)
+
+    assert plan_admission(VIT_LARGE, [VIT_BASE]) == [VIT_BASE]
+
+    with pytest.raises(ModelAdmissionError) as exc_info:
+        plan_admission(CLIP_H, [VIT_BASE, VIT_LARGE], pinned=[VIT_LARGE])
+    assert exc_info.value.retryable
+
+
+def test_load_model_evicts_resident_models(memory, monkeypatch):
+    class FakeRunner:
+        def __init__(self, model_name=None):
+            self.model_name = model_name
+
+    memory(budget_mb=1600)
+    monkeypatch.setattr(processor, "MODEL_CACHE_SIZE", 3)
+    monkeypatch.setattr(
+        processor, "MODEL_REGISTRY", {VIT_BASE: FakeRunner, VIT_LARGE: FakeRunner}
+    )
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+
+    processor.load_model(VIT_BASE)
+    assert list(processor._model_cache) == [VIT_BASE]
+
+    # ~430 MiB + ~1.5 GiB would exceed the budget, so vit-base makes room
+    processor.load_model(VIT_LARGE)
+    assert list(processor._model_cache) == [VIT_LARGE]
+
+
+def test_admission_error_can_be_rebuilt_from_its_args():
+    error = ModelAdmissionError(VIT_LARGE, 3 * MIB, MIB, retryable=True)
+
+    rebuilt = ModelAdmissionError(*error.args)
+
+    assert str(rebuilt) == str(error)
+    assert rebuilt.retryable
@@ -4,6 +4,8 @@ import torch
 from transformers import AutoModelForImageClassification, AutoImageProcessor
 
 from .models import Prediction
+from .pixel_cache import cached_pixel_values
+from .precision import autocast, resolve_precision
 
 
 class TransformerModel:
@@ -18,21 +20,44 @@ class TransformerModel:
         else:
             self.device = torch.device("cpu")
 
-        self.model = AutoModelForImageClassification.from_pretrained(model_name).to(
+        source = self.pretrained_source(model_name)
+        self.model = AutoModelForImageClassification.from_pretrained(source).to(
             self.device
         )
-        self.processor = AutoImageProcessor.from_pretrained(model_name)
+        self.processor = AutoImageProcessor.from_pretrained(source)
+        self.precision = resolve_precision(model_name, self.device)
+
+    def pretrained_source(self, model_name: str) -> str:
+        """HF hub id or local directory to load `model_name` from."""
+        return model_name
+
+    def pixel_values(self, image: Image.Image) -> torch.Tensor:
+        pixel_values = cached_pixel_values(
+            self.processor,
+            image,
+            lambda: self.processor(images=image, return_tensors="pt").pixel_values,
+        )
+        return pixel_values.to(self.device)
 
     def classify_image(self, image: Image.Image) -> List[Prediction]:
-        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
-        with torch.no_grad():
-            outputs = self.model(inputs.pixel_values)
-            probs = outputs.logits.softmax(-1).squeeze().tolist()
-
-        predictions = [
-            Prediction(label=self.model.config.id2label[i], score=round(score, 4))
-            for i, score in sorted(enumerate(probs), key=lambda x: x[1], reverse=True)[
-                :5
+        return self._classify_pixel_values(self.pixel_values(image))[0]
+
+    def classify_images(self, images: List[Image.Image]) -> List[List[Prediction]]:
+        """Classify several images in one forward pass (e.g. tiles)."""
+        pixel_values = self.processor(images=images, return_tensors="pt").pixel_values
+        return self._classify_pixel_values(pixel_values.to(self.device))
+
+    def _classify_pixel_values(self, pixel_values) -> List[List[Prediction]]:
+        with torch.no_grad(), autocast(self.precision, self.device):
+            outputs = self.model(pixel_values)
+        probs = outputs.logits.float().softmax(-1).tolist()
+
+        return [
+            [
+                Prediction(label=self.model.config.id2label[i], score=round(score, 4))
+                for i, score in sorted(
+                    enumerate(row), key=lambda x: x[1], reverse=True
+                )[:5]
             ]
+            for row in probs
         ]
-        return predictions
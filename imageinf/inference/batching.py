@@ -0,0 +1,159 @@
+"""Batch sizes chosen per model from measured memory use, with OOM back-off.
+
+The first time a model runs batched inference (e.g. over image tiles), two
+small probe batches are run to measure the fixed and per-image peak memory of
+a forward pass: allocator statistics on CUDA, peak RSS (VmHWM, reset through
+/proc/self/clear_refs) on Linux CPUs. The batch size is then the number of
+images whose per-image memory fits in BATCH_MEMORY_FRACTION of the memory
+currently available, capped at MAX_BATCH_SIZE, and kept on the model runner.
+
+Batches that still fail to allocate are split in half and retried, and the
+model's batch size is lowered to match, instead of failing the task.
+"""
+
+import logging
+import os
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+import torch
+from PIL import Image
+
+from .admission import available_memory_bytes
+
+logger = logging.getLogger(__name__)
+
+# Share of the available memory a batch's activations may use
+BATCH_MEMORY_FRACTION = float(os.getenv("BATCH_MEMORY_FRACTION", "0.5"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+
+# Used where memory cannot be measured
+FALLBACK_BATCH_SIZE = 8
+
+PROBE_IMAGE_SIZE = 64
+
+T = TypeVar("T")
+R = TypeVar("R")
+Forward = Callable[[List[Image.Image]], List[R]]
+
+
+def batch_size_for(model, forward: Forward) -> int:
+    """Batch size for `forward` (a batched method of the runner `model`),
+    measured on first use."""
+    size = getattr(model, "batch_size", None)
+    if size is None:
+        size = model.batch_size = measure_batch_size(
+            getattr(model, "device", torch.device("cpu")), forward
+        )
+    return size
+
+
+def measure_batch_size(device: torch.device, forward: Forward) -> int:
+    probe = [Image.new("RGB", (PROBE_IMAGE_SIZE, PROBE_IMAGE_SIZE))] * 2
+    forward(probe[:1])  # warm up, so lazy allocations are not counted
+    one = _peak_memory_bytes(device, lambda: forward(probe[:1]))
+    two = _peak_memory_bytes(device, lambda: forward(probe))
+    available = _available_bytes(device)
+    if one is None or two is None or available is None:
+        return FALLBACK_BATCH_SIZE
+
+    per_image = max(two - one, 1)
+    fixed = max(one - per_image, 0)
+    budget = available * BATCH_MEMORY_FRACTION - fixed
+    size = max(1, min(MAX_BATCH_SIZE, int(budget // per_image)))
+    logger.info(
+        "Batch size %d (%.1f MiB per image, %.0f MiB available)",
+        size,
+        per_image / 2**20,
+        available / 2**20,
+    )
+    return size
+
+
+def run_batched(
+    model,
+    forward: Forward,
+    items: List[T],
+    load: Callable[[T], Image.Image],
+    batch_size: Optional[int] = None,
+) -> List[R]:
+    """`forward` over the images `load`ed from `items`, one batch at a time.
+
+    Batches have the model's measured batch size unless `batch_size` is
+    given; batches that run out of memory are split and retried.
+    """
+    if batch_size is None:
+        batch_size = batch_size_for(model, forward)
+    outputs: List[R] = []
+    start = 0
+    while start < len(items):
+        batch = items[start : start + batch_size]  # noqa: E203
+        images = [load(item) for item in batch]
+        batch_outputs, fitted = _run_splitting(forward, images)
+        outputs.extend(batch_outputs)
+        start += len(batch)
+        if fitted < len(batch):
+            # Later batches (and jobs) start from the size that fitted
+            batch_size = fitted
+            model.batch_size = min(getattr(model, "batch_size", None) or fitted, fitted)
+    return outputs
+
+
+def _run_splitting(forward: Forward, images: List[Image.Image]) -> Tuple[List, int]:
+    """Outputs of `forward` over `images`, halving the batch on out-of-memory
+    errors, and the largest batch size that ran."""
+    try:
+        return list(forward(images)), len(images)
+    except Exception as e:
+        if not is_out_of_memory(e) or len(images) == 1:
+            raise
+    logger.warning("Out of memory on a batch of %d, retrying halves", len(images))
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    half = len(images) // 2
+    first, first_fitted = _run_splitting(forward, images[:half])
+    second, second_fitted = _run_splitting(forward, images[half:])
+    return first + second, max(first_fitted, second_fitted)
+
+
+def is_out_of_memory(error: Exception) -> bool:
+    if isinstance(error, (MemoryError, torch.cuda.OutOfMemoryError)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and (
+        "out of memory" in message or "not enough memory" in message
+    )
+
+
+def _peak_memory_bytes(device: torch.device, run: Callable) -> Optional[int]:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        base = torch.cuda.memory_allocated(device)
+        run()
+        torch.cuda.synchronize(device)
+        return torch.cuda.max_memory_allocated(device) - base
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak RSS to the current RSS
+        base = _proc_status_bytes("VmRSS")
+    except OSError:
+        return None
+    run()
+    peak = _proc_status_bytes("VmHWM")
+    return None if base is None or peak is None else peak - base
+
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def _available_bytes(device: torch.device) -> Optional[int]:
+    if device.type == "cuda":
+        return torch.cuda.mem_get_info(device)[0]
+    if device.type == "cpu":
+        return available_memory_bytes()
+    return None
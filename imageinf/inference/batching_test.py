@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from imageinf.inference import batching
+
+
+def _forward_fitting(max_batch, calls):
+    def forward(images):
+        calls.append(len(images))
+        if len(images) > max_batch:
+            raise RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        return [image * 10 for image in images]
+
+    return forward
+
+
+def test_batches_that_run_out_of_memory_are_split_and_retried():
+    model = SimpleNamespace(batch_size=8)
+    calls = []
+
+    outputs = batching.run_batched(
+        model, _forward_fitting(3, calls), list(range(20)), load=lambda i: i
+    )
+
+    assert outputs == [i * 10 for i in range(20)]
+    # The first batch is halved until it fits; later ones start from there
+    assert calls == [8, 4, 2, 2, 4, 2, 2] + [2] * 6
+    assert model.batch_size == 2
+
+
+def test_other_errors_are_not_retried():
+    def forward(images):
+        raise RuntimeError("mat1 and mat2 shapes cannot be multiplied")
+
+    with pytest.raises(RuntimeError, match="shapes"):
+        batching.run_batched(
+            SimpleNamespace(batch_size=4), forward, [1, 2, 3], load=lambda i: i
+        )
+
+
+def test_batch_size_is_measured_from_memory_profile(monkeypatch):
+    peaks = iter([110 * 2**20, 120 * 2**20])
+    monkeypatch.setattr(batching, "_peak_memory_bytes", lambda device, run: next(peaks))
+    monkeypatch.setattr(batching, "_available_bytes", lambda device: 1000 * 2**20)
+    monkeypatch.setattr(batching, "BATCH_MEMORY_FRACTION", 0.5)
+    model = SimpleNamespace(device=torch.device("cpu"))
+
+    size = batching.batch_size_for(model, lambda images: [0] * len(images))
+
+    # 100 MiB fixed and 10 MiB per image in a 500 MiB budget
+    assert size == 40
+    assert model.batch_size == 40
+
+
+def test_batch_size_falls_back_when_memory_cannot_be_measured(monkeypatch):
+    monkeypatch.setattr(batching, "_peak_memory_bytes", lambda device, run: None)
+    model = SimpleNamespace(device=torch.device("mps"))
+
+    size = batching.batch_size_for(model, lambda images: [0] * len(images))
+
+    assert size == batching.FALLBACK_BATCH_SIZE
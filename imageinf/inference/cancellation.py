@@ -0,0 +1,72 @@
+"""Cooperative cancellation of async inference jobs.
+
+DELETE /inference/jobs/{id} revokes the job's task, so a worker drops it if it
+is still queued (or waiting for a fair-share slot), and sets a cancellation
+flag in Redis (the Celery result backend, or CANCEL_REDIS_URL). A running task
+checks the flag between files, at most every CANCEL_CHECK_INTERVAL seconds,
+stops early and stores the results computed so far with status CANCELLED.
+Without Redis, only queued jobs can be cancelled.
+"""
+
+import os
+import time
+from typing import Optional
+
+CANCEL_REDIS_URL = os.getenv("CANCEL_REDIS_URL") or os.getenv("CELERY_RESULT_BACKEND")
+CANCEL_CHECK_INTERVAL = float(os.getenv("CANCEL_CHECK_INTERVAL", "2"))
+
+# Flags outlive any job (see task_time_limit) and then expire
+CANCEL_FLAG_TTL = 24 * 3600
+
+
+class CancelFlags:
+    def __init__(self, client, ttl: int = CANCEL_FLAG_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def _key(self, job_id: str) -> str:
+        return f"imageinf:cancel:{job_id}"
+
+    def cancel(self, job_id: str):
+        self.client.set(self._key(job_id), 1, ex=self.ttl)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self.client.exists(self._key(job_id)))
+
+
+class CancelCheck:
+    """Whether a job has been cancelled, polling Redis at most every
+    `interval` seconds; passed to the processor as `should_stop`."""
+
+    def __init__(self, flags: Optional[CancelFlags], job_id: str, interval=None):
+        self.flags = flags
+        self.job_id = job_id
+        self.interval = CANCEL_CHECK_INTERVAL if interval is None else interval
+        self.cancelled = False
+        self._last_check = None
+
+    def __call__(self) -> bool:
+        if self.cancelled or self.flags is None:
+            return self.cancelled
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+        self.cancelled = self.flags.is_cancelled(self.job_id)
+        return self.cancelled
+
+
+_cancel_flags: Optional[CancelFlags] = None
+
+
+def get_cancel_flags() -> Optional[CancelFlags]:
+    """Shared cancellation flags, or None without Redis."""
+    global _cancel_flags
+
+    if not (CANCEL_REDIS_URL or "").startswith(("redis://", "rediss://")):
+        return None
+    if _cancel_flags is None:
+        import redis
+
+        _cancel_flags = CancelFlags(redis.Redis.from_url(CANCEL_REDIS_URL))
+    return _cancel_flags
@@ -0,0 +1,146 @@
+import pytest
+
+from imageinf.inference import cancellation, processor, routes
+from imageinf.inference.cancellation import CancelFlags
+from imageinf.inference.result_store import get_result_store
+from imageinf.inference.tasks import run_inference_task
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def exists(self, key):
+        return int(key in self.values)
+
+
+USER_DATA = {
+    "username": "testuser",
+    "tapis_token": "fake-token",
+    "tenant_host": "https://designsafe.tapis.io",
+}
+FILES = [
+    {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+    for i in range(3)
+]
+MODEL = "google/vit-base-patch16-224"
+
+
+@pytest.fixture
+def cancel_flags(monkeypatch):
+    flags = CancelFlags(FakeRedis())
+    monkeypatch.setattr(cancellation, "get_cancel_flags", lambda: flags)
+    monkeypatch.setattr(routes, "get_cancel_flags", lambda: flags)
+    monkeypatch.setattr(cancellation, "CANCEL_CHECK_INTERVAL", 0)
+    return flags
+
+
+@pytest.fixture
+def revoked(monkeypatch):
+    job_ids = []
+    monkeypatch.setattr(routes.celery.control, "revoke", job_ids.append)
+    return job_ids
+
+
+def test_running_job_stops_between_files_and_keeps_partial_results(
+    cancel_flags, mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    store = get_result_store()
+    store.create_job("job-1", "testuser", MODEL, len(FILES))
+
+    get_image_file = processor.get_image_file
+
+    def cancel_after_first_file(*args, **kwargs):
+        cancel_flags.cancel("job-1")
+        return get_image_file(*args, **kwargs)
+
+    monkeypatch.setattr(processor, "get_image_file", cancel_after_first_file)
+
+    run_inference_task.apply(args=(FILES, USER_DATA, MODEL), task_id="job-1").get()
+
+    job = store.get_job("job-1")
+    assert job["status"] == "CANCELLED"
+    assert store.count_results("job-1") == 1
+
+
+def test_cancelled_job_does_not_start(
+    cancel_flags, mock_tapis_files, mock_tapis_auth, mock_vit
+):
+    store = get_result_store()
+    store.create_job("job-1", "testuser", MODEL, len(FILES))
+    cancel_flags.cancel("job-1")
+
+    result = run_inference_task.apply(args=(FILES, USER_DATA, MODEL), task_id="job-1")
+
+    assert result.get() is None
+    assert store.count_results("job-1") == 0
+
+
+def test_cancel_pending_job(client_authed, cancel_flags, revoked):
+    get_result_store().create_job("job-1", "testuser", MODEL, len(FILES))
+
+    response = client_authed.delete("/inference/jobs/job-1")
+
+    assert response.json() == {"task_id": "job-1", "status": "CANCELLED"}
+    assert revoked == ["job-1"]
+    assert cancel_flags.is_cancelled("job-1")
+
+    data = client_authed.get("/inference/jobs/job-1").json()
+    assert data["status"] == "CANCELLED"
+    assert data["total"] == 0
+
+
+def test_cancel_leaves_finished_and_foreign_jobs_alone(
+    client_authed, cancel_flags, revoked
+):
+    store = get_result_store()
+    store.create_job("done", "testuser", MODEL, 1)
+    store.mark_failed("done", "boom")
+    store.create_job("theirs", "someone-else", MODEL, 1)
+
+    response = client_authed.delete("/inference/jobs/done")
+    assert response.json() == {"task_id": "done", "status": "FAILURE"}
+
+    assert client_authed.delete("/inference/jobs/theirs").status_code == 404
+    assert revoked == []
+    assert not cancel_flags.is_cancelled("done")
+
+
+def test_metadata_job_stops_between_batches_and_stays_cancelled(
+    cancel_flags, mock_tapis_files, mock_tapis_auth, monkeypatch
+):
+    from imageinf.inference.tasks import extract_metadata_task
+
+    store = get_result_store()
+    store.create_job("job-1", "testuser", "metadata", len(FILES))
+    monkeypatch.setattr(processor, "METADATA_BATCH_SIZE", 1)
+    get_image_metadata = processor.get_image_metadata
+
+    def cancel_after_first_file(*args, **kwargs):
+        cancel_flags.cancel("job-1")
+        return get_image_metadata(*args, **kwargs)
+
+    monkeypatch.setattr(processor, "get_image_metadata", cancel_after_first_file)
+
+    extract_metadata_task.apply(args=(FILES, USER_DATA), task_id="job-1").get()
+
+    assert store.get_job("job-1")["status"] == "CANCELLED"
+    assert store.count_results("job-1") == 1
+
+
+def test_results_saved_after_cancellation_keep_the_cancelled_status(
+    cancel_flags, mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    store = get_result_store()
+    store.create_job("job-1", "testuser", MODEL, len(FILES))
+    # Cancelled after the task's last check
+    monkeypatch.setattr(cancellation, "get_cancel_flags", lambda: None)
+    store.mark_cancelled("job-1")
+
+    run_inference_task.apply(args=(FILES, USER_DATA, MODEL), task_id="job-1").get()
+
+    assert store.get_job("job-1")["status"] == "CANCELLED"
+    assert store.count_results("job-1") == len(FILES)
@@ -50,6 +50,25 @@ def aggregate_predictions(predictions: List[Prediction]) -> List[Prediction]:
     return sorted(aggregated, key=lambda p: p.score, reverse=True)
 
 
+def combine_predictions(per_model: List[List[Prediction]]) -> List[Prediction]:
+    """
+    Ensemble the (aggregated) predictions of several models for one image.
+
+    Each label's score is averaged over all models, counting 0 for models that
+    did not predict it, so labels several models agree on rank first.
+    """
+    totals = {}
+    for predictions in per_model:
+        for pred in predictions:
+            totals[pred.label] = totals.get(pred.label, 0.0) + pred.score
+
+    combined = [
+        Prediction(label=label, score=round(total / len(per_model), 4))
+        for label, total in totals.items()
+    ]
+    return sorted(combined, key=lambda p: p.score, reverse=True)
+
+
 # Mapping the ImageNet-1k to larger categories
 CATEGORY_MAPPING = {
     "car": [
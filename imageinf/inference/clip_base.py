@@ -1,10 +1,13 @@
 from typing import List, Optional
+import numpy as np
 from PIL import Image
 import torch
 import torch.nn.functional as F
 from transformers import CLIPModel, CLIPProcessor
 
 from .models import Prediction
+from .pixel_cache import cached_pixel_values
+from .precision import autocast, resolve_precision
 
 
 class BaseCLIPModel:
@@ -53,10 +56,25 @@ class BaseCLIPModel:
         else:
             self.device = torch.device("cpu")
 
-        self.model = CLIPModel.from_pretrained(model_name).to(self.device)
-        self.processor = CLIPProcessor.from_pretrained(model_name)
+        source = self.pretrained_source(model_name)
+        self.model = CLIPModel.from_pretrained(source).to(self.device)
+        self.processor = CLIPProcessor.from_pretrained(source)
+        self.precision = resolve_precision(model_name, self.device)
 
-        self.labels = labels or self.DEFAULT_LABELS
+        self.labels = None
+        self.set_labels(labels)
+
+    def pretrained_source(self, model_name: str) -> str:
+        """HF hub id or local directory to load `model_name` from."""
+        return model_name
+
+    def set_labels(self, labels: Optional[List[str]] = None):
+        """Switch label set, recomputing text features only if it changed."""
+        labels = labels or self.DEFAULT_LABELS
+        if labels == self.labels:
+            return
+
+        self.labels = labels
         self.neg_templates = {lab: f"no {lab} present" for lab in self.labels}
 
         self._precompute_text_features()
@@ -69,15 +87,65 @@ class BaseCLIPModel:
             pairs.append((pos, neg))
 
         all_texts = [t for pair in pairs for t in pair]
-        with torch.no_grad():
+        with torch.no_grad(), autocast(self.precision, self.device):
             ti = self.processor(text=all_texts, return_tensors="pt", padding=True)
             ti = {k: v.to(self.device) for k, v in ti.items()}
             text_out = self.model.text_model(
                 input_ids=ti["input_ids"], attention_mask=ti["attention_mask"]
             )
             emb = self.model.text_projection(text_out.pooler_output)
-            emb = F.normalize(emb, dim=-1)
-            self.text_pairs = emb.reshape(len(self.labels), 2, -1)
+        emb = F.normalize(emb.float(), dim=-1)
+        self.text_pairs = emb.reshape(len(self.labels), 2, -1)
+
+    def image_features(self, image: Image.Image) -> torch.Tensor:
+        """Return the L2-normalized CLIP image embedding (shape 1xD)."""
+        pixel_values = self.pixel_values(image)
+
+        with torch.no_grad(), autocast(self.precision, self.device):
+            vision_out = self.model.vision_model(pixel_values=pixel_values)
+            img_feat = self.model.visual_projection(vision_out.pooler_output)
+        return F.normalize(img_feat.float(), dim=-1)
+
+    def image_features_batch(self, images: List[Image.Image]) -> torch.Tensor:
+        """L2-normalized CLIP embeddings of several images (shape NxD)."""
+        rgb = [im if im.mode == "RGB" else im.convert("RGB") for im in images]
+        pixel_values = self.processor(images=rgb, return_tensors="pt")["pixel_values"]
+
+        with torch.no_grad(), autocast(self.precision, self.device):
+            vision_out = self.model.vision_model(
+                pixel_values=pixel_values.to(self.device)
+            )
+            img_feat = self.model.visual_projection(vision_out.pooler_output)
+        return F.normalize(img_feat.float(), dim=-1)
+
+    def pixel_values(self, image: Image.Image) -> torch.Tensor:
+        def _preprocess():
+            rgb = image if image.mode == "RGB" else image.convert("RGB")
+            return self.processor(images=rgb, return_tensors="pt")["pixel_values"]
+
+        pixel_values = cached_pixel_values(
+            self.processor.image_processor, image, _preprocess
+        )
+        return pixel_values.to(self.device)
+
+    def text_features(self, text: str) -> torch.Tensor:
+        """Return the L2-normalized CLIP text embedding (shape 1xD)."""
+        with torch.no_grad(), autocast(self.precision, self.device):
+            ti = self.processor(text=[text], return_tensors="pt", padding=True)
+            ti = {k: v.to(self.device) for k, v in ti.items()}
+            text_out = self.model.text_model(
+                input_ids=ti["input_ids"], attention_mask=ti["attention_mask"]
+            )
+            emb = self.model.text_projection(text_out.pooler_output)
+        return F.normalize(emb.float(), dim=-1)
+
+    def embed_image(self, image: Image.Image) -> np.ndarray:
+        """Image embedding as a float32 vector, for the similarity index."""
+        return self.image_features(image)[0].cpu().numpy().astype(np.float32)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """Text embedding as a float32 vector, comparable to `embed_image`."""
+        return self.text_features(text)[0].cpu().numpy().astype(np.float32)
 
     def classify_image(
         self,
@@ -85,6 +153,19 @@ class BaseCLIPModel:
         sensitivity: str = "medium",
         debug_when_empty: bool = True,
     ) -> List[Prediction]:
+        return self.classify_features(
+            self.image_features(image),
+            sensitivity=sensitivity,
+            debug_when_empty=debug_when_empty,
+        )
+
+    def classify_features(
+        self,
+        img_feat: torch.Tensor,
+        sensitivity: str = "medium",
+        debug_when_empty: bool = True,
+    ) -> List[Prediction]:
+        """Classify a precomputed image embedding (see `image_features`)."""
 
         # Get threshold and temperature from sensitivity preset
         preset = self.SENSITIVITY_PRESETS.get(
@@ -93,17 +174,7 @@ class BaseCLIPModel:
         threshold = preset["threshold"]
         temperature = preset["temperature"]
 
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-
-        inputs = self.processor(images=image, return_tensors="pt")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
         with torch.no_grad():
-            vision_out = self.model.vision_model(pixel_values=inputs["pixel_values"])
-            img_feat = self.model.visual_projection(vision_out.pooler_output)
-            img_feat = F.normalize(img_feat, dim=-1)
-
             sims2 = torch.einsum("bd,lcd->blc", img_feat, self.text_pairs)
             logits2 = sims2 * temperature
             probs2 = torch.softmax(logits2, dim=-1)[0]
@@ -0,0 +1,237 @@
+"""Compact columnar encoding of `InferenceResponse` for the Celery backend.
+
+A JSON `InferenceResponse` repeats the system id, path and label strings for
+every prediction and (for CLIP) stores identical `results` and
+`aggregated_results`. The compact form keeps:
+
+- a path table (system ids interned) shared by both sections,
+- a label dictionary with per-prediction label ids,
+- float16 score arrays with per-file offsets,
+- `aggregated_results` only when it differs from `results`,
+
+packed as a compressed numpy archive. It is base64 wrapped so it still rides
+through Celery's JSON serializer, and is expanded back to the regular JSON
+schema only at the HTTP edge (`expand_result`).
+"""
+
+import base64
+import io
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .models import (
+    EnsembleResponse,
+    InferenceResponse,
+    InferenceResult,
+    OutputOptions,
+)
+
+# "json" (plain InferenceResponse dicts) or "compact"
+RESULT_ENCODING = os.getenv("RESULT_ENCODING", "json")
+
+COMPACT_FORMAT = "imageinf-compact-v1"
+SECTIONS = ("results", "aggregated_results")
+
+
+def encode_task_result(
+    response: Union[InferenceResponse, EnsembleResponse],
+) -> Dict[str, Any]:
+    """Task return value in the configured RESULT_ENCODING."""
+    if RESULT_ENCODING != "compact":
+        return response.model_dump()
+    if isinstance(response, EnsembleResponse):
+        # Each model's results are encoded separately; the combined scores
+        # (one short list per file) are kept as they are
+        encoded = response.model_dump(include={"models", "combined_results"})
+        encoded["responses"] = [encode_response(r) for r in response.responses]
+        return encoded
+    return encode_response(response)
+
+
+def project_response(
+    response: Union[InferenceResponse, EnsembleResponse],
+    output: Optional[OutputOptions],
+) -> Union[InferenceResponse, EnsembleResponse]:
+    """Keep only the sections, metadata and top-k predictions in `output`;
+    omitted sections are returned empty."""
+    if output is None:
+        return response
+    if isinstance(response, EnsembleResponse):
+        combined = response.combined_results
+        return response.model_copy(
+            update={
+                "responses": [project_response(r, output) for r in response.responses],
+                "combined_results": (
+                    _project_results(combined, output, metadata=False)
+                    if combined is not None
+                    else None
+                ),
+            }
+        )
+
+    return response.model_copy(
+        update={
+            "results": (
+                _project_results(
+                    response.results, output, metadata="metadata" in output.fields
+                )
+                if "results" in output.fields
+                else []
+            ),
+            "aggregated_results": (
+                _project_results(response.aggregated_results, output, metadata=False)
+                if "aggregated_results" in output.fields
+                else []
+            ),
+        }
+    )
+
+
+def _project_results(
+    results: List[InferenceResult], output: OutputOptions, metadata: bool
+) -> List[InferenceResult]:
+    return [
+        r.model_copy(
+            update={
+                "predictions": r.predictions[: output.topK],
+                "metadata": r.metadata if metadata else None,
+            }
+        )
+        for r in results
+    ]
+
+
+def expand_result(payload: Any) -> Any:
+    """Expand a compact task result to the JSON schema; pass others through."""
+    if isinstance(payload, dict) and payload.get("encoding") == COMPACT_FORMAT:
+        return decode_response(payload)
+    if isinstance(payload, dict) and "responses" in payload:
+        return {
+            **payload,
+            "responses": [expand_result(r) for r in payload["responses"]],
+        }
+    return payload
+
+
+def encode_response(response: InferenceResponse) -> Dict[str, str]:
+    systems: List[str] = []
+    system_index: Dict[str, int] = {}
+    labels: List[str] = []
+    label_index: Dict[str, int] = {}
+
+    # Path table from whichever section was kept (see `project_response`)
+    files = response.results or response.aggregated_results
+    file_systems = []
+    for result in files:
+        if result.systemId not in system_index:
+            system_index[result.systemId] = len(systems)
+            systems.append(result.systemId)
+        file_systems.append(system_index[result.systemId])
+
+    def _columns(results: List[InferenceResult]):
+        offsets = [0]
+        label_ids = []
+        scores = []
+        for result in results:
+            for prediction in result.predictions:
+                if prediction.label not in label_index:
+                    label_index[prediction.label] = len(labels)
+                    labels.append(prediction.label)
+                label_ids.append(label_index[prediction.label])
+                scores.append(prediction.score)
+            offsets.append(len(label_ids))
+        return (
+            np.asarray(offsets, dtype=np.int32),
+            np.asarray(label_ids, dtype=np.int32),
+            np.asarray(scores, dtype=np.float16),
+        )
+
+    aggregated_same = [r.predictions for r in response.aggregated_results] == [
+        r.predictions for r in response.results
+    ]
+
+    arrays = {"file_systems": np.asarray(file_systems, dtype=np.int32)}
+    for section in SECTIONS if not aggregated_same else SECTIONS[:1]:
+        if files and not getattr(response, section):
+            continue  # omitted section
+        offsets, label_ids, scores = _columns(getattr(response, section))
+        arrays[f"{section}_offsets"] = offsets
+        arrays[f"{section}_labels"] = label_ids
+        arrays[f"{section}_scores"] = scores
+
+    header = {
+        "model": response.model,
+        "systems": systems,
+        "paths": [r.path for r in files],
+        "labels": labels,
+        "metadata": [
+            r.metadata.model_dump(mode="json") if r.metadata else None for r in files
+        ],
+        "aggregated_same": aggregated_same,
+        # Per-tile predictions of tiled jobs are rare and kept as JSON
+        "tiles": [
+            [t.model_dump() for t in r.tiles] if r.tiles is not None else None
+            for r in files
+        ],
+        "errors": [r.error for r in files],
+        "phashes": [r.phash for r in files],
+        "duplicate_of": [r.duplicateOf for r in files],
+    }
+    arrays["header"] = np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return {
+        "encoding": COMPACT_FORMAT,
+        "data": base64.b64encode(buffer.getvalue()).decode("ascii"),
+    }
+
+
+def decode_response(payload: Dict[str, str]) -> Dict[str, Any]:
+    with np.load(io.BytesIO(base64.b64decode(payload["data"]))) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    header = json.loads(arrays["header"].tobytes())
+    systems = header["systems"]
+    labels = header["labels"]
+    file_systems = arrays["file_systems"].tolist()
+    missing = [None] * len(header["paths"])
+    tiles = header.get("tiles") or missing
+    errors = header.get("errors") or missing
+    phashes = header.get("phashes") or missing
+    duplicate_of = header.get("duplicate_of") or missing
+
+    def _section(section: str, with_metadata: bool):
+        if f"{section}_offsets" not in arrays:
+            return []
+        offsets = arrays[f"{section}_offsets"].tolist()
+        label_ids = arrays[f"{section}_labels"].tolist()
+        scores = arrays[f"{section}_scores"].astype(np.float32).tolist()
+        return [
+            {
+                "systemId": systems[file_systems[i]],
+                "path": path,
+                "predictions": [
+                    {"label": labels[label_ids[j]], "score": round(scores[j], 4)}
+                    for j in range(offsets[i], offsets[i + 1])
+                ],
+                "metadata": header["metadata"][i] if with_metadata else None,
+                "tiles": tiles[i] if with_metadata else None,
+                "error": errors[i],
+                "phash": phashes[i] if with_metadata else None,
+                "duplicateOf": duplicate_of[i],
+            }
+            for i, path in enumerate(header["paths"])
+        ]
+
+    aggregated_section = (
+        "results" if header["aggregated_same"] else "aggregated_results"
+    )
+    return {
+        "model": header["model"],
+        "aggregated_results": _section(aggregated_section, with_metadata=False),
+        "results": _section("results", with_metadata=True),
+    }
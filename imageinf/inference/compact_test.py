@@ -0,0 +1,132 @@
+import json
+
+from imageinf.inference import compact
+from imageinf.inference.compact import (
+    decode_response,
+    encode_response,
+    encode_task_result,
+    expand_result,
+    project_response,
+)
+from imageinf.inference.models import (
+    EnsembleResponse,
+    ImageMetadata,
+    InferenceResponse,
+    InferenceResult,
+    OutputOptions,
+    Prediction,
+)
+
+
+def _response(n_files, aggregated_same=False):
+    results = [
+        InferenceResult(
+            systemId="designsafe.storage.default",
+            path=f"/project/img_{i}.jpg",
+            predictions=[
+                Prediction(label="sports car", score=0.8123),
+                Prediction(label="pickup, pickup truck", score=0.0421),
+            ],
+            metadata=ImageMetadata(latitude=30.25, longitude=-97.75) if i else None,
+        )
+        for i in range(n_files)
+    ]
+    aggregated = [
+        InferenceResult(
+            systemId=r.systemId,
+            path=r.path,
+            predictions=(
+                r.predictions
+                if aggregated_same
+                else [Prediction(label="car", score=0.8123)]
+            ),
+        )
+        for r in results
+    ]
+    return InferenceResponse(
+        model="google/vit-base-patch16-224",
+        aggregated_results=aggregated,
+        results=results,
+    )
+
+
+def test_round_trip_matches_json_schema():
+    response = _response(3)
+
+    decoded = decode_response(encode_response(response))
+
+    expected = response.model_dump(mode="json")
+    assert decoded["model"] == expected["model"]
+    assert [r["path"] for r in decoded["results"]] == [
+        r["path"] for r in expected["results"]
+    ]
+    assert decoded["aggregated_results"][0]["predictions"][0]["label"] == "car"
+    assert decoded["results"][1]["metadata"]["latitude"] == 30.25
+    assert decoded["results"][0]["metadata"] is None
+    for got, want in zip(decoded["results"], expected["results"]):
+        for p, q in zip(got["predictions"], want["predictions"]):
+            assert p["label"] == q["label"]
+            assert abs(p["score"] - q["score"]) < 1e-3
+
+
+def test_identical_sections_are_stored_once():
+    response = _response(2, aggregated_same=True)
+
+    decoded = expand_result(encode_response(response))
+
+    assert [r["predictions"] for r in decoded["aggregated_results"]] == [
+        r["predictions"] for r in decoded["results"]
+    ]
+
+
+def test_compact_is_smaller_than_json_for_large_jobs():
+    response = _response(2000)
+
+    compact = json.dumps(encode_response(response))
+    plain = json.dumps(response.model_dump(mode="json"))
+
+    assert len(compact) * 3 < len(plain)
+
+
+def test_expand_result_passes_plain_results_through():
+    plain = _response(1).model_dump()
+    assert expand_result(plain) is plain
+
+
+def test_multi_model_results_are_encoded_per_model(monkeypatch):
+    monkeypatch.setattr(compact, "RESULT_ENCODING", "compact")
+    response = EnsembleResponse(
+        models=["google/vit-base-patch16-224"],
+        responses=[_response(2)],
+        combined_results=_response(2).aggregated_results,
+    )
+
+    payload = json.loads(json.dumps(encode_task_result(response)))
+
+    assert payload["responses"][0]["encoding"] == compact.COMPACT_FORMAT
+    expanded = expand_result(payload)
+    aggregated = expanded["responses"][0]["aggregated_results"]
+    assert aggregated[0]["predictions"][0]["label"] == "car"
+    assert expanded["combined_results"] == payload["combined_results"]
+
+
+def test_projection_keeps_requested_sections_and_top_k():
+    response = _response(2)
+
+    slim = project_response(
+        response, OutputOptions(fields=["aggregated_results"], topK=1)
+    )
+    decoded = decode_response(encode_response(slim))
+
+    assert slim.results == []
+    assert decoded["results"] == []
+    assert [r["path"] for r in decoded["aggregated_results"]] == [
+        "/project/img_0.jpg",
+        "/project/img_1.jpg",
+    ]
+    assert len(encode_response(slim)["data"]) < len(encode_response(response)["data"])
+
+    no_metadata = project_response(response, OutputOptions(fields=["results"], topK=1))
+    assert [len(r.predictions) for r in no_metadata.results] == [1, 1]
+    assert all(r.metadata is None for r in no_metadata.results)
+    assert no_metadata.aggregated_results == []
@@ -1 +1,4 @@
 DEFAULT_MODEL_NAME = "google/vit-base-patch16-224"
+
+# Model name recorded for metadata-only jobs (no model is run)
+METADATA_ONLY_MODEL = "metadata"
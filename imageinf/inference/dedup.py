@@ -0,0 +1,94 @@
+"""Near-duplicate detection with a perceptual (difference) hash.
+
+Bursts of near-identical frames are common in field photos. With `dedup`
+enabled, each image gets a 64-bit dHash when it is decoded; an image whose
+hash is within DEDUP_MAX_DISTANCE bits of an earlier image in the job reuses
+that image's predictions instead of running the models again.
+
+Across jobs (`dedupCache`), equal hashes are only a candidate: uniform, dark or
+overexposed frames share hashes, so stored predictions are reused only when
+the file's SHA-256 digest matches too.
+"""
+
+import hashlib
+import os
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+# Hamming distance (out of 64 bits) up to which two images are duplicates
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "4"))
+
+HASH_SIZE = 8
+
+
+# Decoded size (in multiples of the thumbnail) that hashes are resampled from
+HASH_DECODE_SCALE = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail
+    is brighter than its right neighbour."""
+    size = (HASH_SIZE + 1, HASH_SIZE)
+    thumbnail = _reduced(image, size).convert("L").resize(size, Image.Resampling.BOX)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _reduced(image: Image.Image, size) -> Image.Image:
+    """`image` at a few times `size`, without decoding a full-resolution copy
+    where the format allows it."""
+    target = (size[0] * HASH_DECODE_SCALE, size[1] * HASH_DECODE_SCALE)
+    filename = getattr(image, "filename", None)
+    if image.format == "JPEG" and filename:
+        # A separate reduced (DCT-scaled) decode, leaving `image` untouched
+        with Image.open(filename) as copy:
+            copy.draft("L", target)
+            return copy.convert("L")
+    factor = min(image.width // target[0], image.height // target[1])
+    return image.reduce(factor) if factor > 1 else image
+
+
+def format_hash(value: int) -> str:
+    return f"{value:016x}"
+
+
+def content_digest(image: Image.Image) -> Optional[str]:
+    """SHA-256 of the file `image` was read from, or None for in-memory images."""
+    filename = getattr(image, "filename", None)
+    if not filename:
+        return None
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DuplicateIndex:
+    """Hashes of the distinct images seen so far in a job."""
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._hashes = np.empty(64, dtype=np.uint64)
+        self._positions: List[int] = []
+
+    def add(self, value: int, position: int):
+        count = len(self._positions)
+        if count == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.empty_like(self._hashes)])
+        self._hashes[count] = value
+        self._positions.append(position)
+
+    def find(self, value: int) -> Optional[int]:
+        """Position of the closest earlier image within `max_distance`."""
+        if not self._positions:
+            return None
+        xor = self._hashes[: len(self._positions)] ^ np.uint64(value)
+        distances = np.unpackbits(xor.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        return self._positions[best]
@@ -0,0 +1,102 @@
+from PIL import Image, ImageDraw
+
+from imageinf.inference import processor
+from imageinf.inference.dedup import DuplicateIndex, dhash
+from imageinf.inference.models import Prediction, TapisFile
+from imageinf.inference.processor import run_model_on_tapis_images
+from imageinf.utils.auth import TapisUser
+
+MODEL = "google/vit-base-patch16-224"
+
+USER = TapisUser(
+    username="testuser",
+    tapis_token="fake-token",
+    tenant_host="https://designsafe.tapis.io",
+)
+
+
+def _scene(box, noise=None):
+    image = Image.new("RGB", (320, 240), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle(box, fill="red")
+    if noise:
+        draw.point(noise, fill="black")
+    return image
+
+
+def test_near_duplicates_are_found_and_distinct_images_are_not():
+    index = DuplicateIndex(max_distance=4)
+    index.add(dhash(_scene((40, 40, 160, 160))), 0)
+    index.add(dhash(_scene((200, 20, 300, 220))), 1)
+
+    assert index.find(dhash(_scene((40, 40, 160, 160), noise=(5, 5)))) == 0
+    assert index.find(dhash(_scene((200, 20, 300, 220)))) == 1
+    assert index.find(dhash(Image.new("RGB", (320, 240), "blue"))) is None
+
+
+def test_duplicates_reuse_predictions(mock_tapis_files, monkeypatch):
+    calls = []
+
+    class CountingViT:
+        def __init__(self, model_name=None):
+            pass
+
+        def classify_image(self, image):
+            calls.append(image)
+            return [Prediction(label="mock-label", score=0.99)]
+
+    monkeypatch.setattr(processor, "MODEL_REGISTRY", {MODEL: CountingViT})
+    files = [
+        TapisFile(systemId="designsafe.storage.default", path=f"/burst_{i}.jpg")
+        for i in range(3)
+    ]
+
+    response = run_model_on_tapis_images(files, USER, MODEL, dedup=True)
+
+    assert len(calls) == 1
+    assert [r.duplicateOf for r in response.results] == [
+        None,
+        "/burst_0.jpg",
+        "/burst_0.jpg",
+    ]
+    assert [r.predictions for r in response.results[1:]] == [
+        response.results[0].predictions
+    ] * 2
+    assert response.results[2].metadata is not None
+    assert response.results[0].phash == response.results[2].phash
+
+
+def test_dedup_cache_reuses_results_of_earlier_jobs(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task, monkeypatch
+):
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/a.jpg"}],
+        "model": MODEL,
+        "dedup": True,
+    }
+    client_authed.post("/inference/jobs", json=payload)
+
+    def _fail(self, image):
+        raise AssertionError("classified again")
+
+    monkeypatch.setattr(processor.MODEL_REGISTRY[MODEL], "classify_image", _fail)
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+    payload["files"][0]["path"] = "/b.jpg"
+    payload["dedupCache"] = True
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    result = client_authed.get(f"/inference/jobs/{job_id}").json()["result"]
+    assert result["results"][0]["predictions"][0]["label"] == "mock-label"
+    assert result["results"][0]["duplicateOf"] == "/a.jpg"
+
+
+def test_jpegs_are_hashed_from_a_reduced_decode(tmp_path):
+    path = tmp_path / "scene.jpg"
+    _scene((40, 40, 160, 160)).resize((3200, 2400)).save(path)
+
+    with Image.open(path) as image:
+        value = dhash(image)
+        assert image.size == (3200, 2400)  # not drafted in place
+        full = dhash(image.convert("RGB"))
+
+    assert bin(value ^ full).count("1") <= 4
@@ -0,0 +1,322 @@
+"""Per-project index of CLIP image embeddings for similar-image search.
+
+Layout on disk (one directory per model + Tapis system + user; each user only
+searches the images their own jobs indexed, since shared systems such as
+designsafe.storage.default hold every user's private files):
+
+    <EMBEDDINGS_DIR>/<model>/<system>/<username>/
+        vectors.f32   raw float32 rows (N x dim), appended as images are indexed
+        index.json    {"dim": dim, "paths": [...]}; row i belongs to paths[i]
+        coarse.npz    optional coarse (IVF) index over the first `built_count` rows
+
+The vector matrix is memory-mapped read-only for search, so a 100k image
+project is only paged in once and a query is a single matrix-vector product.
+For large projects a coarse quantized index restricts the scan to the rows
+whose cluster centroid is closest to the query.
+"""
+
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from imageinf.utils.config import EMBEDDINGS_DIR
+
+logger = logging.getLogger(__name__)
+
+# Build the coarse index once a project has this many images ...
+COARSE_INDEX_MIN_ROWS = int(os.getenv("EMBEDDING_COARSE_INDEX_MIN_ROWS", "20000"))
+# ... and rebuild it when this fraction of rows is not yet covered by it
+COARSE_INDEX_REBUILD_FRACTION = 0.2
+COARSE_INDEX_TRAIN_SAMPLE = 20000
+COARSE_INDEX_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+
+
+class EmbeddingIndex:
+    """Exact (and optionally coarse-quantized) nearest neighbour search."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.dim: Optional[int] = None
+        self.paths: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._coarse: Optional[Dict[str, np.ndarray]] = None
+        self._loaded_mtime: Optional[int] = None
+        self.reload()
+
+    @classmethod
+    def for_project(
+        cls, system_id: str, model_name: str, username: str
+    ) -> "EmbeddingIndex":
+        return cls(_index_dir(system_id, model_name, username))
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.root, "vectors.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    @property
+    def _coarse_path(self) -> str:
+        return os.path.join(self.root, "coarse.npz")
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def is_stale(self) -> bool:
+        """True if another process updated the index since it was loaded."""
+        return _mtime(self._meta_path) != self._loaded_mtime
+
+    def reload(self):
+        self._loaded_mtime = _mtime(self._meta_path)
+        if self._loaded_mtime is None:
+            return
+
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.paths = meta["paths"]
+        self._rows = {p: i for i, p in enumerate(self.paths)}
+        self._vectors = None
+        if self.paths:
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.paths), self.dim),
+            )
+
+        self._coarse = None
+        if os.path.exists(self._coarse_path):
+            with np.load(self._coarse_path) as data:
+                self._coarse = {k: data[k] for k in data.files}
+
+    def vector_for(self, path: str) -> Optional[np.ndarray]:
+        row = self._rows.get(path)
+        if row is None:
+            return None
+        return np.array(self._vectors[row])
+
+    def add(self, paths: List[str], vectors: np.ndarray):
+        """Insert or replace the embeddings for `paths` (one row per path)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(paths) != vectors.shape[0]:
+            raise ValueError("Expected one embedding row per path")
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock():
+            # Pick up rows written by other workers before appending
+            self.reload()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif self.dim != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dim {vectors.shape[1]} does not match index "
+                    f"dim {self.dim}"
+                )
+
+            # Later duplicates in the same call win
+            latest = {p: i for i, p in enumerate(paths)}
+            existing = [
+                (self._rows[p], i) for p, i in latest.items() if p in self._rows
+            ]
+            new = [(p, i) for p, i in latest.items() if p not in self._rows]
+
+            if existing:
+                self._vectors = None  # release the read-only map before writing
+                rows = np.memmap(
+                    self._vectors_path,
+                    dtype=np.float32,
+                    mode="r+",
+                    shape=(len(self.paths), self.dim),
+                )
+                for row, i in existing:
+                    rows[row] = vectors[i]
+                rows.flush()
+                del rows
+
+            if new:
+                # Drop rows left behind by an append that never made it into
+                # index.json (e.g. a worker killed mid-write)
+                if os.path.exists(self._vectors_path):
+                    os.truncate(self._vectors_path, len(self.paths) * self.dim * 4)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors[[i for _, i in new]].tobytes())
+
+            self.paths = self.paths + [p for p, _ in new]
+            _atomic_write_json(self._meta_path, {"dim": self.dim, "paths": self.paths})
+
+            if self._needs_coarse_rebuild():
+                self.reload()
+                self._build_coarse_index()
+
+        self.reload()
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_n: int = 10,
+        exclude_path: Optional[str] = None,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> List[Tuple[str, float]]:
+        """Return the `top_n` (path, cosine similarity) pairs nearest `query`."""
+        if not self.paths:
+            return []
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        candidates = self._candidate_rows(query, nprobe)
+        if candidates is not None and len(candidates) == 0:
+            return []
+        if candidates is None:
+            scores = self._vectors @ query
+            rows = None
+        else:
+            scores = self._vectors[candidates] @ query
+            rows = candidates
+
+        exclude_row = self._rows.get(exclude_path) if exclude_path else None
+        k = min(top_n + (exclude_row is not None), scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            row = int(i if rows is None else rows[i])
+            if row == exclude_row:
+                continue
+            results.append((self.paths[row], float(scores[i])))
+        return results[:top_n]
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """Rows to scan via the coarse index, or None for an exact scan."""
+        if self._coarse is None:
+            return None
+
+        centroids = self._coarse["centroids"]
+        offsets = self._coarse["list_offsets"]
+        list_rows = self._coarse["list_rows"]
+        built_count = int(self._coarse["built_count"])
+
+        if nprobe >= centroids.shape[0]:
+            return None
+
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        parts = [list_rows[slice(offsets[c], offsets[c + 1])] for c in probe]
+        # Rows indexed after the last build are always scanned exactly
+        parts.append(np.arange(built_count, len(self.paths), dtype=np.int64))
+        return np.concatenate(parts)
+
+    def _needs_coarse_rebuild(self) -> bool:
+        if len(self.paths) < COARSE_INDEX_MIN_ROWS:
+            return False
+        built_count = 0
+        if os.path.exists(self._coarse_path):
+            with np.load(self._coarse_path) as data:
+                built_count = int(data["built_count"])
+        unindexed = len(self.paths) - built_count
+        return unindexed >= COARSE_INDEX_REBUILD_FRACTION * len(self.paths)
+
+    def _build_coarse_index(self):
+        """Cluster rows with spherical k-means; store rows grouped by cluster."""
+        n = len(self.paths)
+        n_lists = max(1, int(np.sqrt(n)))
+        vectors = self._vectors
+        rng = np.random.default_rng(0)
+
+        sample_idx = rng.choice(
+            n, size=min(n, COARSE_INDEX_TRAIN_SAMPLE), replace=False
+        )
+        sample = np.asarray(vectors[np.sort(sample_idx)])
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)]
+
+        for _ in range(COARSE_INDEX_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        # Assign every row in chunks to keep peak memory bounded
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            end = min(start + 8192, n)
+            chunk = np.asarray(vectors[start:end])
+            assign[start:end] = np.argmax(chunk @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        tmp_path = self._coarse_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=centroids.astype(np.float32),
+            list_offsets=offsets.astype(np.int64),
+            list_rows=order.astype(np.int64),
+            built_count=np.int64(n),
+        )
+        os.replace(tmp_path, self._coarse_path)
+        logger.info(
+            "Built coarse embedding index: %s rows=%d lists=%d", self.root, n, n_lists
+        )
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_LOADED_INDEXES: Dict[str, EmbeddingIndex] = {}
+
+
+def load_embedding_index(
+    system_id: str, model_name: str, username: str
+) -> EmbeddingIndex:
+    """Return a process-wide cached index, reloading it if it changed on disk."""
+    root = _index_dir(system_id, model_name, username)
+    index = _LOADED_INDEXES.get(root)
+    if index is None:
+        index = _LOADED_INDEXES[root] = EmbeddingIndex(root)
+    elif index.is_stale():
+        index.reload()
+    return index
+
+
+def _index_dir(system_id: str, model_name: str, username: str) -> str:
+    return os.path.join(
+        EMBEDDINGS_DIR,
+        model_name.replace("/", "__"),
+        system_id.replace("/", "__"),
+        username.replace("/", "__"),
+    )
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _atomic_write_json(path: str, data: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+from imageinf.inference import embeddings
+from imageinf.inference.embeddings import EmbeddingIndex, load_embedding_index
+
+
+def _unit(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_add_and_search_exact():
+    index = EmbeddingIndex.for_project(
+        "project-1", "openai/clip-vit-large-patch14", "alice"
+    )
+    index.add(["/a.jpg", "/b.jpg", "/c.jpg"], _unit([[1, 0, 0], [0, 1, 0], [1, 1, 0]]))
+
+    results = index.search(np.array([1, 0.1, 0]), top_n=2)
+
+    assert [path for path, _ in results] == ["/a.jpg", "/c.jpg"]
+    assert results[0][1] > results[1][1]
+
+
+def test_search_excludes_query_path():
+    index = EmbeddingIndex.for_project(
+        "project-1", "openai/clip-vit-large-patch14", "alice"
+    )
+    index.add(["/a.jpg", "/b.jpg"], _unit([[1, 0], [0.9, 0.1]]))
+
+    results = index.search(index.vector_for("/a.jpg"), top_n=5, exclude_path="/a.jpg")
+
+    assert [path for path, _ in results] == ["/b.jpg"]
+
+
+def test_add_replaces_existing_rows_and_persists():
+    model = "openai/clip-vit-large-patch14"
+    index = EmbeddingIndex.for_project("project-1", model, "alice")
+    index.add(["/a.jpg", "/b.jpg"], _unit([[1, 0], [0, 1]]))
+    index.add(["/a.jpg", "/c.jpg"], _unit([[0, 1], [1, 1]]))
+
+    reloaded = load_embedding_index("project-1", model, "alice")
+
+    assert reloaded.paths == ["/a.jpg", "/b.jpg", "/c.jpg"]
+    np.testing.assert_allclose(reloaded.vector_for("/a.jpg"), [0, 1])
+
+
+def test_coarse_index_finds_nearest_cluster(monkeypatch):
+    monkeypatch.setattr(embeddings, "COARSE_INDEX_MIN_ROWS", 100)
+    rng = np.random.default_rng(1)
+    centers = _unit(rng.normal(size=(4, 16)))
+    vectors = _unit(np.repeat(centers, 100, axis=0) + 0.05 * rng.normal(size=(400, 16)))
+    paths = [f"/img_{i}.jpg" for i in range(400)]
+
+    index = EmbeddingIndex.for_project(
+        "project-1", "openai/clip-vit-large-patch14", "alice"
+    )
+    index.add(paths, vectors)
+
+    assert index._coarse is not None
+    approx = index.search(centers[2], top_n=10, nprobe=4)
+    exact = index.search(centers[2], top_n=10, nprobe=len(index))
+    assert [path for path, _ in approx] == [path for path, _ in exact]
+
+
+def test_index_dir_stays_under_embeddings_dir():
+    root = embeddings._index_dir("../../other", "openai/clip", "../alice")
+
+    relative = os.path.relpath(root, embeddings.EMBEDDINGS_DIR)
+    assert len(relative.split(os.sep)) == 3
+    assert ".." not in relative.split(os.sep)
@@ -0,0 +1,79 @@
+"""Per-user caps on concurrently running bulk (async) inference jobs.
+
+Bulk jobs go to their own queue (see imageinf.celery_app), so interactive
+requests never wait behind them. Within the bulk lane, a user may run at most
+USER_BULK_CONCURRENCY jobs at once: a worker picking up a job beyond the cap
+re-queues it after FAIR_SHARE_RETRY_DELAY seconds, letting other users' jobs
+behind it run first.
+
+Running jobs hold per-task leases in Redis (the Celery result backend, or
+FAIR_SHARE_REDIS_URL): a sorted set per user of task ids scored by the time
+their lease expires. Expired leases are pruned on every acquire, so a slot
+leaked by a worker that was killed (hard time limit, OOM) frees itself after
+SLOT_TTL even while the user's other jobs keep retrying. Without Redis, jobs
+are not capped.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 = no per-user cap
+USER_BULK_CONCURRENCY = int(os.getenv("USER_BULK_CONCURRENCY", "2"))
+FAIR_SHARE_RETRY_DELAY = int(os.getenv("FAIR_SHARE_RETRY_DELAY", "10"))
+FAIR_SHARE_REDIS_URL = os.getenv("FAIR_SHARE_REDIS_URL") or os.getenv(
+    "CELERY_RESULT_BACKEND"
+)
+
+# Lease length; longer than the task hard time limit (see imageinf.celery_app)
+SLOT_TTL = 600
+
+
+class UserSlots:
+    def __init__(self, client, limit: int, ttl: int = SLOT_TTL):
+        self.client = client
+        self.limit = limit
+        self.ttl = ttl
+
+    def _key(self, username: str) -> str:
+        return f"imageinf:bulk-slots:{username}"
+
+    def try_acquire(self, username: str, task_id: str) -> bool:
+        key = self._key(username)
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {task_id: now + self.ttl})
+        pipe.zcard(key)
+        running = pipe.execute()[2]
+        if running > self.limit:
+            self.client.zrem(key, task_id)
+            return False
+        self.client.expire(key, self.ttl)
+        return True
+
+    def release(self, username: str, task_id: str):
+        self.client.zrem(self._key(username), task_id)
+
+
+_user_slots: Optional[UserSlots] = None
+
+
+def get_user_slots() -> Optional[UserSlots]:
+    """Shared per-user slot counter, or None when jobs are not capped."""
+    global _user_slots
+
+    if not USER_BULK_CONCURRENCY or not (FAIR_SHARE_REDIS_URL or "").startswith(
+        ("redis://", "rediss://")
+    ):
+        return None
+    if _user_slots is None:
+        import redis
+
+        _user_slots = UserSlots(
+            redis.Redis.from_url(FAIR_SHARE_REDIS_URL), USER_BULK_CONCURRENCY
+        )
+    return _user_slots
@@ -0,0 +1,140 @@
+import pytest
+from celery.exceptions import Retry
+
+from imageinf.inference import fair_share
+from imageinf.inference.fair_share import UserSlots
+from imageinf.inference.tasks import run_inference_task
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.values.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.values.get(key, {}).pop(member, None)
+        if not self.values.get(key):
+            self.values.pop(key, None)
+
+    def zremrangebyscore(self, key, low, high):
+        for member, score in list(self.values.get(key, {}).items()):
+            if float(low) <= score <= float(high):
+                self.zrem(key, member)
+
+    def zcard(self, key):
+        return len(self.values.get(key, {}))
+
+    def expire(self, key, ttl):
+        return True
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+USER_DATA = {
+    "username": "testuser",
+    "tapis_token": "fake-token",
+    "tenant_host": "https://designsafe.tapis.io",
+}
+FILES = [{"systemId": "designsafe.storage.default", "path": "/path/to/test-image.jpg"}]
+
+
+def test_user_slots_cap_concurrent_jobs_per_user():
+    slots = UserSlots(FakeRedis(), limit=2)
+
+    assert slots.try_acquire("alice", "job-1")
+    assert slots.try_acquire("alice", "job-2")
+    assert not slots.try_acquire("alice", "job-3")
+    assert slots.try_acquire("bob", "job-4")
+
+    slots.release("alice", "job-1")
+    assert slots.try_acquire("alice", "job-3")
+
+
+def test_leaked_slots_expire_while_jobs_keep_retrying(monkeypatch):
+    slots = UserSlots(FakeRedis(), limit=1, ttl=600)
+    clock = [1000.0]
+    monkeypatch.setattr(fair_share.time, "time", lambda: clock[0])
+
+    assert slots.try_acquire("alice", "killed-job")  # never released
+    for _ in range(10):
+        clock[0] += 60
+        if slots.try_acquire("alice", "queued-job"):
+            break
+
+    assert clock[0] - 1000.0 >= 600
+    assert list(slots.client.values["imageinf:bulk-slots:alice"]) == ["queued-job"]
+
+
+@pytest.fixture
+def capped_user(monkeypatch):
+    slots = UserSlots(FakeRedis(), limit=1)
+    monkeypatch.setattr(fair_share, "get_user_slots", lambda: slots)
+    return slots
+
+
+def test_bulk_job_over_the_cap_is_requeued(
+    capped_user, mock_tapis_files, mock_tapis_auth, mock_vit
+):
+    assert capped_user.try_acquire("testuser", "other-job")  # another job is running
+
+    with pytest.raises(Retry):
+        run_inference_task(FILES, USER_DATA, "google/vit-base-patch16-224")
+
+    result = run_inference_task(
+        FILES, USER_DATA, "google/vit-base-patch16-224", interactive=True
+    )
+    assert len(result["results"]) == 1
+
+
+def test_slot_is_released_when_the_job_ends(
+    capped_user, mock_tapis_files, mock_tapis_auth, mock_vit
+):
+    run_inference_task(FILES, USER_DATA, "google/vit-base-patch16-224")
+
+    with pytest.raises(ValueError):
+        run_inference_task(FILES, USER_DATA, "nonexistent/model")
+
+    assert capped_user.client.values == {}
+
+
+def test_fair_share_requeues_do_not_use_up_admission_retries(
+    capped_user, mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    from imageinf.inference import admission, processor
+
+    def defer(*args, **kwargs):
+        raise admission.ModelAdmissionError("model", 2, 1, retryable=True)
+
+    monkeypatch.setattr(processor, "plan_admission", defer)
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+    retried = []
+
+    def record_retry(self, **kwargs):
+        retried.append(kwargs)
+        return Retry()
+
+    monkeypatch.setattr(
+        type(run_inference_task._get_current_object()), "retry", record_retry
+    )
+
+    # Already re-queued 20 times by fair share
+    run_inference_task.apply(
+        args=(FILES, USER_DATA, "google/vit-base-patch16-224"), retries=20
+    )
+
+    assert retried[0]["kwargs"]["admission_retries"] == 1
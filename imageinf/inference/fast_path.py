@@ -0,0 +1,170 @@
+"""Optional in-process fast path for small synchronous jobs.
+
+When SYNC_FAST_PATH_ENABLED is set, the API process starts a small pool of
+worker processes (so inference never runs on the event loop) that keep the
+models in SYNC_FAST_PATH_MODELS warm. Small sync requests for those models
+are served directly by the pool, skipping the broker round-trip and result
+backend polling. Requests for other models, or arriving while every pool
+process is busy, fall back to Celery, as do requests that find the pool broken
+(a child process died); the pool is then restarted in the background.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from .config import DEFAULT_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+SYNC_FAST_PATH_ENABLED = os.getenv("SYNC_FAST_PATH_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+SYNC_FAST_PATH_MODELS = [
+    m.strip()
+    for m in os.getenv("SYNC_FAST_PATH_MODELS", DEFAULT_MODEL_NAME).split(",")
+    if m.strip()
+]
+SYNC_FAST_PATH_WORKERS = int(os.getenv("SYNC_FAST_PATH_WORKERS", "1"))
+SYNC_FAST_PATH_MAX_FILES = int(os.getenv("SYNC_FAST_PATH_MAX_FILES", "5"))
+
+
+def _init_worker(model_names: List[str]):
+    """Pool process initializer: load and keep the fast-path models resident."""
+    from imageinf.inference import processor
+
+    processor.MODEL_CACHE_SIZE = len(model_names)
+    for model_name in model_names:
+        processor.load_model(model_name)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _run_inference(
+    files: List[dict],
+    user_data: dict,
+    model: str,
+    labels: Optional[List[str]],
+    sensitivity: Optional[str],
+    output: Optional[dict] = None,
+) -> dict:
+    from imageinf.inference.compact import project_response
+    from imageinf.inference.processor import run_model_on_tapis_images
+    from imageinf.inference.models import OutputOptions, TapisFile
+    from imageinf.utils.auth import TapisUser
+
+    result = run_model_on_tapis_images(
+        [TapisFile(**f) for f in files],
+        TapisUser(**user_data),
+        model,
+        labels=labels,
+        sensitivity=sensitivity,
+    )
+    result = project_response(result, OutputOptions(**output) if output else None)
+    return result.model_dump(mode="json")
+
+
+class InProcessModelPool:
+    """Warm model pool in child processes, used from the API event loop."""
+
+    def __init__(self, model_names: List[str], workers: int):
+        self.model_names = model_names
+        self.workers = workers
+        self.in_flight = 0
+        self.ready = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        # "spawn" so children do not inherit the event loop or its threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_names,),
+        )
+        # Processes start on demand; one ping per worker brings them all up
+        warmups = [self._executor.submit(_ping) for _ in range(self.workers)]
+        pending = set(warmups)
+
+        def _on_warm(future):
+            pending.discard(future)
+            if future.exception() is not None:
+                logger.error("Fast path warm-up failed: %s", future.exception())
+                return
+            if not pending and all(f.exception() is None for f in warmups):
+                self.ready = True
+                logger.info("Fast path ready: models=%s", self.model_names)
+
+        for future in warmups:
+            future.add_done_callback(_on_warm)
+
+    def shutdown(self):
+        self.ready = False
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def can_serve(self, model_name: str, n_files: int) -> bool:
+        return (
+            self.ready
+            and model_name in self.model_names
+            and n_files <= SYNC_FAST_PATH_MAX_FILES
+            and self.in_flight < self.workers
+        )
+
+    async def run(
+        self,
+        files: List[dict],
+        user_data: dict,
+        model: str,
+        labels: Optional[List[str]],
+        sensitivity: Optional[str],
+        timeout: float,
+        output: Optional[dict] = None,
+    ) -> dict:
+        """Run a job on the pool. Raises BrokenProcessPool if a child process
+        died; the caller should send the job elsewhere."""
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            future = loop.run_in_executor(
+                executor,
+                _run_inference,
+                files,
+                user_data,
+                model,
+                labels,
+                sensitivity,
+                output,
+            )
+            # Count the process as busy until the job really finishes, even if
+            # the caller gives up waiting on it
+            self.in_flight += 1
+            future.add_done_callback(self._release)
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+    def _release(self, _future):
+        self.in_flight -= 1
+
+    def _restart(self, broken: Optional[ProcessPoolExecutor]):
+        # Concurrent requests all see the same broken executor; only the first
+        # replaces it. The new pool serves again once it has warmed up.
+        if self._executor is not broken:
+            return
+        logger.error("Fast path pool is broken, restarting it")
+        self.shutdown()
+        self.start()
+
+
+fast_path_pool = InProcessModelPool(SYNC_FAST_PATH_MODELS, SYNC_FAST_PATH_WORKERS)
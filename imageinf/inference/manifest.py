@@ -0,0 +1,97 @@
+"""Static description of the available models.
+
+Importable without torch/transformers, so the API process can list models
+and validate requests without loading the ML stack. `module` is where the
+runner class is registered (with `register_model_runner`); workers import it
+on first use. `params` is the approximate parameter count.
+"""
+
+import os
+
+MODEL_MANIFEST = {
+    "google/vit-base-patch16-224": {
+        "type": "vit",
+        "description": "Vision Transformer (ViT) base model - 86M params, 224x224",
+        "link": "https://huggingface.co/google/vit-base-patch16-224",
+        "module": "imageinf.inference.vit_models",
+        "params": 86_000_000,
+    },
+    "google/vit-large-patch16-224": {
+        "type": "vit",
+        "description": "Vision Transformer (ViT) large model - 304M params, 224x224",
+        "link": "https://huggingface.co/google/vit-large-patch16-224",
+        "module": "imageinf.inference.vit_models",
+        "params": 304_000_000,
+    },
+    "google/vit-large-patch16-384": {
+        "type": "vit",
+        "description": (
+            "Vision Transformer (ViT) large model - 304M params, 384x384 (high res)"
+        ),
+        "link": "https://huggingface.co/google/vit-large-patch16-384",
+        "module": "imageinf.inference.vit_models",
+        "params": 304_000_000,
+    },
+    "microsoft/swin-large-patch4-window7-224": {
+        "type": "vit",
+        "description": "Swin Transformer large - 197M params, 224x224",
+        "link": "https://huggingface.co/microsoft/swin-large-patch4-window7-224",
+        "module": "imageinf.inference.vit_models",
+        "params": 197_000_000,
+    },
+    "openai/clip-vit-large-patch14": {
+        "type": "clip",
+        "description": "CLIP ViT-Large - zero-shot multi-label (~400M params)",
+        "link": "https://huggingface.co/openai/clip-vit-large-patch14",
+        "module": "imageinf.inference.clip_models",
+        "params": 428_000_000,
+    },
+    "wkcn/TinyCLIP-ViT-40M-32-Text-19M-LAION400M": {
+        "type": "clip",
+        "description": "TinyCLIP - efficient zero-shot classifier (~59M params total)",
+        "link": "https://huggingface.co/wkcn/TinyCLIP-ViT-40M-32-Text-19M-LAION400M",
+        "module": "imageinf.inference.clip_models",
+        "params": 59_000_000,
+    },
+    "laion/CLIP-ViT-H-14-laion2B-s32B-b79K": {
+        "type": "clip",
+        "description": "CLIP ViT-Huge - highest accuracy zero-shot (~1B params)",
+        "link": "https://huggingface.co/laion/CLIP-ViT-H-14-laion2B-s32B-b79K",
+        "module": "imageinf.inference.clip_models",
+        "params": 986_000_000,
+    },
+}
+
+# Random-weight test models (see tiny_models.py), served only when enabled
+TINY_VIT = "imageinf-test/tiny-vit"
+TINY_SWIN = "imageinf-test/tiny-swin"
+TINY_CLIP = "imageinf-test/tiny-clip"
+
+TINY_MODEL_MANIFEST = {
+    TINY_VIT: {
+        "type": "vit",
+        "description": "Tiny random-weight ViT for tests and benchmarks",
+        "module": "imageinf.inference.tiny_models",
+        "params": 30_000,
+    },
+    TINY_SWIN: {
+        "type": "vit",
+        "description": "Tiny random-weight Swin Transformer for tests and benchmarks",
+        "module": "imageinf.inference.tiny_models",
+        "params": 15_000,
+    },
+    TINY_CLIP: {
+        "type": "clip",
+        "description": "Tiny random-weight CLIP for tests and benchmarks",
+        "module": "imageinf.inference.tiny_models",
+        "params": 75_000,
+    },
+}
+
+TINY_MODELS_ENABLED = os.getenv("TINY_MODELS_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+if TINY_MODELS_ENABLED:
+    MODEL_MANIFEST.update(TINY_MODEL_MANIFEST)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -8,6 +8,39 @@ class TapisFile(BaseModel):
     path: str
 
 
+class TapisDirectory(BaseModel):
+    """A directory whose matching images are expanded by the worker."""
+
+    systemId: str
+    path: str
+    include: List[str] = ["*.jpg", "*.jpeg", "*.png", "*.tif", "*.tiff"]
+    exclude: List[str] = []
+    maxDepth: int = Field(0, ge=0, le=20)  # 0 = only this directory
+
+
+class TilingOptions(BaseModel):
+    """Classify overlapping tiles of large (e.g. aerial/drone) images instead of
+    the whole image squashed to the model's input size."""
+
+    tileSize: int = Field(1024, ge=64, le=8192)  # in original image pixels
+    overlap: float = Field(0.25, ge=0.0, le=0.9)
+    batchSize: Optional[int] = Field(None, ge=1, le=128)  # default: per model
+    returnTiles: bool = False  # include per-tile predictions (for mapping)
+
+
+class OutputOptions(BaseModel):
+    """Parts of the result to return. Applied in the worker, so it also shrinks
+    what is kept in the Celery result backend. The durable result store keeps
+    everything and applies the options when GET /jobs/{id} reads it back."""
+
+    fields: List[Literal["results", "aggregated_results", "metadata"]] = [
+        "results",
+        "aggregated_results",
+        "metadata",
+    ]
+    topK: Optional[int] = Field(None, ge=1, le=100)  # predictions per file
+
+
 class Prediction(BaseModel):
     label: str
     score: float
@@ -24,11 +57,27 @@ class ImageMetadata(BaseModel):
     camera_model: Optional[str] = None
 
 
+class TilePrediction(BaseModel):
+    """Predictions for one tile of a tiled image, in original pixel coordinates."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+    predictions: List[Prediction]
+
+
 class InferenceResult(BaseModel):
     systemId: str
     path: str
     predictions: List[Prediction]
     metadata: Optional[ImageMetadata] = None
+    tiles: Optional[List[TilePrediction]] = None  # tiled inference with returnTiles
+    error: Optional[str] = None  # file skipped (e.g. over the image size limits)
+    phash: Optional[str] = None  # perceptual hash (jobs with dedup)
+    duplicateOf: Optional[str] = None  # path whose predictions were reused
+    # File digest confirming cross-job dedup matches; stored, never returned
+    digest: Optional[str] = Field(default=None, exclude=True)
 
 
 class InferenceResponse(BaseModel):
@@ -37,11 +86,67 @@ class InferenceResponse(BaseModel):
     results: List[InferenceResult]
 
 
+class EnsembleResponse(BaseModel):
+    """Results of several models run in one job over the same images."""
+
+    models: List[str]
+    responses: List[InferenceResponse]  # one per model, in request order
+    combined_results: Optional[List[InferenceResult]] = None
+
+
 class InferenceRequest(BaseModel):
-    inferenceType: str = "classification"
-    files: List[TapisFile]
-    model: str = ("google/vit-base-patch16-224",)
+    # "metadata": only read EXIF metadata (GPS, time taken), no model is run
+    inferenceType: Literal["classification", "metadata"] = "classification"
+    files: List[TapisFile] = []
+    directories: List[TapisDirectory] = []  # async jobs only
+    model: str = "google/vit-base-patch16-224"
+    models: List[str] = []  # several models in one job (async jobs only)
+    combine: bool = False  # also return scores averaged across `models`
+    tiling: Optional[TilingOptions] = None  # async jobs only
+    dedup: bool = False  # reuse predictions for near-duplicate images in the job
+    dedupCache: bool = False  # ... and for identical images in earlier jobs
+    output: Optional[OutputOptions] = None  # default: everything
     labels: Optional[List[str]] = None  # used in CLIP only
     sensitivity: Optional[Literal["high", "medium", "low"]] = (
         "medium"  # used in CLIP only
     )
+
+    @model_validator(mode="after")
+    def check_inputs(self):
+        if not self.files and not self.directories:
+            raise ValueError("Provide 'files' and/or 'directories'")
+        if len(set(self.models)) != len(self.models):
+            raise ValueError("'models' must not contain duplicates")
+        return self
+
+    @property
+    def model_names(self) -> List[str]:
+        """Models to run: `models` if given, otherwise `model`."""
+        return self.models or [self.model]
+
+
+class SimilarImageRequest(BaseModel):
+    """Find images in a project (Tapis system) similar to an image or text."""
+
+    systemId: str
+    model: str = "openai/clip-vit-large-patch14"
+    path: Optional[str] = None  # query image
+    text: Optional[str] = None  # or a text prompt
+    topN: int = Field(10, ge=1, le=100)
+
+    @model_validator(mode="after")
+    def check_query(self):
+        if (self.path is None) == (self.text is None):
+            raise ValueError("Provide exactly one of 'path' or 'text'")
+        return self
+
+
+class SimilarImage(BaseModel):
+    systemId: str
+    path: str
+    score: float
+
+
+class SimilarImageResponse(BaseModel):
+    model: str
+    results: List[SimilarImage]
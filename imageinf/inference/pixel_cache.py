@@ -0,0 +1,78 @@
+"""Cache of preprocessed (resized, normalized) model inputs.
+
+Many of the registered models preprocess to the same geometry and
+normalization (e.g. the 224px ViT models, or the CLIP variants), so once one
+of them has processed a project the others can skip decoding and resizing.
+
+Entries are keyed by the image content and the image processor settings, and
+stored as .npy files that are memory-mapped on read. Enable with
+PIXEL_CACHE_ENABLED=true.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+from PIL import Image
+
+from imageinf.utils.config import PIXEL_CACHE_DIR
+
+PIXEL_CACHE_ENABLED = os.getenv("PIXEL_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+def cached_pixel_values(
+    image_processor, image: Image.Image, compute: Callable[[], torch.Tensor]
+) -> torch.Tensor:
+    """Return `compute()` (the processor's pixel_values for `image`), reusing
+    a cached copy made by any processor with the same settings."""
+    if not PIXEL_CACHE_ENABLED:
+        return compute()
+
+    key = _cache_key(image_processor, image)
+    if key is None:
+        return compute()
+
+    path = os.path.join(PIXEL_CACHE_DIR, key[:2], key + ".npy")
+    try:
+        return torch.from_numpy(np.array(np.load(path, mmap_mode="r")))
+    except (FileNotFoundError, ValueError):
+        pass
+
+    pixel_values = compute()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, pixel_values.cpu().numpy())
+    os.replace(tmp_path, path)
+    return pixel_values
+
+
+def processor_fingerprint(image_processor) -> str:
+    """Hash of the settings that determine the processor output (class names
+    and other bookkeeping keys are ignored, so equivalent processors match)."""
+    settings = {
+        k: v
+        for k, v in image_processor.to_dict().items()
+        if not k.startswith("_") and not k.endswith(("_type", "_class"))
+    }
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _cache_key(image_processor, image: Image.Image) -> Optional[str]:
+    # Only images opened from a (cached) file have content we can hash
+    filename = getattr(image, "filename", None)
+    if not filename:
+        return None
+
+    with open(filename, "rb") as f:
+        content = hashlib.file_digest(f, "sha1").hexdigest()
+    return f"{content}-{processor_fingerprint(image_processor)[:16]}"
@@ -0,0 +1,58 @@
+import pytest
+import torch
+from PIL import Image
+from transformers import CLIPImageProcessor, ViTImageProcessor
+
+from imageinf.inference import pixel_cache
+from imageinf.inference.pixel_cache import cached_pixel_values, processor_fingerprint
+
+
+@pytest.fixture
+def image_file(tmp_path, mock_photo_file_with_location):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(mock_photo_file_with_location)
+    return Image.open(path)
+
+
+def _counting(processor, image, calls):
+    def compute():
+        calls.append(1)
+        return processor(images=image, return_tensors="pt").pixel_values
+
+    return compute
+
+
+def test_same_geometry_processors_share_cached_pixels(image_file, monkeypatch):
+    monkeypatch.setattr(pixel_cache, "PIXEL_CACHE_ENABLED", True)
+    first, second = ViTImageProcessor(), ViTImageProcessor()
+    calls = []
+
+    a = cached_pixel_values(first, image_file, _counting(first, image_file, calls))
+    b = cached_pixel_values(second, image_file, _counting(second, image_file, calls))
+
+    assert len(calls) == 1
+    assert torch.equal(a, b)
+
+
+def test_different_preprocessing_is_cached_separately(image_file, monkeypatch):
+    monkeypatch.setattr(pixel_cache, "PIXEL_CACHE_ENABLED", True)
+    vit, clip = ViTImageProcessor(), CLIPImageProcessor()
+    calls = []
+
+    cached_pixel_values(vit, image_file, _counting(vit, image_file, calls))
+    cached_pixel_values(clip, image_file, _counting(clip, image_file, calls))
+
+    assert processor_fingerprint(vit) != processor_fingerprint(clip)
+    assert len(calls) == 2
+
+
+def test_disabled_cache_always_computes(image_file):
+    processor = ViTImageProcessor()
+    calls = []
+
+    for _ in range(2):
+        cached_pixel_values(
+            processor, image_file, _counting(processor, image_file, calls)
+        )
+
+    assert len(calls) == 2
@@ -0,0 +1,68 @@
+"""Numeric precision of model forward passes.
+
+On CPUs with native bfloat16 support (AVX512-BF16 or AMX, e.g. Xeon Sapphire
+Rapids and later) running the transformer layers under bfloat16 autocast is
+much faster than fp32, at the cost of small score drift (see
+scripts/benchmark_precision.py). INFERENCE_PRECISION selects the mode for the
+deployment:
+
+- "auto" (default): bf16 on CPUs that support it, otherwise fp32; a model can
+  pin its own precision with a "precision" key in MODEL_MANIFEST
+- "fp32" / "bf16": force the mode for every model
+
+bf16 is only used on CPU; GPU/MPS devices keep running fp32.
+"""
+
+import contextlib
+import functools
+import logging
+import os
+
+import torch
+
+from .manifest import MODEL_MANIFEST
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "bf16")
+
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "auto").lower()
+
+# CPU flags (from /proc/cpuinfo) indicating native bfloat16 matrix instructions
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+@functools.lru_cache(maxsize=1)
+def cpu_supports_bf16() -> bool:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    return any(flag in flags for flag in BF16_CPU_FLAGS)
+    except OSError:
+        pass
+    return False
+
+
+def resolve_precision(model_name: str, device: torch.device) -> str:
+    """Precision ("fp32" or "bf16") to run `model_name` with on `device`."""
+    precision = INFERENCE_PRECISION
+    if precision == "auto":
+        precision = MODEL_MANIFEST.get(model_name, {}).get("precision", "auto")
+    if precision == "auto":
+        precision = "bf16" if cpu_supports_bf16() else "fp32"
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision '{precision}'")
+    if precision == "bf16" and device.type != "cpu":
+        logger.info("bf16 precision is CPU only; running %s in fp32", model_name)
+        return "fp32"
+    return precision
+
+
+def autocast(precision: str, device: torch.device):
+    """Context manager running the enclosed forward pass in `precision`."""
+    if precision == "bf16" and device.type == "cpu":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
@@ -0,0 +1,48 @@
+import pytest
+import torch
+
+from imageinf.inference import precision
+from imageinf.inference.precision import autocast, resolve_precision
+
+CPU = torch.device("cpu")
+
+
+@pytest.fixture
+def bf16_cpu(monkeypatch):
+    monkeypatch.setattr(precision, "cpu_supports_bf16", lambda: True)
+
+
+def test_auto_uses_bf16_only_where_supported(bf16_cpu, monkeypatch):
+    assert resolve_precision("google/vit-base-patch16-224", CPU) == "bf16"
+    assert resolve_precision("google/vit-base-patch16-224", torch.device("cuda")) == (
+        "fp32"
+    )
+
+    monkeypatch.setattr(precision, "cpu_supports_bf16", lambda: False)
+    assert resolve_precision("google/vit-base-patch16-224", CPU) == "fp32"
+
+
+def test_manifest_and_deployment_overrides(bf16_cpu, monkeypatch):
+    monkeypatch.setitem(
+        precision.MODEL_MANIFEST,
+        "test/pinned-fp32",
+        {"type": "vit", "module": "", "params": 1, "precision": "fp32"},
+    )
+    assert resolve_precision("test/pinned-fp32", CPU) == "fp32"
+
+    monkeypatch.setattr(precision, "INFERENCE_PRECISION", "bf16")
+    assert resolve_precision("test/pinned-fp32", CPU) == "bf16"
+
+    monkeypatch.setattr(precision, "INFERENCE_PRECISION", "fp16")
+    with pytest.raises(ValueError):
+        resolve_precision("test/pinned-fp32", CPU)
+
+
+def test_autocast_runs_linear_layers_in_bf16():
+    layer = torch.nn.Linear(8, 4)
+    x = torch.randn(2, 8)
+
+    with autocast("bf16", CPU):
+        assert layer(x).dtype == torch.bfloat16
+    with autocast("fp32", CPU):
+        assert layer(x).dtype == torch.float32
@@ -1,17 +1,127 @@
-from typing import List, Optional
+import gc
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from celery.exceptions import SoftTimeLimitExceeded
+from PIL import UnidentifiedImageError
+from tapipy.errors import ForbiddenError, NotFoundError, UnauthorizedError
 from tapipy.tapis import Tapis
 from imageinf.utils.auth import TapisUser
 
-from imageinf.utils.io import get_image_file
+from imageinf.utils.io import ImageTooLargeError, get_image_file, get_image_metadata
+from imageinf.utils.tapis_listing import (
+    RemoteFileStat,
+    iter_directory_files,
+    stat_remote_files,
+)
 
-from .config import DEFAULT_MODEL_NAME
+from .admission import plan_admission
+from .config import DEFAULT_MODEL_NAME, METADATA_ONLY_MODEL
 from .registry import MODEL_REGISTRY, MODEL_METADATA
-from .categories import aggregate_predictions
-from .models import TapisFile, InferenceResult, InferenceResponse
+from .result_store import get_result_store
+from .categories import aggregate_predictions, combine_predictions
+from .dedup import DuplicateIndex, content_digest, dhash, format_hash
+from .embeddings import EmbeddingIndex
+from .models import (
+    EnsembleResponse,
+    ImageMetadata,
+    TapisDirectory,
+    TapisFile,
+    InferenceResult,
+    InferenceResponse,
+    Prediction,
+    TilingOptions,
+)
+from .tiling import classify_tiled, decode_bounded
+
+logger = logging.getLogger(__name__)
+
+
+class TimeLimitReached(Exception):
+    """The task's soft time limit fired during a job; `response` holds the
+    results of the `completed` files before it."""
+
+    def __init__(self, response: Union[InferenceResponse, EnsembleResponse]):
+        super().__init__("Soft time limit reached")
+        self.response = response
+        if isinstance(response, EnsembleResponse):
+            response = response.responses[0]
+        self.completed = len(response.results)
+
 
-# Ensure models are registered
-from . import vit_models  # noqa: F401
-from . import clip_models  # noqa: F401
+# Number of loaded models kept in memory between jobs (0 disables reuse), on
+# top of the models pinned with `pin_models`
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "1"))
+_model_cache = OrderedDict()
+_pinned_models = set()
+
+# Concurrent ranged reads in metadata-only jobs, and files read between checks
+# for cancellation
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "16"))
+METADATA_BATCH_SIZE = METADATA_CONCURRENCY * 4
+
+
+def load_model(
+    model_name: str, labels: Optional[List[str]] = None, pinned: Tuple[str, ...] = ()
+):
+    """Return a model runner, reusing a resident one when possible.
+
+    Raises `ModelAdmissionError` if the model does not fit in memory even after
+    evicting every resident model not listed in `pinned`.
+    """
+    if model_name not in MODEL_REGISTRY:
+        raise ValueError(f"Model '{model_name}' is not supported.")
+
+    model_meta = MODEL_METADATA[model_name]
+    ModelClass = MODEL_REGISTRY[model_name]
+
+    model = _model_cache.pop(model_name, None)
+    if type(model) is not ModelClass:
+        model = None
+        # Evict least recently used models before loading another one
+        unpinned = [
+            name
+            for name in _model_cache
+            if name not in pinned and name not in _pinned_models
+        ]
+        while unpinned and len(unpinned) >= MODEL_CACHE_SIZE:
+            del _model_cache[unpinned.pop(0)]
+
+        evicted = plan_admission(
+            model_name,
+            list(_model_cache),
+            pinned=tuple(pinned) + tuple(_pinned_models),
+        )
+        for name in evicted:
+            logger.info("Evicting %s to make room for %s", name, model_name)
+            del _model_cache[name]
+        if evicted:
+            gc.collect()
+
+        if model_meta["type"] == "clip":
+            # pass labels for CLIP
+            model = ModelClass(model_name, labels=labels)
+        else:
+            model = ModelClass(model_name)
+    elif model_meta["type"] == "clip":
+        model.set_labels(labels)
+
+    if MODEL_CACHE_SIZE > 0 or model_name in _pinned_models:
+        _model_cache[model_name] = model
+    return model
+
+
+def pin_models(model_names: List[str]):
+    """Keep `model_names` loaded for the life of the process: they are never
+    evicted and do not count against MODEL_CACHE_SIZE."""
+    _pinned_models.update(model_names)
+    for model_name in model_names:
+        load_model(model_name)
 
 
 # Public interface: plugin dispatch
@@ -21,61 +131,419 @@ def run_model_on_tapis_images(
     model_name: str = DEFAULT_MODEL_NAME,
     labels: Optional[List[str]] = None,  # only for CLIP
     sensitivity: str = "medium",  # only for CLIP
+    directories: Optional[List[TapisDirectory]] = None,
+    tiling: Optional[TilingOptions] = None,
+    dedup: bool = False,
+    dedup_cache: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+    skip: int = 0,
 ) -> InferenceResponse:
-    if model_name not in MODEL_REGISTRY:
-        raise ValueError(f"Model '{model_name}' is not supported.")
+    return run_models_on_tapis_images(
+        files,
+        user,
+        [model_name],
+        labels=labels,
+        sensitivity=sensitivity,
+        directories=directories,
+        tiling=tiling,
+        dedup=dedup,
+        dedup_cache=dedup_cache,
+        should_stop=should_stop,
+        skip=skip,
+    ).responses[0]
 
-    model_meta = MODEL_METADATA[model_name]
-    ModelClass = MODEL_REGISTRY[model_name]
 
-    if model_meta["type"] == "clip":
-        # pass labels for CLIP
-        model = ModelClass(model_name, labels=labels)
-    else:
-        model = ModelClass(model_name)
+def run_models_on_tapis_images(
+    files: List[TapisFile],
+    user: TapisUser,
+    model_names: List[str],
+    labels: Optional[List[str]] = None,  # only for CLIP
+    sensitivity: str = "medium",  # only for CLIP
+    directories: Optional[List[TapisDirectory]] = None,
+    combine: bool = False,
+    tiling: Optional[TilingOptions] = None,
+    dedup: bool = False,
+    dedup_cache: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+    skip: int = 0,
+) -> EnsembleResponse:
+    """Run several models over the same images; each image is downloaded,
+    decoded and has its EXIF read once, then classified by every model.
+
+    With `tiling`, each image is classified as overlapping tiles (see
+    `tiling.classify_tiled`); tiled CLIP runs are not added to the similarity
+    index, since no single embedding describes the whole image.
+
+    With `dedup`, an image that is a near duplicate of an earlier one in the
+    job (see `dedup`) reuses that image's predictions, and with `dedup_cache`
+    classifier (non-CLIP, untiled) runs reuse the stored results of identical
+    images (same hash and file digest) from the user's earlier jobs. Reused
+    results name their source in `duplicateOf`.
+
+    `should_stop` is checked before each file; once it returns True the
+    results for the files processed so far are returned.
+
+    The first `skip` input files (completed by an earlier part of the job) are
+    passed over. If the Celery soft time limit fires, the file being processed
+    is dropped and `TimeLimitReached` is raised with the results of the files
+    before it."""
+    pinned = tuple(model_names)
+    models = [load_model(name, labels=labels, pinned=pinned) for name in model_names]
 
     tapis = Tapis(base_url=user.tenant_host, access_token=user.tapis_token)
+    remote_stats = _stat_remote_files(tapis, files)
 
-    results = []
-    aggregated_results = []
+    results = {name: [] for name in model_names}
+    aggregated_results = {name: [] for name in model_names}
+    combined_results = []
+    # CLIP image embeddings per (model, system), added to the similarity index
+    embeddings = defaultdict(list)
+    duplicates = DuplicateIndex() if dedup else None
+    store = get_result_store() if dedup and dedup_cache else None
+    reused = 0
 
-    for file in files:
-        try:
-            image, metadata = get_image_file(tapis, file.systemId, file.path)
-
-            if model_meta["type"] == "clip":
-                predictions = model.classify_image(image, sensitivity=sensitivity)
-            else:
-                predictions = model.classify_image(image)
-
-            # Always create detailed results
-            results.append(
-                InferenceResult(
-                    systemId=file.systemId,
-                    path=file.path,
-                    predictions=predictions,
-                    metadata=metadata,
+    input_files = islice(
+        _iter_input_files(tapis, files, directories or [], remote_stats), skip, None
+    )
+    completed = 0
+    embedded = {}
+    time_limited = False
+    try:
+        for file in input_files:
+            if should_stop is not None and should_stop():
+                logger.info(
+                    "Stopping early after %d files", len(results[model_names[0]])
                 )
-            )
+                break
+            # Results of the files before this one, kept if the soft limit fires
+            completed = len(results[model_names[0]])
+            embedded = {key: len(rows) for key, rows in embeddings.items()}
+            try:
+                try:
+                    image, metadata = get_image_file(
+                        tapis,
+                        file.systemId,
+                        file.path,
+                        remote_stat=remote_stats.get((file.systemId, file.path)),
+                    )
+                except ImageTooLargeError as e:
+                    # Reported for this file; the rest of the job goes on
+                    logger.warning("Skipping %s: %s", file.path, e)
+                    skipped = InferenceResult(
+                        systemId=file.systemId,
+                        path=file.path,
+                        predictions=[],
+                        error=str(e),
+                    )
+                    for model_name in model_names:
+                        results[model_name].append(skipped)
+                        aggregated_results[model_name].append(skipped)
+                    combined_results.append(skipped)
+                    continue
+
+                tiles = None
+                if tiling is not None:
+                    image, scale = decode_bounded(image)
+
+                phash = digest = None
+                if duplicates is not None:
+                    image_hash = dhash(image)
+                    # Tiled predictions are not comparable across jobs
+                    if tiling is None:
+                        phash = format_hash(image_hash)
+                        digest = content_digest(image)
+                    position = duplicates.find(image_hash)
+                    if position is not None:
+                        for name in model_names:
+                            _reuse_result(
+                                position, file, results[name], metadata, phash
+                            )
+                            _reuse_result(position, file, aggregated_results[name])
+                        if combine:
+                            _reuse_result(position, file, combined_results)
+                        reused += 1
+                        continue
+                    duplicates.add(image_hash, len(results[model_names[0]]))
+
+                file_aggregated = []
+                for model_name, model in zip(model_names, models):
+                    model_type = MODEL_METADATA[model_name]["type"]
+                    cached = None
+                    if store is not None and digest and model_type != "clip":
+                        cached = store.find_by_hash(
+                            model_name, phash, digest, user.username
+                        )
+
+                    duplicate_of = None
+                    if cached is not None:
+                        duplicate_of = cached["path"]
+                        predictions = [Prediction(**p) for p in cached["predictions"]]
+                        aggregated = [
+                            Prediction(**p) for p in cached["aggregated_predictions"]
+                        ]
+                    elif tiling is not None:
+                        predictions, aggregated, tiles = classify_tiled(
+                            model, model_type, image, tiling, sensitivity, scale
+                        )
+                    elif model_type == "clip":
+                        features = model.image_features(image)
+                        predictions = model.classify_features(
+                            features, sensitivity=sensitivity
+                        )
+                        embeddings[(model_name, file.systemId)].append(
+                            (file.path, features[0].cpu().numpy())
+                        )
+                        # For CLIP, just copy the results since it's already aggregated
+                        aggregated = predictions
+                    else:
+                        predictions = model.classify_image(image)
+                        aggregated = aggregate_predictions(predictions)
 
-            if model_meta["type"] == "clip":
-                # For CLIP, just copy the results since it's already aggregated
-                aggregated_results.append(
-                    InferenceResult(
-                        systemId=file.systemId, path=file.path, predictions=predictions
+                    # Always create detailed results
+                    results[model_name].append(
+                        InferenceResult(
+                            systemId=file.systemId,
+                            path=file.path,
+                            predictions=predictions,
+                            metadata=metadata,
+                            tiles=tiles,
+                            phash=phash,
+                            duplicateOf=duplicate_of,
+                            digest=digest,
+                        )
                     )
-                )
-            else:
-                aggregated = aggregate_predictions(predictions)
-                aggregated_results.append(
-                    InferenceResult(
-                        systemId=file.systemId, path=file.path, predictions=aggregated
+                    aggregated_results[model_name].append(
+                        InferenceResult(
+                            systemId=file.systemId,
+                            path=file.path,
+                            predictions=aggregated,
+                            duplicateOf=duplicate_of,
+                        )
                     )
-                )
+                    file_aggregated.append(aggregated)
+
+                if combine:
+                    combined_results.append(
+                        InferenceResult(
+                            systemId=file.systemId,
+                            path=file.path,
+                            predictions=combine_predictions(file_aggregated),
+                        )
+                    )
+
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Failed to process {file.path}: {str(e)}")
+    except SoftTimeLimitExceeded:
+        # Drop the file that was interrupted; a continuation task redoes it
+        time_limited = True
+        for section in [*results.values(), *aggregated_results.values()]:
+            del section[completed:]
+        del combined_results[completed:]
+        for key in list(embeddings):
+            del embeddings[key][embedded.get(key, 0) :]  # noqa: E203
+            if not embeddings[key]:
+                del embeddings[key]
+        logger.warning("Soft time limit reached after %d files", completed)
+
+    if reused:
+        logger.info("Reused predictions for %d near-duplicate images", reused)
+
+    for (model_name, system_id), rows in embeddings.items():
+        EmbeddingIndex.for_project(system_id, model_name, user.username).add(
+            [path for path, _ in rows], np.stack([vector for _, vector in rows])
+        )
+
+    response = EnsembleResponse(
+        models=model_names,
+        responses=[
+            InferenceResponse(
+                model=name,
+                aggregated_results=aggregated_results[name],
+                results=results[name],
+            )
+            for name in model_names
+        ],
+        combined_results=combined_results if combine else None,
+    )
+    if time_limited:
+        raise TimeLimitReached(response)
+    return response
+
 
+def _reuse_result(
+    position: int,
+    file: TapisFile,
+    section: List[InferenceResult],
+    metadata: Optional[ImageMetadata] = None,
+    phash: Optional[str] = None,
+):
+    """Append to `section` the predictions of its entry at `position` (an
+    earlier near-duplicate image) for `file`."""
+    original = section[position]
+    section.append(
+        original.model_copy(
+            update={
+                "systemId": file.systemId,
+                "path": file.path,
+                "metadata": metadata,
+                "phash": phash,
+                "duplicateOf": original.path,
+                # Near duplicates are not identical; never a cross-job match
+                "digest": None,
+            }
+        )
+    )
+
+
+def extract_metadata_from_tapis_images(
+    files: List[TapisFile],
+    user: TapisUser,
+    directories: Optional[List[TapisDirectory]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    skip: int = 0,
+) -> InferenceResponse:
+    """EXIF metadata (GPS, time taken, camera) of each image, without running a
+    model or downloading whole files: the EXIF block is read with ranged reads,
+    METADATA_CONCURRENCY files at a time. Results have no predictions; files
+    that cannot be read get an `error`.
+
+    Files are read in batches of METADATA_BATCH_SIZE; `should_stop` is checked
+    before each batch, and `skip` and the soft time limit are handled as in
+    `run_models_on_tapis_images` (a batch in progress is dropped)."""
+    tapis = Tapis(base_url=user.tenant_host, access_token=user.tapis_token)
+    remote_stats = _stat_remote_files(tapis, files)
+
+    def _extract(file: TapisFile) -> InferenceResult:
+        try:
+            metadata = get_image_metadata(
+                tapis,
+                file.systemId,
+                file.path,
+                remote_stat=remote_stats.get((file.systemId, file.path)),
+            )
+        except SoftTimeLimitExceeded:
+            raise
         except Exception as e:
-            raise RuntimeError(f"Failed to process {file.path}: {str(e)}")
+            logger.warning("Could not read metadata of %s: %s", file.path, e)
+            return InferenceResult(
+                systemId=file.systemId, path=file.path, predictions=[], error=str(e)
+            )
+        return InferenceResult(
+            systemId=file.systemId, path=file.path, predictions=[], metadata=metadata
+        )
+
+    input_files = islice(
+        _iter_input_files(tapis, files, directories or [], remote_stats), skip, None
+    )
+    results = []
+    time_limited = False
+    with ThreadPoolExecutor(max_workers=METADATA_CONCURRENCY) as pool:
+        try:
+            while True:
+                if should_stop is not None and should_stop():
+                    logger.info("Stopping early after %d files", len(results))
+                    break
+                batch = list(islice(input_files, METADATA_BATCH_SIZE))
+                if not batch:
+                    break
+                results.extend(pool.map(_extract, batch))
+        except SoftTimeLimitExceeded:
+            time_limited = True
+            pool.shutdown(wait=False, cancel_futures=True)
+            logger.warning("Soft time limit reached after %d files", len(results))
 
-    return InferenceResponse(
-        model=model_name, aggregated_results=aggregated_results, results=results
+    response = InferenceResponse(
+        model=METADATA_ONLY_MODEL,
+        aggregated_results=[
+            InferenceResult(
+                systemId=r.systemId, path=r.path, predictions=[], error=r.error
+            )
+            for r in results
+        ],
+        results=results,
     )
+    if time_limited:
+        raise TimeLimitReached(response)
+    return response
+
+
+def _iter_input_files(
+    tapis: Tapis,
+    files: List[TapisFile],
+    directories: List[TapisDirectory],
+    remote_stats: Dict[Tuple[str, str], RemoteFileStat],
+) -> Iterator[TapisFile]:
+    """Explicit files, then the files matched in each directory. Directory
+    listings are paged in lazily, and record the remote stats they return."""
+    seen = set()
+    for file in files:
+        seen.add((file.systemId, file.path))
+        yield file
+
+    for directory in directories:
+        for path, stat in iter_directory_files(
+            tapis,
+            directory.systemId,
+            directory.path,
+            include=directory.include,
+            exclude=directory.exclude,
+            max_depth=directory.maxDepth,
+        ):
+            key = (directory.systemId, path)
+            if key in seen:
+                continue
+            seen.add(key)
+            remote_stats[key] = stat
+            yield TapisFile(systemId=directory.systemId, path=path)
+
+
+def _stat_remote_files(tapis: Tapis, files: List[TapisFile]):
+    """Remote stats used to revalidate cached images (see
+    `stat_remote_files`). On errors cached images are used without checking."""
+    try:
+        return stat_remote_files(tapis, [(f.systemId, f.path) for f in files])
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception as e:
+        logger.warning("Could not list remote files to revalidate cache: %s", e)
+        return {}
+
+
+def embed_query(
+    user: TapisUser,
+    model_name: str,
+    system_id: str,
+    path: Optional[str] = None,
+    text: Optional[str] = None,
+) -> List[float]:
+    """CLIP embedding for a similarity query: an image (indexed as a side
+    effect, so the next query for it needs no model) or a text prompt.
+
+    Raises PermissionError or FileNotFoundError when the user cannot read
+    the image, and ValueError when it is not an image."""
+    if MODEL_METADATA.get(model_name, {}).get("type") != "clip":
+        raise ValueError(f"Model '{model_name}' does not support similarity search.")
+
+    model = load_model(model_name)
+
+    if path is not None:
+        tapis = Tapis(base_url=user.tenant_host, access_token=user.tapis_token)
+        # Built-in exception types, so the API can map them to 4xx responses
+        try:
+            image, _ = get_image_file(tapis, system_id, path)
+        except (ForbiddenError, UnauthorizedError) as e:
+            raise PermissionError(f"No access to {path}") from e
+        except NotFoundError as e:
+            raise FileNotFoundError(f"{path} not found") from e
+        except UnidentifiedImageError as e:
+            raise ValueError(f"{path} is not an image") from e
+        vector = model.embed_image(image)
+        EmbeddingIndex.for_project(system_id, model_name, user.username).add(
+            [path], vector[None, :]
+        )
+    else:
+        vector = model.embed_text(text)
+
+    return vector.tolist()
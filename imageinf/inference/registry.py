@@ -1,16 +1,57 @@
-MODEL_REGISTRY = {}
-MODEL_METADATA = {}
+import importlib
+from collections.abc import Mapping
 
+from .manifest import MODEL_MANIFEST, TINY_MODEL_MANIFEST
+
+
+def model_metadata(model_name: str, entry: dict) -> dict:
+    """Public metadata (served by /inference/models) of a manifest entry."""
+    return {
+        "name": model_name,
+        "type": entry["type"],
+        "description": entry.get("description") or model_name,
+        "link": entry.get("link") or "",
+    }
+
+
+MODEL_METADATA = {
+    model_name: model_metadata(model_name, entry)
+    for model_name, entry in MODEL_MANIFEST.items()
+}
+
+_RUNNERS = {}
+
+
+class LazyModelRegistry(Mapping):
+    """Model name -> runner class, importing the runner module (and with it
+    torch/transformers) only when a runner is first looked up."""
+
+    def __getitem__(self, model_name):
+        if model_name not in MODEL_MANIFEST:
+            raise KeyError(model_name)
+        if model_name not in _RUNNERS:
+            importlib.import_module(MODEL_MANIFEST[model_name]["module"])
+        return _RUNNERS[model_name]
+
+    def __contains__(self, model_name):
+        return model_name in MODEL_MANIFEST
+
+    def __iter__(self):
+        return iter(MODEL_MANIFEST)
+
+    def __len__(self):
+        return len(MODEL_MANIFEST)
+
+
+MODEL_REGISTRY = LazyModelRegistry()
+
+
+def register_model_runner(model_name):
+    if model_name not in MODEL_MANIFEST and model_name not in TINY_MODEL_MANIFEST:
+        raise ValueError(f"Model '{model_name}' is missing from MODEL_MANIFEST.")
 
-def register_model_runner(model_name, model_type, description=None, link=None):
     def decorator(cls):
-        MODEL_REGISTRY[model_name] = cls
-        MODEL_METADATA[model_name] = {
-            "name": model_name,
-            "type": model_type,
-            "description": description or model_name,
-            "link": link or "",
-        }
+        _RUNNERS[model_name] = cls
         return cls
 
     return decorator
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+from imageinf.inference.manifest import MODEL_MANIFEST
+from imageinf.inference.registry import (
+    MODEL_METADATA,
+    MODEL_REGISTRY,
+    register_model_runner,
+)
+
+
+def test_api_imports_without_ml_stack():
+    code = (
+        "import sys, imageinf.main; "
+        "assert 'torch' not in sys.modules, 'torch imported'; "
+        "assert 'transformers' not in sys.modules, 'transformers imported'"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_metadata_comes_from_manifest():
+    assert set(MODEL_METADATA) == set(MODEL_MANIFEST)
+    assert MODEL_METADATA["google/vit-base-patch16-224"]["type"] == "vit"
+
+
+def test_runner_classes_are_imported_on_lookup():
+    from imageinf.inference.clip_models import CLIPViTLarge
+
+    assert "openai/clip-vit-large-patch14" in MODEL_REGISTRY
+    assert MODEL_REGISTRY["openai/clip-vit-large-patch14"] is CLIPViTLarge
+    assert "nonexistent/model" not in MODEL_REGISTRY
+    with pytest.raises(KeyError):
+        MODEL_REGISTRY["nonexistent/model"]
+
+
+def test_runner_must_be_in_manifest():
+    with pytest.raises(ValueError):
+        register_model_runner("nonexistent/model")
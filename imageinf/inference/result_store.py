@@ -0,0 +1,407 @@
+"""Durable storage of async inference jobs and their per-file results.
+
+Results are kept in SQL tables (SQLite by default; the schema sticks to
+portable types so it can be created unchanged in Postgres) rather than only
+in the Celery result backend, so they survive Redis expiry and restarts, can
+be read a page at a time and are scoped to the user that submitted the job.
+"""
+
+import json
+import logging
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Union
+
+from imageinf.utils.config import RESULT_DB_PATH
+
+from .models import EnsembleResponse, InferenceResponse
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS inference_jobs (
+        job_id VARCHAR(64) PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        model VARCHAR(255) NOT NULL,
+        status VARCHAR(32) NOT NULL,
+        total_files INTEGER NOT NULL,
+        error TEXT,
+        created_at VARCHAR(32) NOT NULL,
+        updated_at VARCHAR(32) NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_inference_jobs_username
+        ON inference_jobs (username, created_at)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inference_results (
+        job_id VARCHAR(64) NOT NULL,
+        model VARCHAR(255) NOT NULL,
+        file_index INTEGER NOT NULL,
+        system_id VARCHAR(255) NOT NULL,
+        path TEXT NOT NULL,
+        predictions TEXT NOT NULL,
+        aggregated_predictions TEXT NOT NULL,
+        metadata TEXT,
+        tiles TEXT,
+        error TEXT,
+        phash VARCHAR(16),
+        duplicate_of TEXT,
+        PRIMARY KEY (job_id, model, file_index)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_inference_results_path
+        ON inference_results (system_id, path)
+    """,
+]
+
+# Columns added after the first release: (table, column, type), added to
+# existing databases on startup
+MIGRATIONS = [
+    ("inference_results", "tiles", "TEXT"),
+    ("inference_results", "error", "TEXT"),
+    ("inference_results", "phash", "VARCHAR(16)"),
+    ("inference_results", "duplicate_of", "TEXT"),
+    ("inference_results", "digest", "VARCHAR(64)"),
+    ("inference_jobs", "output", "TEXT"),
+]
+
+# Indexes on migrated columns, created once the columns exist
+MIGRATED_SCHEMA = [
+    """
+    CREATE INDEX IF NOT EXISTS ix_inference_results_phash
+        ON inference_results (model, phash)
+    """,
+]
+
+# Sections of a stored result that can be requested
+RESULT_FIELDS = ("results", "aggregated_results", "metadata")
+
+# Rows holding the combined scores of a multi-model job
+COMBINED_MODEL = "combined"
+
+
+class ResultStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            _migrate(conn)
+            for statement in MIGRATED_SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per operation: endpoints run on threadpool
+        # threads and sqlite3 connections must not be shared across threads
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def create_job(
+        self,
+        job_id: str,
+        username: str,
+        model: str,
+        total_files: int,
+        output: Optional[Dict] = None,
+    ):
+        """Register a job. `output` holds the job's `OutputOptions`, applied
+        when its results are read back (see `get_results`)."""
+        now = _now()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO inference_jobs (job_id, username, model, status, "
+                "total_files, output, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'PENDING', ?, ?, ?, ?)",
+                (
+                    job_id,
+                    username,
+                    model,
+                    total_files,
+                    _dump(output) if output else None,
+                    now,
+                    now,
+                ),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM inference_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, username: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM inference_jobs WHERE username = ? "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (username, limit, offset),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_failed(self, job_id: str, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE inference_jobs SET status = 'FAILURE', error = ?, "
+                "updated_at = ? WHERE job_id = ?",
+                (error, _now(), job_id),
+            )
+
+    def mark_cancelled(self, job_id: str) -> bool:
+        """Mark a job that has not finished as cancelled; returns False if it
+        already has."""
+        with self._connect() as conn:
+            return bool(
+                conn.execute(
+                    "UPDATE inference_jobs SET status = 'CANCELLED', updated_at = ? "
+                    "WHERE job_id = ? AND status = 'PENDING'",
+                    (_now(), job_id),
+                ).rowcount
+            )
+
+    def save_results(
+        self,
+        job_id: str,
+        response: Union[InferenceResponse, EnsembleResponse],
+        status: Optional[str] = "SUCCESS",
+        offset: int = 0,
+    ) -> bool:
+        """Store per-file rows (per model, for multi-model jobs) and mark the
+        job done, or CANCELLED with the results of the files processed before
+        it was cancelled. Jobs cancelled through the API stay CANCELLED even if
+        their task finished before noticing.
+
+        Jobs that run as several tasks store each part's results after the
+        `offset` files stored before it, with `status` None (left unchanged)
+        for all but the last part.
+
+        Only jobs registered with `create_job` are stored (sync jobs are not);
+        returns False for unknown jobs.
+        """
+        if isinstance(response, EnsembleResponse):
+            responses = list(response.responses)
+            if response.combined_results is not None:
+                responses.append(
+                    InferenceResponse(
+                        model=COMBINED_MODEL,
+                        results=response.combined_results,
+                        aggregated_results=response.combined_results,
+                    )
+                )
+        else:
+            responses = [response]
+
+        rows = [row for r in responses for row in _result_rows(job_id, r, offset)]
+        total_files = offset + len(responses[0].results)
+
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE inference_jobs SET status = CASE WHEN status = 'CANCELLED' "
+                "THEN status ELSE COALESCE(?, status) END, "
+                "total_files = ?, updated_at = ? WHERE job_id = ?",
+                (status, total_files, _now(), job_id),
+            ).rowcount
+            if not updated:
+                return False
+            conn.executemany(
+                "INSERT INTO inference_results (job_id, model, file_index, system_id, "
+                "path, predictions, aggregated_predictions, metadata, tiles, "
+                "error, phash, duplicate_of, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return True
+
+    def find_by_hash(
+        self, model: str, phash: str, digest: str, username: str
+    ) -> Optional[Dict]:
+        """Stored predictions of `model` for an identical image (same perceptual
+        hash and file digest) in one of `username`'s earlier jobs:
+        {"path", "predictions", "aggregated_predictions"}."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT r.path, r.predictions, r.aggregated_predictions "
+                "FROM inference_results r "
+                "JOIN inference_jobs j ON j.job_id = r.job_id "
+                "WHERE r.model = ? AND r.phash = ? AND r.digest = ? "
+                "AND j.username = ? LIMIT 1",
+                (model, phash, digest, username),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "path": row["path"],
+            "predictions": json.loads(row["predictions"]),
+            "aggregated_predictions": json.loads(row["aggregated_predictions"]),
+        }
+
+    def count_results(self, job_id: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(DISTINCT file_index) FROM inference_results "
+                "WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()[0]
+
+    def get_results(
+        self,
+        job_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        fields: Sequence[str] = RESULT_FIELDS,
+        top_k: Optional[int] = None,
+    ) -> Dict:
+        """Page of a job's results in the `InferenceResponse` layout (or the
+        `EnsembleResponse` layout for multi-model jobs), with only the
+        requested `fields` read from the database and at most `top_k`
+        predictions per file."""
+        job = self.get_job(job_id)
+        models = job["model"].split(",") if job else []
+        if len(models) <= 1:
+            # A single model may still have combined rows (`combine` with one
+            # model); only its own rows are returned
+            model = models[0] if models else None
+            return self._get_model_results(job_id, model, offset, limit, fields, top_k)
+
+        combined = self._get_model_results(
+            job_id, COMBINED_MODEL, offset, limit, ("results",), top_k
+        )["results"]
+        return {
+            "models": models,
+            "responses": [
+                self._get_model_results(job_id, model, offset, limit, fields, top_k)
+                for model in models
+            ],
+            "combined_results": combined or None,
+        }
+
+    def _get_model_results(
+        self,
+        job_id: str,
+        model: Optional[str],
+        offset: int,
+        limit: Optional[int],
+        fields: Sequence[str],
+        top_k: Optional[int] = None,
+    ) -> Dict:
+        columns = ["model", "system_id", "path", "error", "duplicate_of"]
+        if "results" in fields:
+            columns.append("predictions")
+        if "aggregated_results" in fields:
+            columns.append("aggregated_predictions")
+        if "metadata" in fields:
+            columns.append("metadata")
+        if "results" in fields:
+            columns.extend(["tiles", "phash"])
+
+        query = f"SELECT {', '.join(columns)} FROM inference_results WHERE job_id = ?"
+        params = [job_id]
+        if model is not None:
+            query += " AND model = ?"
+            params.append(model)
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                query + " ORDER BY file_index LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else limit, offset),
+            ).fetchall()
+
+        response = {"model": rows[0]["model"] if rows else model}
+        if "results" in fields:
+            response["results"] = [
+                {
+                    "systemId": row["system_id"],
+                    "path": row["path"],
+                    "predictions": json.loads(row["predictions"])[:top_k],
+                    "metadata": (
+                        json.loads(row["metadata"])
+                        if "metadata" in fields and row["metadata"]
+                        else None
+                    ),
+                    "tiles": json.loads(row["tiles"]) if row["tiles"] else None,
+                    "error": row["error"],
+                    "phash": row["phash"],
+                    "duplicateOf": row["duplicate_of"],
+                }
+                for row in rows
+            ]
+        if "aggregated_results" in fields:
+            response["aggregated_results"] = [
+                {
+                    "systemId": row["system_id"],
+                    "path": row["path"],
+                    "predictions": json.loads(row["aggregated_predictions"])[:top_k],
+                    "metadata": None,
+                    "error": row["error"],
+                    "duplicateOf": row["duplicate_of"],
+                }
+                for row in rows
+            ]
+        return response
+
+
+_stores: Dict[str, ResultStore] = {}
+
+
+def get_result_store() -> ResultStore:
+    store = _stores.get(RESULT_DB_PATH)
+    if store is None:
+        store = _stores[RESULT_DB_PATH] = ResultStore(RESULT_DB_PATH)
+    return store
+
+
+def _result_rows(
+    job_id: str, response: InferenceResponse, offset: int = 0
+) -> List[tuple]:
+    aggregated = {(r.systemId, r.path): r for r in response.aggregated_results}
+    return [
+        (
+            job_id,
+            response.model,
+            offset + i,
+            result.systemId,
+            result.path,
+            _dump([p.model_dump() for p in result.predictions]),
+            _dump(
+                [
+                    p.model_dump()
+                    for p in aggregated[(result.systemId, result.path)].predictions
+                ]
+            ),
+            _dump(result.metadata.model_dump(mode="json")) if result.metadata else None,
+            (
+                _dump([t.model_dump() for t in result.tiles])
+                if result.tiles is not None
+                else None
+            ),
+            result.error,
+            result.phash,
+            result.duplicateOf,
+            result.digest,
+        )
+        for i, result in enumerate(response.results)
+    ]
+
+
+def _migrate(conn: sqlite3.Connection):
+    for table, column, column_type in MIGRATIONS:
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _dump(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
@@ -0,0 +1,109 @@
+import pytest
+
+from imageinf.inference.models import (
+    ImageMetadata,
+    InferenceResponse,
+    InferenceResult,
+    Prediction,
+)
+from imageinf.inference.result_store import ResultStore
+
+
+def _response(n_files):
+    results = [
+        InferenceResult(
+            systemId="designsafe.storage.default",
+            path=f"/img_{i}.jpg",
+            predictions=[Prediction(label="sports car", score=0.9)],
+            metadata=ImageMetadata(latitude=30.0, longitude=-97.0),
+        )
+        for i in range(n_files)
+    ]
+    aggregated = [
+        InferenceResult(
+            systemId=r.systemId,
+            path=r.path,
+            predictions=[Prediction(label="car", score=0.9)],
+        )
+        for r in results
+    ]
+    return InferenceResponse(
+        model="google/vit-base-patch16-224",
+        aggregated_results=aggregated,
+        results=results,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.db"))
+
+
+def test_results_survive_reopening_and_paginate(store, tmp_path):
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 5)
+    assert store.save_results("job-1", _response(5))
+
+    reopened = ResultStore(str(tmp_path / "results.db"))
+    assert reopened.get_job("job-1")["status"] == "SUCCESS"
+    assert reopened.count_results("job-1") == 5
+
+    page = reopened.get_results("job-1", offset=2, limit=2)
+    assert [r["path"] for r in page["results"]] == ["/img_2.jpg", "/img_3.jpg"]
+    assert page["aggregated_results"][0]["predictions"][0]["label"] == "car"
+    assert page["results"][0]["metadata"]["latitude"] == 30.0
+
+
+def test_field_projection(store):
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 2)
+    store.save_results("job-1", _response(2))
+
+    page = store.get_results("job-1", fields=("aggregated_results",))
+
+    assert "results" not in page
+    assert len(page["aggregated_results"]) == 2
+
+
+def test_unregistered_jobs_are_not_stored(store):
+    assert not store.save_results("sync-job", _response(1))
+    assert store.count_results("sync-job") == 0
+
+
+def test_list_jobs_is_scoped_to_user(store):
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 1)
+    store.create_job("job-2", "otheruser", "google/vit-base-patch16-224", 1)
+
+    jobs = store.list_jobs("testuser")
+
+    assert [job["job_id"] for job in jobs] == ["job-1"]
+
+
+def test_dedup_cache_lookups_are_scoped_to_the_user_and_digest(store):
+    response = _response(1)
+    response.results[0].phash = "00ff00ff00ff00ff"
+    response.results[0].digest = "a" * 64
+    store.create_job("job-1", "alice", response.model, 1)
+    store.save_results("job-1", response)
+
+    assert store.find_by_hash(response.model, "00ff00ff00ff00ff", "a" * 64, "alice")
+    assert not store.find_by_hash(response.model, "00ff00ff00ff00ff", "a" * 64, "bob")
+    assert not store.find_by_hash(response.model, "00ff00ff00ff00ff", "b" * 64, "alice")
+
+
+def test_single_model_job_with_combine_returns_each_file_once(store):
+    from imageinf.inference.models import EnsembleResponse
+
+    response = _response(2)
+    store.create_job("job-1", "alice", response.model, 2)
+    store.save_results(
+        "job-1",
+        EnsembleResponse(
+            models=[response.model],
+            responses=[response],
+            combined_results=response.aggregated_results,
+        ),
+    )
+
+    results = store.get_results("job-1")
+    assert results["model"] == response.model
+    assert [r["path"] for r in results["results"]] == ["/img_0.jpg", "/img_1.jpg"]
+    assert store.count_results("job-1") == 2
@@ -1,16 +1,51 @@
+import asyncio
+import json
 import logging
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from celery.result import AsyncResult
 from celery.exceptions import TimeoutError as CeleryTimeoutError
 
-from .models import InferenceRequest, InferenceResponse
+import numpy as np
+
+from .admission import MODEL_ADMISSION_RETRY_DELAY, ModelAdmissionError
+from .cancellation import get_cancel_flags
+from .compact import expand_result
+from .config import METADATA_ONLY_MODEL
+from .embeddings import load_embedding_index
+from .fast_path import fast_path_pool
+from .models import (
+    InferenceRequest,
+    InferenceResponse,
+    OutputOptions,
+    SimilarImage,
+    SimilarImageRequest,
+    SimilarImageResponse,
+)
 from .registry import MODEL_METADATA
-from .tasks import run_inference_task
+from .result_store import RESULT_FIELDS, get_result_store
+from .sync import (
+    SYNC_INFERENCE_TIMEOUT,
+    publish,
+    run_blocking,
+    sync_inference_limiter,
+    wait_for_result,
+)
+from .tasks import embed_query_task, extract_metadata_task, run_inference_task
+from ..celery_app import BULK_QUEUE, INTERACTIVE_QUEUE, celery
 from ..utils.auth import get_tapis_user, TapisUser
 
 logger = logging.getLogger(__name__)
 
+SEARCH_QUERY_TIMEOUT = 60
+
+# Files per page of async job results (default and maximum `limit`)
+RESULT_PAGE_SIZE = 1000
+RESULT_PAGE_MAX = 10000
+
 router = APIRouter(
     prefix="/inference", tags=["inference"], dependencies=[Depends(get_tapis_user)]
 )
@@ -22,46 +57,252 @@ def submit_async_inference(
 ):
     """Enqueue an async inference job."""
     logger.info(
-        "Async inference request: user=%s model=%s files=%d",
+        "Async inference request: user=%s model=%s files=%d directories=%d",
         user.username,
-        request.model,
+        ",".join(request.model_names),
         len(request.files),
+        len(request.directories),
     )
 
-    task = run_inference_task.delay(
-        [f.model_dump() for f in request.files],
-        user.model_dump(),
-        request.model,
-        labels=request.labels,
-        sensitivity=request.sensitivity,
+    # Record the job before enqueueing so the worker can always store results.
+    # Files matched by directory inputs are counted once the job completes.
+    task_id = str(uuid.uuid4())
+    if request.inferenceType == "metadata":
+        get_result_store().create_job(
+            task_id, user.username, METADATA_ONLY_MODEL, len(request.files)
+        )
+        task = extract_metadata_task.apply_async(
+            args=([f.model_dump() for f in request.files], user.model_dump()),
+            kwargs={"directories": [d.model_dump() for d in request.directories]},
+            task_id=task_id,
+            queue=BULK_QUEUE,
+        )
+        return {"task_id": task.id, "status": "PENDING"}
+
+    output = request.output.model_dump() if request.output else None
+    get_result_store().create_job(
+        task_id,
+        user.username,
+        ",".join(request.model_names),
+        len(request.files),
+        output=output,
+    )
+
+    task = run_inference_task.apply_async(
+        args=(
+            [f.model_dump() for f in request.files],
+            user.model_dump(),
+            request.model,
+        ),
+        kwargs={
+            "labels": request.labels,
+            "sensitivity": request.sensitivity,
+            "directories": [d.model_dump() for d in request.directories],
+            "models": request.models,
+            "combine": request.combine,
+            "tiling": request.tiling.model_dump() if request.tiling else None,
+            "dedup": request.dedup,
+            "dedup_cache": request.dedupCache,
+            "output": output,
+        },
+        task_id=task_id,
+        queue=BULK_QUEUE,
     )
 
     return {"task_id": task.id, "status": "PENDING"}
 
 
+@router.get("/jobs", summary="List the current user's async jobs")
+def list_inference_jobs(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    user: TapisUser = Depends(get_tapis_user),
+):
+    jobs = get_result_store().list_jobs(user.username, offset=offset, limit=limit)
+    return [
+        {
+            "task_id": job["job_id"],
+            "status": job["status"],
+            "model": job["model"],
+            "total_files": job["total_files"],
+            "created_at": job["created_at"],
+        }
+        for job in jobs
+    ]
+
+
 @router.get("/models", summary="List available models")
 def list_models():
     return list(MODEL_METADATA.values())
 
 
+@router.post(
+    "/search",
+    summary="Find similar images",
+    description="""
+Return the images in a project (Tapis system) most similar to a query image or
+text prompt, using CLIP embeddings stored when CLIP inference ran on the project.
+""",
+    response_model=SimilarImageResponse,
+)
+async def search_similar_images(
+    request: SimilarImageRequest, user: TapisUser = Depends(get_tapis_user)
+):
+    """Only images indexed by the caller's own jobs are searched."""
+    if MODEL_METADATA.get(request.model, {}).get("type") != "clip":
+        raise HTTPException(
+            400, detail=f"Model '{request.model}' does not support similarity search"
+        )
+
+    # Loading the index and searching it read (memory-mapped) files; keep
+    # them off the event loop
+    index = await run_blocking(
+        load_embedding_index, request.systemId, request.model, user.username
+    )
+    if not len(index):
+        raise HTTPException(
+            404, detail="No images indexed for this project; run CLIP inference first"
+        )
+
+    query = await run_blocking(index.vector_for, request.path) if request.path else None
+    if query is None:
+        # Needs a forward pass (text prompt or an image not yet indexed)
+        try:
+            task = await publish(
+                embed_query_task,
+                args=(user.model_dump(), request.model, request.systemId),
+                kwargs={"path": request.path, "text": request.text},
+                queue=INTERACTIVE_QUEUE,
+            )
+            vector = await wait_for_result(task, timeout=SEARCH_QUERY_TIMEOUT)
+        except (CeleryTimeoutError, asyncio.TimeoutError):
+            raise HTTPException(504, detail="Query embedding timed out")
+        except ModelAdmissionError as e:
+            raise _model_unavailable(e)
+        except PermissionError as e:
+            raise HTTPException(403, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(400, detail=str(e))
+        query = np.asarray(vector, dtype=np.float32)
+        index = await run_blocking(
+            load_embedding_index, request.systemId, request.model, user.username
+        )
+
+    matches = await run_blocking(
+        index.search, query, top_n=request.topN, exclude_path=request.path
+    )
+    return SimilarImageResponse(
+        model=request.model,
+        results=[
+            SimilarImage(systemId=request.systemId, path=path, score=round(score, 4))
+            for path, score in matches
+        ],
+    )
+
+
 @router.get("/jobs/{job_id}")
-def get_inference_result(job_id: str):
-    """Get job status and result."""
-    # TODO: Persist results to DB for durability and to enforce user-scoped
-    #  access (verify requesting user owns this job). Currently relying on
-    #  Redis and its 24 hr default storage with no kind of access control.
-    result = AsyncResult(job_id)
+def get_inference_result(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(RESULT_PAGE_SIZE, ge=1, le=RESULT_PAGE_MAX),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma separated subset of: " + ", ".join(RESULT_FIELDS),
+    ),
+    topK: Optional[int] = Query(None, ge=1, le=100),
+    user: TapisUser = Depends(get_tapis_user),
+):
+    """Get job status and result.
+
+    Results of jobs submitted through `/jobs` are read from the durable result
+    store, a page of at most `limit` files at a time starting at `offset`;
+    `total` is the number of files in the job, so clients page until
+    `offset + limit >= total`. They are limited to `fields` and to `topK`
+    predictions per file, both defaulting to the job's `output` options.
+    """
+    requested_fields = None
+    if fields:
+        requested_fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(requested_fields) - set(RESULT_FIELDS)
+        if unknown:
+            raise HTTPException(400, detail=f"Unknown fields: {sorted(unknown)}")
+
+    store = get_result_store()
+    job = store.get_job(job_id)
+
+    if job is None:
+        # Jobs that predate the result store only live in the result backend
+        result = AsyncResult(job_id)
+
+        response = {"task_id": job_id, "status": result.state}
+
+        if result.state == "SUCCESS":
+            response["result"] = expand_result(result.result)
+        elif result.state == "FAILURE":
+            response["error"] = str(result.result)
 
-    response = {"task_id": job_id, "status": result.state}
+        return response
 
-    if result.state == "SUCCESS":
-        response["result"] = result.result
-    elif result.state == "FAILURE":
-        response["error"] = str(result.result)
+    if job["username"] != user.username:
+        raise HTTPException(404, detail="Job not found")
+
+    response = {"task_id": job_id, "status": job["status"]}
+
+    if job["status"] in ("SUCCESS", "CANCELLED"):
+        output = OutputOptions(**json.loads(job["output"])) if job["output"] else None
+        if requested_fields is None:
+            requested_fields = tuple(output.fields) if output else RESULT_FIELDS
+        if topK is None and output:
+            topK = output.topK
+
+        response["total"] = store.count_results(job_id)
+        response["offset"] = offset
+        response["limit"] = limit
+        response["result"] = store.get_results(
+            job_id,
+            offset=offset,
+            limit=limit,
+            fields=requested_fields,
+            top_k=topK,
+        )
+    elif job["status"] == "FAILURE":
+        response["error"] = job["error"]
+    else:
+        # Still running (or the worker died before recording an outcome)
+        result = AsyncResult(job_id)
+        response["status"] = result.state
+        if result.state == "FAILURE":
+            response["error"] = str(result.result)
 
     return response
 
 
+@router.delete("/jobs/{job_id}", summary="Cancel an async job")
+def cancel_inference_job(job_id: str, user: TapisUser = Depends(get_tapis_user)):
+    """Cancel a job submitted through `/jobs`.
+
+    A queued job is dropped; a running job stops before its next file and
+    keeps the results computed so far (see `cancellation`). Jobs that have
+    already finished are left as they are.
+    """
+    store = get_result_store()
+    job = store.get_job(job_id)
+    if job is None or job["username"] != user.username:
+        raise HTTPException(404, detail="Job not found")
+
+    if not store.mark_cancelled(job_id):
+        return {"task_id": job_id, "status": job["status"]}
+
+    celery.control.revoke(job_id)
+    flags = get_cancel_flags()
+    if flags is not None:
+        flags.cancel(job_id)
+    logger.info("Job %s: Cancelled by %s", job_id, user.username)
+    return {"task_id": job_id, "status": "CANCELLED"}
+
+
 @router.post(
     "/jobs/sync",
     summary="Run synchronous inference",
@@ -72,10 +313,16 @@ Recommended for ≤ 5 image files. For larger workloads, use the asynchronous
 """,
     response_model=InferenceResponse,
 )
-def run_sync_inference(
+async def run_sync_inference(
     request: InferenceRequest, user: TapisUser = Depends(get_tapis_user)
 ):
-    """Sync endpoint — use Celery but blocks until done.
+    """Sync endpoint — use Celery but waits until done.
+
+    Waiting happens on the event loop, so slow jobs do not tie up threadpool
+    threads needed by other endpoints. At most SYNC_INFERENCE_MAX_CONCURRENCY
+    requests wait at once; beyond that requests are rejected with 429. With
+    the optional fast path enabled, jobs for warm models are run by the API's
+    own model pool instead of Celery.
 
     TODO consider dropping or making a sync=true param in /jobs/"""
     logger.info(
@@ -88,23 +335,93 @@ def run_sync_inference(
     if len(request.files) > 5:
         raise HTTPException(400, detail="Too many files. Use async endpoint for >5.")
 
+    if request.directories:
+        raise HTTPException(
+            400, detail="Directory inputs are only supported by the async endpoint."
+        )
+    if request.models:
+        raise HTTPException(
+            400, detail="Multi-model jobs are only supported by the async endpoint."
+        )
+    if request.tiling:
+        raise HTTPException(
+            400, detail="Tiled inference is only supported by the async endpoint."
+        )
+    if request.inferenceType == "metadata":
+        raise HTTPException(
+            400, detail="Metadata-only jobs are only supported by the async endpoint."
+        )
+    if request.dedup:
+        raise HTTPException(
+            400, detail="Deduplication is only supported by the async endpoint."
+        )
+
+    if not sync_inference_limiter.try_acquire():
+        logger.warning("Sync inference saturated: user=%s", user.username)
+        raise HTTPException(
+            429,
+            detail="Too many concurrent sync inference requests. "
+            "Retry shortly or use the async endpoint.",
+            headers={"Retry-After": "1"},
+        )
+
     try:
-        result = run_inference_task.delay(
-            [f.model_dump() for f in request.files],
-            user.model_dump(),
-            request.model,
-            labels=request.labels,
-            sensitivity=request.sensitivity,
-        ).get(timeout=120)
+        result = None
+        if fast_path_pool.can_serve(request.model, len(request.files)):
+            try:
+                result = await fast_path_pool.run(
+                    [f.model_dump() for f in request.files],
+                    user.model_dump(),
+                    request.model,
+                    labels=request.labels,
+                    sensitivity=request.sensitivity,
+                    output=request.output.model_dump() if request.output else None,
+                    timeout=SYNC_INFERENCE_TIMEOUT,
+                )
+            except BrokenProcessPool:
+                logger.warning("Fast path unavailable, falling back to Celery")
+        if result is None:
+            task = await publish(
+                run_inference_task,
+                args=(
+                    [f.model_dump() for f in request.files],
+                    user.model_dump(),
+                    request.model,
+                ),
+                kwargs={
+                    "labels": request.labels,
+                    "sensitivity": request.sensitivity,
+                    "interactive": True,
+                    "output": request.output.model_dump() if request.output else None,
+                },
+                queue=INTERACTIVE_QUEUE,
+            )
+            result = expand_result(
+                await wait_for_result(task, timeout=SYNC_INFERENCE_TIMEOUT)
+            )
 
         logger.info(
             "Sync inference complete: user=%s model=%s", user.username, request.model
         )
         return result
-    except CeleryTimeoutError:
+    except (CeleryTimeoutError, asyncio.TimeoutError):
         raise HTTPException(504, detail="Inference timed out")
+    except ModelAdmissionError as e:
+        raise _model_unavailable(e)
     except ValueError as e:
         raise HTTPException(400, detail=str(e))
     except Exception:
         logger.exception("Unexpected error during inference: user=%s", user.username)
         raise HTTPException(500, detail="Internal inference error")
+    finally:
+        sync_inference_limiter.release()
+
+
+def _model_unavailable(error: ModelAdmissionError) -> HTTPException:
+    """503 for a model that a worker has no memory to load, with a Retry-After
+    unless the model can never fit."""
+    logger.warning("Model not admitted: %s", error)
+    headers = {"Retry-After": str(MODEL_ADMISSION_RETRY_DELAY)}
+    return HTTPException(
+        503, detail=str(error), headers=headers if error.retryable else None
+    )
@@ -110,3 +110,388 @@ def test_sync_inference_unauthed(
     }
     response = client_unauthed.post("/inference/jobs/sync", json=payload)
     assert response.status_code == 401
+
+
+def test_search_similar_images_by_indexed_path(client_authed):
+    import numpy as np
+    from imageinf.inference.embeddings import EmbeddingIndex
+
+    EmbeddingIndex.for_project(
+        "designsafe.storage.default", "openai/clip-vit-large-patch14", "testuser"
+    ).add(
+        ["/flood-1.jpg", "/flood-2.jpg", "/collapse.jpg"],
+        np.array([[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]]),
+    )
+
+    response = client_authed.post(
+        "/inference/search",
+        json={"systemId": "designsafe.storage.default", "path": "/flood-1.jpg"},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["path"] for r in results] == ["/flood-2.jpg", "/collapse.jpg"]
+
+
+def test_search_similar_images_requires_indexed_project(client_authed):
+    response = client_authed.post(
+        "/inference/search",
+        json={"systemId": "designsafe.storage.default", "text": "flooded street"},
+    )
+    assert response.status_code == 404
+
+
+def test_search_similar_images_only_searches_own_images(client_authed):
+    import numpy as np
+    from imageinf.inference.embeddings import EmbeddingIndex
+
+    EmbeddingIndex.for_project(
+        "designsafe.storage.default", "openai/clip-vit-large-patch14", "someone-else"
+    ).add(["/private/flood.jpg"], np.array([[1.0, 0.0]]))
+
+    response = client_authed.post(
+        "/inference/search",
+        json={"systemId": "designsafe.storage.default", "path": "/private/flood.jpg"},
+    )
+    assert response.status_code == 404
+
+
+def test_search_similar_images_reports_unreadable_query_image(
+    client_authed, monkeypatch
+):
+    import numpy as np
+    from imageinf.inference import routes
+    from imageinf.inference.embeddings import EmbeddingIndex
+
+    EmbeddingIndex.for_project(
+        "designsafe.storage.default", "openai/clip-vit-large-patch14", "testuser"
+    ).add(["/flood-1.jpg"], np.array([[1.0, 0.0]]))
+
+    class FailedResult:
+        def ready(self):
+            return True
+
+        def get(self, timeout=None):
+            raise PermissionError("No access to /other/flood.jpg")
+
+    monkeypatch.setattr(
+        routes.embed_query_task, "apply_async", lambda *a, **kw: FailedResult()
+    )
+
+    response = client_authed.post(
+        "/inference/search",
+        json={"systemId": "designsafe.storage.default", "path": "/other/flood.jpg"},
+    )
+    assert response.status_code == 403
+
+
+def test_sync_inference_rejects_when_saturated(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task, monkeypatch
+):
+    from imageinf.inference import routes
+
+    monkeypatch.setattr(routes.sync_inference_limiter, "in_flight", 8)
+    monkeypatch.setattr(routes.sync_inference_limiter, "limit", 8)
+
+    payload = {
+        "files": [
+            {
+                "systemId": "designsafe.storage.default",
+                "path": "/path/to/test-image.jpg",
+            }
+        ],
+    }
+    response = client_authed.post("/inference/jobs/sync", json=payload)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_sync_inference_uses_fast_path_when_model_is_warm(client_authed, monkeypatch):
+    from imageinf.inference import routes
+
+    calls = []
+
+    class FakePool:
+        def can_serve(self, model_name, n_files):
+            return True
+
+        async def run(self, files, user_data, model, **kwargs):
+            calls.append(model)
+            return {"model": model, "aggregated_results": [], "results": []}
+
+    def fail_apply_async(*args, **kwargs):
+        raise AssertionError("Celery should not be used")
+
+    monkeypatch.setattr(routes, "fast_path_pool", FakePool())
+    monkeypatch.setattr(routes.run_inference_task, "apply_async", fail_apply_async)
+
+    payload = {
+        "files": [
+            {
+                "systemId": "designsafe.storage.default",
+                "path": "/path/to/test-image.jpg",
+            }
+        ],
+        "model": "google/vit-base-patch16-224",
+    }
+    response = client_authed.post("/inference/jobs/sync", json=payload)
+
+    assert response.status_code == 200
+    assert calls == ["google/vit-base-patch16-224"]
+
+
+def test_sync_inference_falls_back_to_celery_when_fast_path_is_broken(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task, monkeypatch
+):
+    from concurrent.futures.process import BrokenProcessPool
+
+    from imageinf.inference import routes
+    from imageinf.inference.fast_path import InProcessModelPool
+
+    class BrokenExecutor:
+        def submit(self, *args, **kwargs):
+            raise BrokenProcessPool("A child process terminated abruptly")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    pool = InProcessModelPool(["google/vit-base-patch16-224"], workers=1)
+    pool._executor = BrokenExecutor()
+    pool.ready = True
+    restarts = []
+    monkeypatch.setattr(pool, "start", lambda: restarts.append(True))
+    monkeypatch.setattr(routes, "fast_path_pool", pool)
+
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/img.jpg"}],
+        "model": "google/vit-base-patch16-224",
+    }
+    response = client_authed.post("/inference/jobs/sync", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["results"][0]["predictions"][0]["label"] == "mock-label"
+    assert restarts == [True]
+    assert not pool.can_serve("google/vit-base-patch16-224", 1)
+
+
+def test_sync_inference_returns_503_when_model_is_not_admitted(
+    client_authed, mock_tapis_files, mock_celery_task, monkeypatch
+):
+    from imageinf.inference import admission, processor
+
+    def no_memory(model_name, *args, **kwargs):
+        raise admission.ModelAdmissionError(model_name, 2, 1, retryable=True)
+
+    monkeypatch.setattr(processor, "load_model", no_memory)
+
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/img.jpg"}],
+        "model": "google/vit-base-patch16-224",
+    }
+    response = client_authed.post("/inference/jobs/sync", json=payload)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.MODEL_ADMISSION_RETRY_DELAY)
+
+
+def test_async_job_results_are_paginated(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task
+):
+    from imageinf.inference import routes
+
+    payload = {
+        "files": [
+            {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+            for i in range(3)
+        ],
+        "model": "google/vit-base-patch16-224",
+    }
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    response = client_authed.get(
+        f"/inference/jobs/{job_id}",
+        params={"offset": 1, "limit": 1, "fields": "aggregated_results"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "SUCCESS"
+    assert data["total"] == 3
+    assert "results" not in data["result"]
+    assert [r["path"] for r in data["result"]["aggregated_results"]] == ["/img_1.jpg"]
+
+    data = client_authed.get(f"/inference/jobs/{job_id}").json()
+    assert data["limit"] == routes.RESULT_PAGE_SIZE
+    assert len(data["result"]["results"]) == 3
+    too_large = {"limit": routes.RESULT_PAGE_MAX + 1}
+    response = client_authed.get(f"/inference/jobs/{job_id}", params=too_large)
+    assert response.status_code == 422
+
+    jobs = client_authed.get("/inference/jobs").json()
+    assert [job["task_id"] for job in jobs] == [job_id]
+
+
+def test_async_job_results_apply_the_jobs_output_options(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task
+):
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/img.jpg"}],
+        "model": "google/vit-base-patch16-224",
+        "output": {"fields": ["results"], "topK": 1},
+    }
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    data = client_authed.get(f"/inference/jobs/{job_id}").json()
+    assert "aggregated_results" not in data["result"]
+    assert len(data["result"]["results"][0]["predictions"]) == 1
+
+    # Query parameters override the stored options
+    data = client_authed.get(
+        f"/inference/jobs/{job_id}",
+        params={"fields": "results,aggregated_results", "topK": 2},
+    ).json()
+    assert "aggregated_results" in data["result"]
+    assert len(data["result"]["results"][0]["predictions"]) == 2
+
+
+def test_sync_inference_returns_only_requested_output(
+    client_authed, mock_tapis_files_with_location, mock_vit, mock_celery_task
+):
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/img.jpg"}],
+        "model": "google/vit-base-patch16-224",
+        "output": {"fields": ["results"], "topK": 1},
+    }
+
+    data = client_authed.post("/inference/jobs/sync", json=payload).json()
+
+    assert data["aggregated_results"] == []
+    assert len(data["results"][0]["predictions"]) == 1
+    assert data["results"][0]["metadata"] is None
+
+
+def test_oversized_images_are_reported_per_file(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task, monkeypatch
+):
+    monkeypatch.setattr("imageinf.utils.io.IMAGE_MAX_PIXELS", 10)
+    payload = {
+        "files": [
+            {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+            for i in range(2)
+        ],
+        "model": "google/vit-base-patch16-224",
+    }
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    data = client_authed.get(f"/inference/jobs/{job_id}").json()
+
+    assert data["status"] == "SUCCESS"
+    assert data["total"] == 2
+    for result in data["result"]["results"]:
+        assert result["predictions"] == []
+        assert "pixels" in result["error"]
+
+
+def test_metadata_only_job(
+    client_authed, mock_tapis_files_with_location, mock_celery_task
+):
+    payload = {
+        "inferenceType": "metadata",
+        "files": [
+            {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+            for i in range(3)
+        ],
+    }
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    data = client_authed.get(f"/inference/jobs/{job_id}").json()
+
+    assert data["status"] == "SUCCESS"
+    assert data["result"]["model"] == "metadata"
+    results = data["result"]["results"]
+    assert [r["path"] for r in results] == ["/img_0.jpg", "/img_1.jpg", "/img_2.jpg"]
+    assert all(r["predictions"] == [] for r in results)
+    assert all(r["metadata"]["latitude"] is not None for r in results)
+
+
+def test_multi_model_job_downloads_each_image_once(
+    client_authed, mock_tapis_files, mock_celery_task, monkeypatch
+):
+    from imageinf.inference import processor
+    from imageinf.inference.models import Prediction
+
+    def fake_runner(label, score):
+        class FakeViT:
+            def __init__(self, model_name=None):
+                pass
+
+            def classify_image(self, image):
+                return [Prediction(label=label, score=score)]
+
+        return FakeViT
+
+    monkeypatch.setattr(
+        processor,
+        "MODEL_REGISTRY",
+        {
+            "google/vit-base-patch16-224": fake_runner("sports car", 0.8),
+            "google/vit-large-patch16-224": fake_runner("taxi, cab", 0.6),
+        },
+    )
+    downloads = []
+    get_image_file = processor.get_image_file
+
+    def counting_get_image_file(tapis, system, path, **kwargs):
+        downloads.append(path)
+        return get_image_file(tapis, system, path, **kwargs)
+
+    monkeypatch.setattr(processor, "get_image_file", counting_get_image_file)
+
+    payload = {
+        "files": [
+            {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+            for i in range(2)
+        ],
+        "models": ["google/vit-base-patch16-224", "google/vit-large-patch16-224"],
+        "combine": True,
+    }
+    job_id = client_authed.post("/inference/jobs", json=payload).json()["task_id"]
+
+    data = client_authed.get(f"/inference/jobs/{job_id}").json()
+
+    assert downloads == ["/img_0.jpg", "/img_1.jpg"]
+    assert data["total"] == 2
+    result = data["result"]
+    assert result["models"] == payload["models"]
+    assert [r["model"] for r in result["responses"]] == payload["models"]
+    assert result["responses"][1]["results"][0]["predictions"][0]["label"] == (
+        "taxi, cab"
+    )
+    assert result["combined_results"][0]["predictions"] == [
+        {"label": "car", "score": 0.7}
+    ]
+
+
+def test_sync_and_async_jobs_use_separate_queues(
+    client_authed, mock_tapis_files, mock_vit, mock_celery_task, monkeypatch
+):
+    from imageinf.inference import routes
+
+    queues = []
+    apply_async = routes.run_inference_task.apply_async
+
+    def recording_apply_async(*args, queue=None, **kwargs):
+        queues.append(queue)
+        return apply_async(*args, **kwargs)
+
+    monkeypatch.setattr(routes.run_inference_task, "apply_async", recording_apply_async)
+
+    payload = {
+        "files": [{"systemId": "designsafe.storage.default", "path": "/img.jpg"}],
+        "model": "google/vit-base-patch16-224",
+    }
+    assert client_authed.post("/inference/jobs/sync", json=payload).status_code == 200
+    assert client_authed.post("/inference/jobs", json=payload).status_code == 200
+
+    assert queues == ["interactive", "bulk"]
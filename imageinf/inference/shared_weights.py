@@ -0,0 +1,59 @@
+"""Load model weights once in the Celery parent process, before it forks.
+
+With the prefork pool every child otherwise loads its own copy of each model.
+Models listed in WORKER_PRELOAD_MODELS are instead loaded into the
+processor's model cache in the parent, pinned so they are never evicted; forked
+children inherit them and share the physical pages copy-on-write, as the
+weights are never written to.
+"""
+
+import gc
+import logging
+import os
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_PRELOAD_MODELS = [
+    m.strip() for m in os.getenv("WORKER_PRELOAD_MODELS", "").split(",") if m.strip()
+]
+
+# Intra-op thread count for children, captured before the parent is pinned to
+# one thread (so it never starts an OpenMP pool that forked children inherit)
+_child_num_threads: Optional[int] = None
+
+
+def preload_models_for_fork(model_names: List[str] = WORKER_PRELOAD_MODELS):
+    global _child_num_threads
+
+    if not model_names:
+        return
+
+    import torch
+    from imageinf.inference import processor
+
+    _child_num_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+
+    logger.info("Preloading %s in worker parent for shared weights", model_names)
+    # Pinned, so children never evict them and load private copies instead
+    processor.pin_models(model_names)
+    for model_name in model_names:
+        runner = processor.load_model(model_name)
+        runner.model.eval()
+        runner.model.requires_grad_(False)
+
+    # Move everything allocated so far out of the GC's generations; otherwise
+    # collections in the children touch (and so copy) the inherited objects
+    gc.collect()
+    gc.freeze()
+
+
+def init_forked_child():
+    """Restore the intra-op thread count in a freshly forked child."""
+    if _child_num_threads is None:
+        return
+
+    import torch
+
+    torch.set_num_threads(_child_num_threads)
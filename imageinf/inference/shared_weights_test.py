@@ -0,0 +1,61 @@
+import gc
+
+import torch
+
+from imageinf.inference import processor, shared_weights
+
+
+def test_preloaded_models_are_reused_from_the_parent(monkeypatch):
+    class FakeRunner:
+        def __init__(self, model_name=None):
+            self.model = torch.nn.Linear(4, 2)
+
+    monkeypatch.setattr(processor, "MODEL_REGISTRY", {"fake/model": FakeRunner})
+    monkeypatch.setattr(
+        processor,
+        "MODEL_METADATA",
+        {"fake/model": {"name": "fake/model", "type": "vit"}},
+    )
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+    monkeypatch.setattr(processor, "_pinned_models", set())
+    threads = torch.get_num_threads()
+
+    try:
+        shared_weights.preload_models_for_fork(["fake/model"])
+        preloaded = processor._model_cache["fake/model"]
+
+        assert torch.get_num_threads() == 1
+        assert not any(p.requires_grad for p in preloaded.model.parameters())
+
+        shared_weights.init_forked_child()
+
+        assert torch.get_num_threads() == threads
+        assert processor.load_model("fake/model") is preloaded
+    finally:
+        gc.unfreeze()
+        torch.set_num_threads(threads)
+
+
+def test_preloaded_models_are_never_evicted(monkeypatch):
+    class FakeRunner:
+        def __init__(self, model_name=None):
+            self.model = torch.nn.Linear(4, 2)
+
+    names = ["fake/preloaded", "fake/a", "fake/b"]
+    monkeypatch.setattr(processor, "MODEL_REGISTRY", {n: FakeRunner for n in names})
+    monkeypatch.setattr(
+        processor, "MODEL_METADATA", {n: {"name": n, "type": "vit"} for n in names}
+    )
+    monkeypatch.setattr(processor, "plan_admission", lambda *a, **kw: [])
+    monkeypatch.setattr(processor, "_model_cache", processor.OrderedDict())
+    monkeypatch.setattr(processor, "_pinned_models", set())
+    monkeypatch.setattr(processor, "MODEL_CACHE_SIZE", 1)
+
+    processor.pin_models(["fake/preloaded"])
+    preloaded = processor._model_cache["fake/preloaded"]
+    processor.load_model("fake/a")
+    processor.load_model("fake/b")
+
+    # One slot for other models, on top of the pinned one
+    assert list(processor._model_cache) == ["fake/preloaded", "fake/b"]
+    assert processor.load_model("fake/preloaded") is preloaded
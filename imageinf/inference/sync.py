@@ -0,0 +1,82 @@
+"""Helpers for serving synchronous inference from the async event loop."""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.result import AsyncResult
+
+SYNC_INFERENCE_MAX_CONCURRENCY = int(os.getenv("SYNC_INFERENCE_MAX_CONCURRENCY", "8"))
+SYNC_INFERENCE_TIMEOUT = float(os.getenv("SYNC_INFERENCE_TIMEOUT", "120"))
+
+# Result backend polling: start fast for small jobs, back off for slow ones
+POLL_INITIAL_INTERVAL = 0.05
+POLL_MAX_INTERVAL = 0.5
+
+# Result backend polls and broker publishes are blocking Redis/AMQP calls; they
+# run on this small pool so a slow backend or a publish retry (while the broker
+# is down) never stalls the event loop and every other endpoint with it
+BACKEND_IO_THREADS = int(os.getenv("BACKEND_IO_THREADS", "4"))
+_backend_io = ThreadPoolExecutor(
+    max_workers=BACKEND_IO_THREADS, thread_name_prefix="celery-io"
+)
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on in-flight requests.
+
+    Only used from the event loop (a single thread), so a plain counter is
+    enough. Callers that cannot acquire a slot are rejected immediately
+    instead of queueing, which keeps tail latency bounded under load.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+sync_inference_limiter = ConcurrencyLimiter(SYNC_INFERENCE_MAX_CONCURRENCY)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """`func(*args, **kwargs)` on the backend I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_backend_io, partial(func, *args, **kwargs))
+
+
+async def publish(task, **options) -> AsyncResult:
+    """`task.apply_async(**options)`, with the broker publish off the loop."""
+    return await run_blocking(task.apply_async, **options)
+
+
+async def wait_for_result(result: AsyncResult, timeout: float):
+    """Await a Celery task result without holding a threadpool thread.
+
+    Polls the result backend (a cheap Redis GET, made on the backend I/O
+    pool) with exponential back-off and sleeps on the event loop in between.
+    Raises Celery's TimeoutError if the task is not done within `timeout`
+    seconds; task exceptions propagate as with `AsyncResult.get()`.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    interval = POLL_INITIAL_INTERVAL
+
+    while not await run_blocking(result.ready):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise CeleryTimeoutError("The operation timed out.")
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 2, POLL_MAX_INTERVAL)
+
+    return await run_blocking(result.get, timeout=timeout)
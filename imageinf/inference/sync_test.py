@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+
+from imageinf.inference.sync import ConcurrencyLimiter, wait_for_result
+
+
+class SlowResult:
+    def __init__(self, ready_after_polls, value="done"):
+        self.polls = 0
+        self.ready_after_polls = ready_after_polls
+        self.value = value
+
+    def ready(self):
+        self.polls += 1
+        return self.polls > self.ready_after_polls
+
+    def get(self, timeout=None):
+        return self.value
+
+
+def test_wait_for_result_polls_until_ready():
+    result = SlowResult(ready_after_polls=3)
+    assert asyncio.run(wait_for_result(result, timeout=5)) == "done"
+    assert result.polls == 4
+
+
+def test_wait_for_result_times_out():
+    with pytest.raises(CeleryTimeoutError):
+        asyncio.run(wait_for_result(SlowResult(ready_after_polls=10**6), timeout=0.1))
+
+
+def test_wait_for_result_keeps_slow_backend_calls_off_the_loop():
+    class SlowBackendResult(SlowResult):
+        def ready(self):
+            time.sleep(0.2)  # e.g. a slow Redis
+            return super().ready()
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        await wait_for_result(SlowBackendResult(ready_after_polls=0), timeout=5)
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(main()) > 5
+
+
+def test_concurrency_limiter():
+    limiter = ConcurrencyLimiter(limit=1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
@@ -1,4 +1,5 @@
 import logging
+from celery.exceptions import SoftTimeLimitExceeded
 from imageinf.celery_app import celery
 
 logger = logging.getLogger(__name__)
@@ -12,24 +13,286 @@ def run_inference_task(
     model: str,
     labels: list[str] | None = None,
     sensitivity: float | None = None,
+    directories: list[dict] | None = None,
+    models: list[str] | None = None,
+    combine: bool = False,
+    interactive: bool = False,
+    tiling: dict | None = None,
+    dedup: bool = False,
+    dedup_cache: bool = False,
+    output: dict | None = None,
+    skip: int = 0,
+    admission_retries: int = 0,
+):
+    from imageinf.inference import cancellation, fair_share
+    from imageinf.inference.processor import TimeLimitReached
+
+    should_stop = cancellation.CancelCheck(
+        cancellation.get_cancel_flags(), self.request.id
+    )
+    if should_stop():
+        logger.info("Task %s: Cancelled before it started", self.request.id)
+        return None
+
+    # Interactive (sync) jobs have their own queue and are never capped
+    slots = None if interactive else fair_share.get_user_slots()
+    username = user_data["username"]
+    if slots is not None and not slots.try_acquire(username, self.request.id):
+        logger.info(
+            "Task %s: %s is at the bulk concurrency cap, re-queued",
+            self.request.id,
+            username,
+        )
+        raise self.retry(countdown=fair_share.FAIR_SHARE_RETRY_DELAY, max_retries=None)
+
+    try:
+        return _run_inference(
+            self,
+            files,
+            user_data,
+            model,
+            labels,
+            sensitivity,
+            directories,
+            models,
+            combine,
+            tiling,
+            dedup,
+            dedup_cache,
+            output,
+            should_stop,
+            skip,
+            admission_retries,
+            interactive,
+        )
+    except TimeLimitReached as e:
+        # Checkpointed; the rest of the job runs as a new task with this id
+        completed = skip + e.completed
+    finally:
+        if slots is not None:
+            slots.release(username, self.request.id)
+
+    return _continue_job(self, completed)
+
+
+def _checkpoint(task, store, error, skip: int):
+    """Store the results of a part of a job stopped by the soft time limit
+    (`error`, a TimeLimitReached), so the job can continue from there. Jobs
+    not in the result store (sync jobs), or parts that got through no file,
+    fail instead."""
+    if error.completed and store.save_results(
+        task.request.id, error.response, status=None, offset=skip
+    ):
+        logger.info("Task %s: Checkpointed at the soft time limit", task.request.id)
+        return
+    store.mark_failed(task.request.id, str(error))
+    raise SoftTimeLimitExceeded() from error
+
+
+def _continue_job(task, completed: int):
+    """Replace `task` with one (under the same id) for the rest of its job."""
+    from imageinf.celery_app import BULK_QUEUE
+
+    logger.info("Task %s: Continuing after %d files", task.request.id, completed)
+    return task.replace(
+        task.signature(
+            task.request.args,
+            dict(task.request.kwargs or {}, skip=completed),
+            queue=BULK_QUEUE,
+        )
+    )
+
+
+def _run_inference(
+    task,
+    files,
+    user_data,
+    model,
+    labels,
+    sensitivity,
+    directories,
+    models,
+    combine,
+    tiling,
+    dedup,
+    dedup_cache,
+    output,
+    should_stop=None,
+    skip=0,
+    admission_retries=0,
+    interactive=False,
 ):
     logger.info(
-        "Task %s: Starting inference model=%s files=%d",
-        self.request.id,
-        model,
+        "Task %s: Starting inference model=%s files=%d directories=%d",
+        task.request.id,
+        ",".join(models) if models else model,
         len(files),
+        len(directories or []),
     )
 
-    from imageinf.inference.processor import run_model_on_tapis_images
-    from imageinf.inference.models import TapisFile
+    from imageinf.inference.processor import (
+        TimeLimitReached,
+        run_model_on_tapis_images,
+        run_models_on_tapis_images,
+    )
+    from imageinf.inference.models import TapisDirectory, TapisFile, TilingOptions
     from imageinf.utils.auth import TapisUser
 
+    from imageinf.inference import admission
+    from imageinf.inference.compact import encode_task_result, project_response
+    from imageinf.inference.models import OutputOptions
+    from imageinf.inference.result_store import get_result_store
+
     user = TapisUser(**user_data)
     tapis_files = [TapisFile(**f) for f in files]
+    store = get_result_store()
+
+    try:
+        tapis_directories = [TapisDirectory(**d) for d in directories or []]
+        tiling_options = TilingOptions(**tiling) if tiling else None
+        if models:
+            # One pass over the images for all models
+            result = run_models_on_tapis_images(
+                tapis_files,
+                user,
+                models,
+                labels=labels,
+                sensitivity=sensitivity,
+                directories=tapis_directories,
+                combine=combine,
+                tiling=tiling_options,
+                dedup=dedup,
+                dedup_cache=dedup_cache,
+                should_stop=should_stop,
+                skip=skip,
+            )
+        else:
+            result = run_model_on_tapis_images(
+                tapis_files,
+                user,
+                model,
+                labels=labels,
+                sensitivity=sensitivity,
+                directories=tapis_directories,
+                tiling=tiling_options,
+                dedup=dedup,
+                dedup_cache=dedup_cache,
+                should_stop=should_stop,
+                skip=skip,
+            )
+    except admission.ModelAdmissionError as e:
+        # Counted apart from request.retries, which fair-share re-queues bump.
+        # Sync jobs fail right away; the API tells the client when to retry.
+        if (
+            e.retryable
+            and not interactive
+            and admission_retries < admission.MODEL_ADMISSION_MAX_RETRIES
+        ):
+            logger.warning("Task %s: Deferred, %s", task.request.id, e)
+            raise task.retry(
+                exc=e,
+                kwargs=dict(
+                    task.request.kwargs or {}, admission_retries=admission_retries + 1
+                ),
+                countdown=admission.MODEL_ADMISSION_RETRY_DELAY,
+                max_retries=None,
+            )
+        store.mark_failed(task.request.id, str(e))
+        raise
+    except TimeLimitReached as e:
+        _checkpoint(task, store, e, skip)
+        raise
+    except Exception as e:
+        store.mark_failed(task.request.id, str(e))
+        raise
+
+    cancelled = should_stop is not None and should_stop.cancelled
+    status = "CANCELLED" if cancelled else "SUCCESS"
+    if store.save_results(task.request.id, result, status=status, offset=skip):
+        logger.info("Task %s: Stored results", task.request.id)
+
+    logger.info(
+        "Task %s: %s", task.request.id, "Cancelled" if cancelled else "Complete"
+    )
+    # The result store keeps everything; the backend only what was asked for
+    output_options = OutputOptions(**output) if output else None
+    return encode_task_result(project_response(result, output_options))
+
+
+@celery.task(bind=True)
+def extract_metadata_task(
+    self,
+    files: list[dict],
+    user_data: dict,
+    directories: list[dict] | None = None,
+    skip: int = 0,
+):
+    logger.info(
+        "Task %s: Extracting metadata files=%d directories=%d",
+        self.request.id,
+        len(files),
+        len(directories or []),
+    )
 
-    result = run_model_on_tapis_images(
-        tapis_files, user, model, labels=labels, sensitivity=sensitivity
+    from imageinf.inference import cancellation
+    from imageinf.inference.compact import encode_task_result
+    from imageinf.inference.models import TapisDirectory, TapisFile
+    from imageinf.inference.processor import (
+        TimeLimitReached,
+        extract_metadata_from_tapis_images,
+    )
+    from imageinf.inference.result_store import get_result_store
+    from imageinf.utils.auth import TapisUser
+
+    should_stop = cancellation.CancelCheck(
+        cancellation.get_cancel_flags(), self.request.id
+    )
+    if should_stop():
+        logger.info("Task %s: Cancelled before it started", self.request.id)
+        return None
+
+    store = get_result_store()
+    try:
+        result = extract_metadata_from_tapis_images(
+            [TapisFile(**f) for f in files],
+            TapisUser(**user_data),
+            directories=[TapisDirectory(**d) for d in directories or []],
+            should_stop=should_stop,
+            skip=skip,
+        )
+    except TimeLimitReached as e:
+        _checkpoint(self, store, e, skip)
+        return _continue_job(self, skip + e.completed)
+    except Exception as e:
+        store.mark_failed(self.request.id, str(e))
+        raise
+
+    cancelled = should_stop.cancelled
+    status = "CANCELLED" if cancelled else "SUCCESS"
+    store.save_results(self.request.id, result, status=status, offset=skip)
+    logger.info(
+        "Task %s: %s", self.request.id, "Cancelled" if cancelled else "Complete"
     )
+    return encode_task_result(result)
+
+
+@celery.task(bind=True)
+def embed_query_task(
+    self,
+    user_data: dict,
+    model: str,
+    system_id: str,
+    path: str | None = None,
+    text: str | None = None,
+):
+    logger.info(
+        "Task %s: Embedding similarity query model=%s system=%s",
+        self.request.id,
+        model,
+        system_id,
+    )
+
+    from imageinf.inference.processor import embed_query
+    from imageinf.utils.auth import TapisUser
 
-    logger.info("Task %s: Complete", self.request.id)
-    return result.model_dump()
+    return embed_query(TapisUser(**user_data), model, system_id, path=path, text=text)
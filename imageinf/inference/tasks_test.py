@@ -36,3 +36,169 @@ def test_run_inference_task_invalid_model(mock_tapis_files, mock_tapis_auth):
 
     with pytest.raises(ValueError):
         run_inference_task(files, user_data, "nonexistent/model")
+
+
+def test_run_inference_task_expands_directories(
+    mock_tapis_files, mock_tapis_auth, mock_vit
+):
+    from types import SimpleNamespace
+
+    mock_tapis_files.files.listFiles.side_effect = lambda **kwargs: [
+        SimpleNamespace(name=name, type="file", size=1, lastModified="t")
+        for name in ("a.jpg", "b.jpg", "readme.md")
+    ]
+    user_data = {
+        "username": "testuser",
+        "tapis_token": "fake-token",
+        "tenant_host": "https://designsafe.tapis.io",
+    }
+
+    result = run_inference_task(
+        [],
+        user_data,
+        "google/vit-base-patch16-224",
+        directories=[{"systemId": "designsafe.storage.default", "path": "/project"}],
+    )
+
+    assert [r["path"] for r in result["results"]] == [
+        "/project/a.jpg",
+        "/project/b.jpg",
+    ]
+
+
+def soft_limit_on_call(monkeypatch, call_number, reader="get_image_file"):
+    """Make the soft time limit fire while the `call_number`th image (counting
+    from 1, across tasks) is read by `reader`."""
+    from celery.exceptions import SoftTimeLimitExceeded
+
+    from imageinf.inference import processor
+
+    read = getattr(processor, reader)
+    calls = []
+
+    def read_until_time_limit(*args, **kwargs):
+        calls.append(args[2])
+        if len(calls) == call_number:
+            raise SoftTimeLimitExceeded()
+        return read(*args, **kwargs)
+
+    monkeypatch.setattr(processor, reader, read_until_time_limit)
+    return calls
+
+
+def test_job_continues_after_soft_time_limit(
+    mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    from imageinf.inference.result_store import get_result_store
+
+    files = [
+        {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+        for i in range(3)
+    ]
+    user_data = {
+        "username": "testuser",
+        "tapis_token": "fake-token",
+        "tenant_host": "https://designsafe.tapis.io",
+    }
+    store = get_result_store()
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 3)
+    calls = soft_limit_on_call(monkeypatch, 2)
+
+    run_inference_task.apply(
+        args=(files, user_data, "google/vit-base-patch16-224"), task_id="job-1"
+    ).get()
+
+    # The interrupted file is redone by the continuation task
+    assert calls == ["/img_0.jpg", "/img_1.jpg", "/img_1.jpg", "/img_2.jpg"]
+    assert store.get_job("job-1")["status"] == "SUCCESS"
+    results = store.get_results("job-1")["results"]
+    assert [r["path"] for r in results] == ["/img_0.jpg", "/img_1.jpg", "/img_2.jpg"]
+
+
+def test_job_without_progress_fails_at_soft_time_limit(
+    mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    from celery.exceptions import SoftTimeLimitExceeded
+
+    from imageinf.inference.result_store import get_result_store
+
+    files = [
+        {"systemId": "designsafe.storage.default", "path": "/path/to/test-image.jpg"}
+    ]
+    user_data = {
+        "username": "testuser",
+        "tapis_token": "fake-token",
+        "tenant_host": "https://designsafe.tapis.io",
+    }
+    store = get_result_store()
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 1)
+    soft_limit_on_call(monkeypatch, 1)
+
+    result = run_inference_task.apply(
+        args=(files, user_data, "google/vit-base-patch16-224"), task_id="job-1"
+    )
+
+    with pytest.raises(SoftTimeLimitExceeded):
+        result.get()
+    assert store.get_job("job-1")["status"] == "FAILURE"
+
+
+def test_soft_time_limit_while_listing_fails_the_job(
+    mock_tapis_files, mock_tapis_auth, mock_vit, monkeypatch
+):
+    from celery.exceptions import SoftTimeLimitExceeded
+
+    from imageinf.inference import processor
+    from imageinf.inference.result_store import get_result_store
+
+    def slow_listing(*args, **kwargs):
+        raise SoftTimeLimitExceeded()
+
+    monkeypatch.setattr(processor, "stat_remote_files", slow_listing)
+    files = [
+        {"systemId": "designsafe.storage.default", "path": "/path/to/test-image.jpg"}
+    ]
+    user_data = {
+        "username": "testuser",
+        "tapis_token": "fake-token",
+        "tenant_host": "https://designsafe.tapis.io",
+    }
+    store = get_result_store()
+    store.create_job("job-1", "testuser", "google/vit-base-patch16-224", 1)
+
+    result = run_inference_task.apply(
+        args=(files, user_data, "google/vit-base-patch16-224"), task_id="job-1"
+    )
+
+    with pytest.raises(SoftTimeLimitExceeded):
+        result.get()
+    assert store.get_job("job-1")["status"] == "FAILURE"
+
+
+def test_metadata_job_continues_after_soft_time_limit(
+    mock_tapis_files, mock_tapis_auth, monkeypatch
+):
+    from imageinf.inference import processor
+    from imageinf.inference.result_store import get_result_store
+    from imageinf.inference.tasks import extract_metadata_task
+
+    files = [
+        {"systemId": "designsafe.storage.default", "path": f"/img_{i}.jpg"}
+        for i in range(3)
+    ]
+    user_data = {
+        "username": "testuser",
+        "tapis_token": "fake-token",
+        "tenant_host": "https://designsafe.tapis.io",
+    }
+    store = get_result_store()
+    store.create_job("job-1", "testuser", "metadata", 3)
+    monkeypatch.setattr(processor, "METADATA_BATCH_SIZE", 1)
+    calls = soft_limit_on_call(monkeypatch, 2, reader="get_image_metadata")
+
+    extract_metadata_task.apply(args=(files, user_data), task_id="job-1").get()
+
+    assert calls == ["/img_0.jpg", "/img_1.jpg", "/img_1.jpg", "/img_2.jpg"]
+    assert store.get_job("job-1")["status"] == "SUCCESS"
+    results = store.get_results("job-1")["results"]
+    assert [r["path"] for r in results] == ["/img_0.jpg", "/img_1.jpg", "/img_2.jpg"]
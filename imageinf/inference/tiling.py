@@ -0,0 +1,131 @@
+"""Tiled inference for large aerial and drone images.
+
+Instead of squashing a whole orthomosaic or high-resolution frame to the
+model's input size (losing small objects such as debris or vehicles), the
+image is cut into overlapping tiles that are classified in batches (sized per
+model, see `batching`). A label's score for the image is its highest score over
+all tiles.
+
+Decoding is bounded: images larger than TILING_MAX_DECODE_PIXELS are decoded
+at reduced resolution. For JPEGs this happens inside the decoder (draft mode,
+down to 1/8 scale), so the full-resolution image is never held in memory;
+other formats are decoded and then downscaled. Tiles are cropped lazily, one
+batch at a time.
+"""
+
+import math
+import os
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from .batching import run_batched
+from .categories import aggregate_predictions
+from .models import Prediction, TilePrediction, TilingOptions
+
+TILING_MAX_DECODE_PIXELS = int(os.getenv("TILING_MAX_DECODE_PIXELS", "64000000"))
+
+Box = Tuple[int, int, int, int]
+
+
+def decode_bounded(
+    image: Image.Image, max_pixels: int = TILING_MAX_DECODE_PIXELS
+) -> Tuple[Image.Image, float]:
+    """RGB image with at most `max_pixels` pixels, and the factor mapping its
+    coordinates back to the original image."""
+    # Images drafted by `get_image_file` remember their original size
+    original_width = image.info.get("original_size", image.size)[0]
+    width, height = image.size
+    if width * height > max_pixels:
+        factor = math.sqrt(width * height / max_pixels)
+        target = (int(width / factor), int(height / factor))
+        # Only JPEG implements draft; it picks the smallest scale >= target
+        image.draft("RGB", target)
+        if image.size[0] * image.size[1] > max_pixels:
+            image = image.resize(target, Image.Resampling.BILINEAR)
+    decoded = image if image.mode == "RGB" else image.convert("RGB")
+    return decoded, original_width / decoded.size[0]
+
+
+def tile_boxes(width: int, height: int, tile_size: int, overlap: float) -> List[Box]:
+    """Boxes (left, upper, right, lower) covering the image with tiles that
+    overlap by `overlap`; edge tiles are shifted inwards to stay full size."""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def _starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, stride)) + [length - tile_size]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height)
+        for x in _starts(width)
+    ]
+
+
+def max_merge(prediction_lists: List[List[Prediction]]) -> List[Prediction]:
+    """Highest score of each label over all tiles, best first."""
+    best = {}
+    for predictions in prediction_lists:
+        for pred in predictions:
+            best[pred.label] = max(best.get(pred.label, 0.0), pred.score)
+    merged = [Prediction(label=label, score=score) for label, score in best.items()]
+    return sorted(merged, key=lambda p: p.score, reverse=True)
+
+
+def classify_tiled(
+    model,
+    model_type: str,
+    image: Image.Image,
+    options: TilingOptions,
+    sensitivity: str = "medium",
+    scale: float = 1.0,
+) -> Tuple[List[Prediction], List[Prediction], Optional[List[TilePrediction]]]:
+    """Classify `image` (decoded by `decode_bounded`, `scale` its factor to the
+    original) tile by tile.
+
+    Returns (predictions, aggregated predictions, per-tile predictions if
+    `options.returnTiles`). Tile predictions use the aggregated labels
+    (categories for ViT models, the requested labels for CLIP).
+    """
+    tile_size = max(1, round(options.tileSize / scale))
+    boxes = tile_boxes(*image.size, tile_size, options.overlap)
+
+    if model_type == "clip":
+        features = run_batched(
+            model, model.image_features_batch, boxes, image.crop, options.batchSize
+        )
+        tile_predictions = [
+            model.classify_features(
+                feature[None, :], sensitivity=sensitivity, debug_when_empty=False
+            )
+            for feature in features
+        ]
+        tile_aggregated = tile_predictions
+    else:
+        tile_predictions = run_batched(
+            model, model.classify_images, boxes, image.crop, options.batchSize
+        )
+        tile_aggregated = [aggregate_predictions(p) for p in tile_predictions]
+
+    predictions = max_merge(tile_predictions)
+    if model_type == "clip":
+        aggregated = predictions
+    else:
+        predictions = predictions[:5]
+        aggregated = max_merge(tile_aggregated)
+
+    tiles = None
+    if options.returnTiles:
+        tiles = [
+            TilePrediction(
+                x=round(left * scale),
+                y=round(upper * scale),
+                width=round((right - left) * scale),
+                height=round((lower - upper) * scale),
+                predictions=tile,
+            )
+            for (left, upper, right, lower), tile in zip(boxes, tile_aggregated)
+        ]
+    return predictions, aggregated, tiles
@@ -0,0 +1,89 @@
+import io
+
+from PIL import Image
+
+from imageinf.inference import tiling
+from imageinf.inference.manifest import TINY_CLIP, TINY_VIT
+from imageinf.inference.models import TapisFile, TilingOptions
+from imageinf.inference.processor import run_model_on_tapis_images
+from imageinf.inference.result_store import ResultStore
+from imageinf.utils.auth import TapisUser
+
+USER = TapisUser(
+    username="testuser",
+    tapis_token="fake-token",
+    tenant_host="https://designsafe.tapis.io",
+)
+
+
+def _jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "gray").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_tile_boxes_cover_the_image_with_full_size_edge_tiles():
+    boxes = tiling.tile_boxes(2500, 1000, 1000, 0.25)
+
+    assert boxes == [
+        (0, 0, 1000, 1000),
+        (750, 0, 1750, 1000),
+        (1500, 0, 2500, 1000),
+    ]
+    assert tiling.tile_boxes(500, 400, 1000, 0.25) == [(0, 0, 500, 400)]
+
+
+def test_decode_bounded_uses_jpeg_draft_for_large_images():
+    image = Image.open(io.BytesIO(_jpeg(4000, 3000)))
+
+    decoded, scale = tiling.decode_bounded(image, max_pixels=1_000_000)
+
+    assert decoded.mode == "RGB"
+    assert decoded.size[0] * decoded.size[1] <= 1_000_000
+    assert scale == 4000 / decoded.size[0]
+
+
+def test_max_merge_keeps_the_best_score_per_label():
+    from imageinf.inference.models import Prediction
+
+    merged = tiling.max_merge(
+        [
+            [Prediction(label="car", score=0.2), Prediction(label="tree", score=0.7)],
+            [Prediction(label="car", score=0.9)],
+        ]
+    )
+
+    assert [(p.label, p.score) for p in merged] == [("car", 0.9), ("tree", 0.7)]
+
+
+def test_tiled_inference_with_tiny_models(
+    tiny_models, mock_tapis_files_factory, monkeypatch
+):
+    mock_tapis_files_factory(_jpeg(2048, 1024))
+    monkeypatch.setattr(tiling, "TILING_MAX_DECODE_PIXELS", 1_000_000)
+    files = [TapisFile(systemId="designsafe.storage.default", path="/ortho.jpg")]
+    options = TilingOptions(tileSize=1024, overlap=0.5, batchSize=2, returnTiles=True)
+
+    for model_name in (TINY_VIT, TINY_CLIP):
+        response = run_model_on_tapis_images(
+            files, USER, model_name, labels=["car", "tree"], tiling=options
+        )
+
+        result = response.results[0]
+        assert result.predictions
+        assert len(result.tiles) == 3
+        assert (result.tiles[-1].x, result.tiles[-1].width) == (1024, 1024)
+        assert response.aggregated_results[0].tiles is None
+
+
+def test_tiles_are_stored_with_results(tmp_path, tiny_models, mock_tapis_files):
+    files = [TapisFile(systemId="designsafe.storage.default", path="/img.jpg")]
+    options = TilingOptions(tileSize=64, returnTiles=True)
+    response = run_model_on_tapis_images(files, USER, TINY_VIT, tiling=options)
+
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.create_job("job-1", "testuser", TINY_VIT, 1)
+    assert store.save_results("job-1", response)
+
+    stored = store.get_results("job-1")["results"][0]
+    assert stored["tiles"] == [t.model_dump() for t in response.results[0].tiles]
@@ -0,0 +1,178 @@
+"""Tiny random-weight ViT, Swin and CLIP models for tests and benchmarks.
+
+They share the architectures and runner code paths of the real models but are
+built locally from small configs (a few hundred thousand parameters, 32x32
+inputs), so nothing is downloaded from the HF hub. Checkpoints are generated
+deterministically on first use under TINY_MODEL_DIR and then loaded with
+`from_pretrained` like any other model.
+
+The entries are listed in TINY_MODEL_MANIFEST and only served when
+TINY_MODELS_ENABLED=true (tests add them with the `tiny_models` fixture).
+Their predictions are meaningless; use them to measure throughput, batching
+and caching, not accuracy.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from imageinf.utils.config import TINY_MODEL_DIR
+
+from .base_transformer import TransformerModel
+from .clip_base import BaseCLIPModel
+from .manifest import TINY_CLIP, TINY_SWIN, TINY_VIT
+from .registry import register_model_runner
+
+IMAGE_SIZE = 32
+
+# ImageNet-style labels, chosen so `aggregate_predictions` maps them to categories
+LABELS = [
+    "sports car, sport car",
+    "pickup, pickup truck",
+    "ambulance",
+    "school bus",
+    "tabby, tabby cat",
+    "golden retriever",
+    "mobile home, manufactured home",
+    "church, church building",
+    "suspension bridge",
+    "lakeside, lakeshore",
+]
+
+
+def tiny_checkpoint(model_name: str) -> str:
+    """Local directory holding the checkpoint of a tiny model, built on first use."""
+    path = os.path.join(TINY_MODEL_DIR, model_name.replace("/", "--"))
+    if not os.path.isdir(path):
+        os.makedirs(TINY_MODEL_DIR, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=TINY_MODEL_DIR)
+        _BUILDERS[model_name](tmp_path)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Built concurrently by another process
+            shutil.rmtree(tmp_path)
+    return path
+
+
+def _build_classifier(path: str, config):
+    import torch
+    from transformers import AutoModelForImageClassification, ViTImageProcessor
+
+    config.id2label = dict(enumerate(LABELS))
+    config.label2id = {label: i for i, label in enumerate(LABELS)}
+    torch.manual_seed(0)
+    AutoModelForImageClassification.from_config(config).save_pretrained(path)
+    ViTImageProcessor(size={"height": IMAGE_SIZE, "width": IMAGE_SIZE}).save_pretrained(
+        path
+    )
+
+
+def _build_vit(path: str):
+    from transformers import ViTConfig
+
+    _build_classifier(
+        path,
+        ViTConfig(
+            image_size=IMAGE_SIZE,
+            patch_size=8,
+            hidden_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            intermediate_size=64,
+        ),
+    )
+
+
+def _build_swin(path: str):
+    from transformers import SwinConfig
+
+    _build_classifier(
+        path,
+        SwinConfig(
+            image_size=IMAGE_SIZE,
+            patch_size=4,
+            embed_dim=16,
+            depths=[1, 1],
+            num_heads=[1, 2],
+            window_size=4,
+        ),
+    )
+
+
+def _build_clip(path: str):
+    import torch
+    from transformers import (
+        CLIPConfig,
+        CLIPImageProcessor,
+        CLIPModel,
+        CLIPProcessor,
+        CLIPTokenizer,
+    )
+    from transformers.models.clip.tokenization_clip import bytes_to_unicode
+
+    # Byte-level vocabulary without merges: every character is its own token
+    chars = list(bytes_to_unicode().values())
+    tokens = chars + [c + "</w>" for c in chars] + ["<|startoftext|>", "<|endoftext|>"]
+    vocab = {token: i for i, token in enumerate(tokens)}
+    with open(os.path.join(path, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(path, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(
+        os.path.join(path, "vocab.json"), os.path.join(path, "merges.txt")
+    )
+
+    config = CLIPConfig(
+        text_config={
+            "vocab_size": len(vocab),
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 2,
+            "max_position_embeddings": 77,
+            "bos_token_id": vocab["<|startoftext|>"],
+            "eos_token_id": vocab["<|endoftext|>"],
+            "pad_token_id": vocab["<|endoftext|>"],
+        },
+        vision_config={
+            "image_size": IMAGE_SIZE,
+            "patch_size": 8,
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 2,
+        },
+        projection_dim=16,
+    )
+    torch.manual_seed(0)
+    CLIPModel(config).save_pretrained(path)
+    CLIPProcessor(
+        image_processor=CLIPImageProcessor(
+            size={"shortest_edge": IMAGE_SIZE},
+            crop_size={"height": IMAGE_SIZE, "width": IMAGE_SIZE},
+        ),
+        tokenizer=tokenizer,
+    ).save_pretrained(path)
+
+
+_BUILDERS = {TINY_VIT: _build_vit, TINY_SWIN: _build_swin, TINY_CLIP: _build_clip}
+
+
+@register_model_runner(TINY_VIT)
+class TinyViTModel(TransformerModel):
+    def pretrained_source(self, model_name: str) -> str:
+        return tiny_checkpoint(model_name)
+
+
+@register_model_runner(TINY_SWIN)
+class TinySwinModel(TransformerModel):
+    def pretrained_source(self, model_name: str) -> str:
+        return tiny_checkpoint(model_name)
+
+
+@register_model_runner(TINY_CLIP)
+class TinyCLIPModel(BaseCLIPModel):
+    def pretrained_source(self, model_name: str) -> str:
+        return tiny_checkpoint(model_name)
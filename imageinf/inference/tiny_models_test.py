@@ -0,0 +1,40 @@
+import numpy as np
+from PIL import Image
+
+from imageinf.inference import processor
+from imageinf.inference.manifest import TINY_CLIP, TINY_SWIN, TINY_VIT
+from imageinf.inference.models import TapisFile
+from imageinf.inference.processor import run_model_on_tapis_images
+from imageinf.utils.auth import TapisUser
+
+USER = TapisUser(
+    username="testuser",
+    tapis_token="fake-token",
+    tenant_host="https://designsafe.tapis.io",
+)
+
+
+def test_tiny_models_run_through_the_real_runners(tiny_models):
+    image = Image.new("RGB", (64, 48), "gray")
+
+    for model_name in (TINY_VIT, TINY_SWIN):
+        predictions = processor.load_model(model_name).classify_image(image)
+        scores = [p.score for p in predictions]
+        assert len(scores) == 5
+        assert scores == sorted(scores, reverse=True)
+
+    clip = processor.load_model(TINY_CLIP, labels=["car", "tree"])
+    assert clip.embed_image(image).shape == clip.embed_text("flood").shape
+    assert clip.embed_image(image).dtype == np.float32
+    assert clip.text_pairs.shape[:2] == (2, 2)
+
+
+def test_tiny_models_in_the_inference_pipeline(tiny_models, mock_tapis_files):
+    files = [TapisFile(systemId="designsafe.storage.default", path="/img.jpg")]
+
+    for model_name in tiny_models:
+        response = run_model_on_tapis_images(files, USER, model_name)
+
+        assert response.model == model_name
+        assert len(response.results) == 1
+        assert response.results[0].metadata is not None
@@ -1,10 +1,12 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 from imageinf.status.routes import router as status_router
 from imageinf.inference.routes import router as inference_router
+from imageinf.inference.fast_path import SYNC_FAST_PATH_ENABLED, fast_path_pool
 
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 
@@ -14,11 +16,21 @@ logging.basicConfig(
 
 logging.getLogger("imageinf").setLevel(getattr(logging, log_level))
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SYNC_FAST_PATH_ENABLED:
+        fast_path_pool.start()
+    yield
+    fast_path_pool.shutdown()
+
+
 app = FastAPI(
     title="imageInf API",
     description="A simple image inference API",
     version="0.1.0",
     root_path="/api",
+    lifespan=lifespan,
 )
 
 app.include_router(status_router)
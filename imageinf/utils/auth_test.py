@@ -89,3 +89,18 @@ def test_token_validation_unexpected_exception(client_authed, monkeypatch):
 
     assert response.status_code == 500
     assert response.json()["detail"] == "Internal server error"
+
+
+def test_allowed_tenant_host_is_validated_against_its_keys(
+    client_unauthed, tapis_standin, monkeypatch
+):
+    headers = {"X-Tapis-Token": tapis_standin.mint_token("alice")}
+
+    response = client_unauthed.get("/inference/models", headers=headers)
+    assert response.status_code == 401
+
+    monkeypatch.setattr(
+        "imageinf.utils.auth.TAPIS_ALLOWED_TENANT_HOSTS", [tapis_standin.base_url]
+    )
+    response = client_unauthed.get("/inference/models", headers=headers)
+    assert response.status_code == 200
@@ -1 +1,22 @@
+import os
+
 CACHE_DIR = "cache_images"  # TODO add periodic cleanup
+EMBEDDINGS_DIR = "cache_embeddings"
+PIXEL_CACHE_DIR = "cache_pixels"
+TINY_MODEL_DIR = "cache_tiny_models"
+RESULT_DB_PATH = os.getenv("RESULT_DB_PATH", "imageinf_results.db")
+
+# Limits checked before an image is decoded (see imageinf.utils.io)
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Defaults to PIL's own decompression bomb warning threshold (~89 MP)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "89478485"))
+IMAGE_MAX_DECODE_BYTES = int(
+    os.getenv("IMAGE_MAX_DECODE_BYTES", str(256 * 1024 * 1024))
+)
+
+# Metadata-only jobs read the first METADATA_READ_BYTES of each file, doubling
+# the read until the EXIF block is complete, up to METADATA_MAX_READ_BYTES
+METADATA_READ_BYTES = int(os.getenv("METADATA_READ_BYTES", str(64 * 1024)))
+METADATA_MAX_READ_BYTES = int(
+    os.getenv("METADATA_MAX_READ_BYTES", str(4 * 1024 * 1024))
+)
@@ -1,24 +1,158 @@
+import json
+import math
 import os
+from io import BytesIO
+from typing import Optional
+
 from PIL import Image
 from tapipy.tapis import Tapis
 
-from .config import CACHE_DIR
-from .metadata import extract_image_metadata
+from imageinf.inference.models import ImageMetadata
+
+from .config import (
+    CACHE_DIR,
+    IMAGE_MAX_BYTES,
+    IMAGE_MAX_DECODE_BYTES,
+    IMAGE_MAX_PIXELS,
+    METADATA_MAX_READ_BYTES,
+    METADATA_READ_BYTES,
+)
+from .metadata import extract_image_metadata, jpeg_header_length
+from .tapis_listing import RemoteFileStat
+
+# Memory per decoded pixel, assuming 4 bands (RGBA, or RGB plus conversion)
+BYTES_PER_DECODED_PIXEL = 4
 
 
-def get_image_file(tapis: Tapis, system: str, path: str) -> Image.Image:
+class ImageTooLargeError(ValueError):
+    """An image exceeds the configured size limits; reported for that file
+    instead of failing the job."""
+
+
+def get_image_file(
+    tapis: Tapis, system: str, path: str, remote_stat: Optional[RemoteFileStat] = None
+) -> Image.Image:
     """
     Download (and cache) an image from Tapis, and return image + metadata.
+
+    Cached copies are stamped with the remote size/lastModified they were
+    downloaded at. When `remote_stat` (from a Tapis listing) is given, a
+    cached copy whose stamp differs is downloaded again; without it, any
+    cached copy is used as is.
+
+    Raises `ImageTooLargeError` for files over IMAGE_MAX_BYTES or
+    IMAGE_MAX_PIXELS (checked from the listing and the image header, before
+    anything is decoded). JPEGs whose decoded size would exceed
+    IMAGE_MAX_DECODE_BYTES are decoded at reduced resolution instead; other
+    formats over it are rejected.
     """
+    if remote_stat is not None and remote_stat.size > IMAGE_MAX_BYTES:
+        raise ImageTooLargeError(
+            f"{path} is {remote_stat.size} bytes (limit {IMAGE_MAX_BYTES})"
+        )
+
     local_path = os.path.join(CACHE_DIR, system.strip("/"), path.strip("/"))
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
+    if (
+        remote_stat is not None
+        and os.path.exists(local_path)
+        and _read_stamp(local_path) != remote_stat
+    ):
+        os.remove(local_path)
+
     if not os.path.exists(local_path):
         file_content = tapis.files.getContents(systemId=system, path=path)
         with open(local_path, "wb") as f:
             f.write(file_content)
+        if remote_stat is not None:
+            _write_stamp(local_path, remote_stat)
+        elif os.path.exists(_stamp_path(local_path)):
+            os.remove(_stamp_path(local_path))
 
-    image = Image.open(local_path)
+    size = os.path.getsize(local_path)
+    if size > IMAGE_MAX_BYTES:
+        raise ImageTooLargeError(f"{path} is {size} bytes (limit {IMAGE_MAX_BYTES})")
+    try:
+        image = Image.open(local_path)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(f"{path}: {e}")
+    image = _guard_decode_size(image, path)
     metadata = extract_image_metadata(local_path)
 
     return image, metadata
+
+
+def get_image_metadata(
+    tapis: Tapis, system: str, path: str, remote_stat: Optional[RemoteFileStat] = None
+) -> Optional[ImageMetadata]:
+    """EXIF metadata of a remote image, read from its leading bytes only.
+
+    Fetches METADATA_READ_BYTES with a ranged read and doubles the read until
+    the JPEG headers (which hold the EXIF block) are complete, the file ends
+    or METADATA_MAX_READ_BYTES is reached. Other formats are read up to that
+    limit. Nothing is cached.
+    """
+    size = remote_stat.size if remote_stat is not None else None
+    data = b""
+    request = METADATA_READ_BYTES
+    while True:
+        if size is not None:
+            request = min(request, size - len(data))
+            if request <= 0:
+                break
+        chunk = tapis.files.getContents(
+            systemId=system,
+            path=path,
+            _tapis_headers={"range": f"range={len(data)},{len(data) + request - 1}"},
+        )
+        data += chunk
+        if (
+            len(chunk) < request
+            or len(data) >= METADATA_MAX_READ_BYTES
+            or (data.startswith(b"\xff\xd8") and jpeg_header_length(data))
+        ):
+            break
+        request = len(data)
+    return extract_image_metadata(BytesIO(data))
+
+
+def _guard_decode_size(image: Image.Image, path: str) -> Image.Image:
+    """Check the header dimensions of a lazily opened image and, if needed,
+    switch a JPEG to reduced-resolution (draft) decoding."""
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError(
+            f"{path} is {width}x{height} pixels (limit {IMAGE_MAX_PIXELS})"
+        )
+
+    max_pixels = IMAGE_MAX_DECODE_BYTES // BYTES_PER_DECODED_PIXEL
+    if width * height > max_pixels:
+        factor = math.sqrt(width * height / max_pixels)
+        # Only JPEG implements draft (down to 1/8 scale)
+        image.draft("RGB", (int(width / factor), int(height / factor)))
+        if image.size[0] * image.size[1] > max_pixels:
+            raise ImageTooLargeError(
+                f"{path} ({width}x{height}) cannot be decoded within "
+                f"{IMAGE_MAX_DECODE_BYTES} bytes"
+            )
+        # Lets tiled inference map tiles back to original coordinates
+        image.info["original_size"] = (width, height)
+    return image
+
+
+def _stamp_path(local_path: str) -> str:
+    return local_path + ".stamp.json"
+
+
+def _read_stamp(local_path: str) -> Optional[RemoteFileStat]:
+    try:
+        with open(_stamp_path(local_path)) as f:
+            return RemoteFileStat(**json.load(f))
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+
+
+def _write_stamp(local_path: str, remote_stat: RemoteFileStat):
+    with open(_stamp_path(local_path), "w") as f:
+        json.dump(remote_stat._asdict(), f)
@@ -0,0 +1,210 @@
+import io
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from imageinf.utils.io import ImageTooLargeError, get_image_file, get_image_metadata
+from imageinf.utils import tapis_listing
+from imageinf.utils.tapis_listing import RemoteFileStat, stat_remote_files
+
+
+def _listing_entry(name, size, last_modified):
+    return SimpleNamespace(
+        name=name, size=size, lastModified=last_modified, type="file"
+    )
+
+
+def test_cached_image_is_reused_while_remote_is_unchanged(
+    mock_photo_file_with_location,
+):
+    tapis = MagicMock()
+    tapis.files.getContents.return_value = mock_photo_file_with_location
+    stat = RemoteFileStat(size=100, last_modified="2024-01-01T00:00:00Z")
+
+    get_image_file(tapis, "system", "/dir/a.jpg", remote_stat=stat)
+    get_image_file(tapis, "system", "/dir/a.jpg", remote_stat=stat)
+
+    assert tapis.files.getContents.call_count == 1
+
+
+def test_cached_image_is_refetched_when_remote_changes(
+    mock_photo_file_with_location,
+):
+    tapis = MagicMock()
+    tapis.files.getContents.return_value = mock_photo_file_with_location
+
+    get_image_file(
+        tapis,
+        "system",
+        "/dir/a.jpg",
+        remote_stat=RemoteFileStat(size=100, last_modified="2024-01-01T00:00:00Z"),
+    )
+    get_image_file(
+        tapis,
+        "system",
+        "/dir/a.jpg",
+        remote_stat=RemoteFileStat(size=120, last_modified="2024-02-01T00:00:00Z"),
+    )
+
+    assert tapis.files.getContents.call_count == 2
+
+
+def test_stat_remote_files_lists_each_directory_once(monkeypatch):
+    monkeypatch.setattr(tapis_listing, "STAT_PER_FILE_MAX", 1)
+    tapis = MagicMock()
+    tapis.files.listFiles.side_effect = lambda systemId, path, limit, offset: {
+        "/dir": [
+            _listing_entry("a.jpg", 1, "t1"),
+            _listing_entry("b.jpg", 2, "t2"),
+            _listing_entry("c.jpg", 3, "t3"),
+        ],
+        "/other": [_listing_entry("d.jpg", 4, "t4")],
+    }[path]
+
+    stats = stat_remote_files(
+        tapis,
+        [
+            ("system", "/dir/a.jpg"),
+            ("system", "/dir/b.jpg"),
+            ("system", "/other/d.jpg"),
+            ("system", "/other/missing.jpg"),
+        ],
+    )
+
+    assert tapis.files.listFiles.call_count == 2
+    assert stats == {
+        ("system", "/dir/a.jpg"): RemoteFileStat(1, "t1"),
+        ("system", "/dir/b.jpg"): RemoteFileStat(2, "t2"),
+        ("system", "/other/d.jpg"): RemoteFileStat(4, "t4"),
+    }
+
+
+def test_stat_remote_files_stats_a_few_files_one_by_one():
+    from tapipy.errors import NotFoundError
+
+    def list_files(systemId, path, limit, offset=0):
+        if path == "/dir/missing.jpg":
+            raise NotFoundError()
+        return [_listing_entry(path.rsplit("/", 1)[1], 1, "t1")]
+
+    tapis = MagicMock()
+    tapis.files.listFiles.side_effect = list_files
+
+    stats = stat_remote_files(
+        tapis, [("system", "/dir/a.jpg"), ("system", "/dir/missing.jpg")]
+    )
+
+    assert stats == {("system", "/dir/a.jpg"): RemoteFileStat(1, "t1")}
+    assert sorted(c.kwargs["path"] for c in tapis.files.listFiles.call_args_list) == [
+        "/dir/a.jpg",
+        "/dir/missing.jpg",
+    ]
+
+
+def test_iter_directory_files_applies_globs_and_depth():
+    from imageinf.utils.tapis_listing import iter_directory_files
+
+    tree = {
+        "/project": [
+            _listing_entry("a.JPG", 1, "t"),
+            _listing_entry("notes.txt", 1, "t"),
+            SimpleNamespace(name="day1", type="dir", size=0, lastModified="t"),
+        ],
+        "/project/day1": [
+            _listing_entry("b.jpg", 1, "t"),
+            _listing_entry("b_thumb.jpg", 1, "t"),
+            SimpleNamespace(name="deeper", type="dir", size=0, lastModified="t"),
+        ],
+    }
+    tapis = MagicMock()
+    tapis.files.listFiles.side_effect = lambda systemId, path, limit, offset: tree[path]
+
+    paths = [
+        path
+        for path, _ in iter_directory_files(
+            tapis,
+            "system",
+            "/project/",
+            include=["*.jpg"],
+            exclude=["*_thumb.jpg"],
+            max_depth=1,
+        )
+    ]
+
+    assert paths == ["/project/a.JPG", "/project/day1/b.jpg"]
+
+
+def _encoded(size, format):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "gray").save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_oversized_remote_file_is_rejected_before_download(monkeypatch):
+    monkeypatch.setattr("imageinf.utils.io.IMAGE_MAX_BYTES", 1000)
+    tapis = MagicMock()
+    stat = RemoteFileStat(size=5000, last_modified="2024-01-01T00:00:00Z")
+
+    with pytest.raises(ImageTooLargeError):
+        get_image_file(tapis, "system", "/dir/big.jpg", remote_stat=stat)
+
+    tapis.files.getContents.assert_not_called()
+
+
+def test_image_over_pixel_limit_is_rejected_from_its_header(monkeypatch):
+    monkeypatch.setattr("imageinf.utils.io.IMAGE_MAX_PIXELS", 100 * 100)
+    tapis = MagicMock()
+    tapis.files.getContents.return_value = _encoded((200, 100), "PNG")
+
+    with pytest.raises(ImageTooLargeError, match="200x100"):
+        get_image_file(tapis, "system", "/dir/bomb.png")
+
+
+def test_jpeg_over_decode_budget_is_decoded_at_reduced_resolution(monkeypatch):
+    monkeypatch.setattr("imageinf.utils.io.IMAGE_MAX_DECODE_BYTES", 400 * 300 * 4)
+    tapis = MagicMock()
+    tapis.files.getContents.return_value = _encoded((1600, 1200), "JPEG")
+
+    image, _ = get_image_file(tapis, "system", "/dir/large.jpg")
+
+    assert image.size == (400, 300)
+    assert image.info["original_size"] == (1600, 1200)
+
+    tapis.files.getContents.return_value = _encoded((1600, 1200), "PNG")
+    with pytest.raises(ImageTooLargeError, match="cannot be decoded"):
+        get_image_file(tapis, "system", "/dir/large.png")
+
+
+def test_metadata_is_read_from_the_leading_bytes_only(
+    mock_tapis_files_with_location, monkeypatch
+):
+    monkeypatch.setattr("imageinf.utils.io.METADATA_READ_BYTES", 1024)
+    tapis = mock_tapis_files_with_location
+
+    metadata = get_image_metadata(tapis, "system", "/dir/a.jpg")
+
+    assert metadata.latitude is not None
+    assert metadata.camera_make == "LGE"
+    ranges = [
+        call.kwargs["_tapis_headers"]["range"]
+        for call in tapis.files.getContents.call_args_list
+    ]
+    # 1 KiB, then doubled until the EXIF block (~10 KiB) is complete
+    assert ranges == [
+        "range=0,1023",
+        "range=1024,2047",
+        "range=2048,4095",
+        "range=4096,8191",
+        "range=8192,16383",
+    ]
+
+
+def test_limits_are_no_looser_than_pils_own():
+    from PIL import Image
+
+    from imageinf.utils import config
+
+    assert Image.MAX_IMAGE_PIXELS == 89478485  # left at PIL's default
+    assert config.IMAGE_MAX_PIXELS <= Image.MAX_IMAGE_PIXELS
@@ -2,17 +2,21 @@ import logging
 
 from PIL import Image
 from PIL.ExifTags import TAGS, GPSTAGS
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple, Union
 from datetime import datetime
 from imageinf.inference.models import ImageMetadata
 
 logger = logging.getLogger(__name__)
 
 
-def extract_image_metadata(image_path: str) -> Optional[ImageMetadata]:
-    """Extract metadata from image EXIF data using PIL."""
+def extract_image_metadata(source: Union[str, BinaryIO]) -> Optional[ImageMetadata]:
+    """Extract metadata from image EXIF data using PIL.
+
+    `source` is a path or a file object; for JPEGs the leading bytes up to
+    `jpeg_header_length` are enough.
+    """
     try:
-        img = Image.open(image_path)
+        img = Image.open(source)
         exif = img._getexif()
 
         if not exif:
@@ -64,6 +68,29 @@ def extract_image_metadata(image_path: str) -> Optional[ImageMetadata]:
         return None
 
 
+def jpeg_header_length(data: bytes) -> Optional[int]:
+    """Length of the JPEG headers in `data` (the segments up to and including
+    start of scan, EXIF among them), or None if `data` ends before them."""
+    offset = 2  # SOI
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # no length field
+            offset += 2
+            continue
+        length_at = offset + 2
+        length = int.from_bytes(data[length_at : length_at + 2], "big")  # noqa: E203
+        end = length_at + length
+        if marker == 0xDA:
+            return end if end <= len(data) else None
+        offset = end
+    return None
+
+
 def _extract_gps_from_pil(gps_info: dict) -> Tuple[Optional[float], Optional[float]]:
     """Extract GPS coordinates from PIL GPSInfo dict."""
     try:
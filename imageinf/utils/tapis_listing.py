@@ -0,0 +1,131 @@
+import fnmatch
+import logging
+import os
+import posixpath
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from tapipy.errors import NotFoundError
+from tapipy.tapis import Tapis
+
+logger = logging.getLogger(__name__)
+
+LISTING_PAGE_SIZE = 1000
+
+# Up to this many files wanted from one directory are looked up one request
+# each; more are found by listing the directory (a page holds
+# LISTING_PAGE_SIZE entries, so a listing only pays off for a larger share)
+STAT_PER_FILE_MAX = int(os.getenv("TAPIS_STAT_PER_FILE_MAX", "20"))
+
+
+class RemoteFileStat(NamedTuple):
+    """Size and modification time of a file as reported by a Tapis listing."""
+
+    size: int
+    last_modified: str
+
+
+def list_directory(tapis: Tapis, system: str, path: str) -> Iterator:
+    """Yield the entries of a Tapis directory, one listing page at a time."""
+    offset = 0
+    while True:
+        page = list(
+            tapis.files.listFiles(
+                systemId=system, path=path, limit=LISTING_PAGE_SIZE, offset=offset
+            )
+        )
+        yield from page
+        if len(page) < LISTING_PAGE_SIZE:
+            return
+        offset += LISTING_PAGE_SIZE
+
+
+def stat_from_listing(entry) -> RemoteFileStat:
+    return RemoteFileStat(size=int(entry.size), last_modified=str(entry.lastModified))
+
+
+def stat_remote_files(
+    tapis: Tapis, files: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], RemoteFileStat]:
+    """Look up size/lastModified for (system, path) pairs.
+
+    A few files from a directory are looked up one by one; for more than
+    STAT_PER_FILE_MAX, the directory is listed (paginated) until all of them
+    have been seen. Files that do not exist are left out.
+    """
+    wanted = defaultdict(set)
+    for system, path in files:
+        wanted[(system, posixpath.dirname(path))].add(posixpath.basename(path))
+
+    stats = {}
+    for (system, directory), names in wanted.items():
+        if len(names) <= STAT_PER_FILE_MAX:
+            for name in names:
+                path = posixpath.join(directory, name)
+                stat = stat_remote_file(tapis, system, path)
+                if stat is not None:
+                    stats[(system, path)] = stat
+            continue
+
+        remaining = set(names)
+        for entry in list_directory(tapis, system, directory or "/"):
+            if entry.name in remaining:
+                stats[(system, posixpath.join(directory, entry.name))] = (
+                    stat_from_listing(entry)
+                )
+                remaining.discard(entry.name)
+                if not remaining:
+                    break
+    return stats
+
+
+def stat_remote_file(tapis: Tapis, system: str, path: str) -> Optional[RemoteFileStat]:
+    """Size/lastModified of one file (a listing of the file itself), or None
+    if it does not exist."""
+    try:
+        entries = tapis.files.listFiles(systemId=system, path=path, limit=1)
+    except NotFoundError:
+        return None
+    for entry in entries:
+        if entry.type != "dir":
+            return stat_from_listing(entry)
+    return None
+
+
+def iter_directory_files(
+    tapis: Tapis,
+    system: str,
+    root: str,
+    include: List[str],
+    exclude: List[str],
+    max_depth: int = 0,
+) -> Iterator[Tuple[str, RemoteFileStat]]:
+    """Yield (path, stat) for files under `root` matching the glob patterns.
+
+    Patterns without a "/" match the file name, others match the path relative
+    to `root`; matching is case-insensitive. `max_depth` is how many levels of
+    subdirectories to descend (0 = only `root`). Listing pages are fetched
+    lazily, so callers can start processing before the walk finishes.
+    """
+    root = "/" + root.strip("/")
+    pending = deque([(root, 0)])
+    while pending:
+        directory, depth = pending.popleft()
+        for entry in list_directory(tapis, system, directory):
+            path = posixpath.join(directory, entry.name)
+            if entry.type == "dir":
+                if depth < max_depth:
+                    pending.append((path, depth + 1))
+                continue
+            relative = posixpath.relpath(path, root)
+            if _matches(relative, include) and not _matches(relative, exclude):
+                yield path, stat_from_listing(entry)
+
+
+def _matches(relative_path: str, patterns: List[str]) -> bool:
+    relative_path = relative_path.lower()
+    name = posixpath.basename(relative_path)
+    return any(
+        fnmatch.fnmatchcase(relative_path if "/" in p else name, p.lower())
+        for p in patterns
+    )
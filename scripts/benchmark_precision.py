@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark fp32 vs bfloat16 inference for a model on local images.
+
+Reports throughput (images/s) for each precision and the score drift of bf16
+against fp32 (top-1 agreement and the largest per-label score difference).
+
+    python scripts/benchmark_precision.py google/vit-large-patch16-224 photos/*.jpg
+"""
+
+import argparse
+import time
+
+import torch
+from PIL import Image
+
+from imageinf.inference.precision import PRECISIONS, cpu_supports_bf16
+from imageinf.inference.registry import MODEL_REGISTRY
+
+
+def run(runner, images, precision, repeat):
+    runner.precision = precision
+    if hasattr(runner, "_precompute_text_features"):
+        # CLIP text features are computed in the runner's precision
+        runner._precompute_text_features()
+
+    runner.classify_image(images[0])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predictions = [runner.classify_image(image) for image in images]
+    elapsed = time.perf_counter() - start
+    return predictions, len(images) * repeat / elapsed
+
+
+def drift(reference, other):
+    """(top-1 agreement, max abs score difference) of `other` vs `reference`."""
+    agree = 0
+    max_diff = 0.0
+    for ref, pred in zip(reference, other):
+        ref_scores = {p.label: p.score for p in ref}
+        scores = {p.label: p.score for p in pred}
+        if ref and pred and ref[0].label == pred[0].label:
+            agree += 1
+        for label in ref_scores.keys() | scores.keys():
+            diff = abs(ref_scores.get(label, 0.0) - scores.get(label, 0.0))
+            max_diff = max(max_diff, diff)
+    return agree / len(reference), max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model", choices=list(MODEL_REGISTRY))
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"CPU bf16 support: {cpu_supports_bf16()}")
+    print(f"torch threads: {torch.get_num_threads()}")
+
+    runner = MODEL_REGISTRY[args.model](args.model)
+    images = [Image.open(path).convert("RGB") for path in args.images]
+
+    results = {}
+    for precision in PRECISIONS:
+        predictions, throughput = run(runner, images, precision, args.repeat)
+        results[precision] = predictions
+        print(f"{precision}: {throughput:.2f} images/s")
+
+    agreement, max_diff = drift(results["fp32"], results["bf16"])
+    print(
+        f"bf16 vs fp32: top-1 agreement {agreement:.1%}, max score diff {max_diff:.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Load test a running imageinf stack (API + Celery workers).
+
+Replays a traffic mix from a JSON lines file against the API and reports, per
+traffic entry, throughput, latency percentiles and error rates. Each line of
+the traffic file is one kind of request:
+
+    {"name": "sync", "weight": 60, "method": "POST",
+     "path": "/inference/jobs/sync", "files": [1, 5],
+     "body": {"model": "google/vit-base-patch16-224"}}
+
+- `weight`: relative frequency in the mix
+- `files`: [min, max] images sampled from --images into `body.files`
+- `poll`: for async submissions, poll `/inference/jobs/{task_id}` until the job
+  finishes (reported as "<name>:poll" and "<name>:job" for the whole job)
+- `at`: optional offset in seconds; if every line has one, the file is replayed
+  with its recorded timing (scaled by --speed) instead of sampled at --rate
+
+Requests are sent open loop (Poisson arrivals at --rate/s), so latency grows
+instead of the offered load shrinking when the stack saturates. Pair with the
+Tapis stand-in (python -m imageinf.fixtures.tapis_server) to run offline:
+
+    python scripts/loadtest.py --base-url http://localhost:8080/api \\
+        --token "$TOKEN" --images /img_0.jpg,/img_1.jpg --rate 5 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+DEFAULT_TRAFFIC = "scripts/loadtest_traffic.jsonl"
+TERMINAL_STATUSES = ("SUCCESS", "FAILURE", "CANCELLED")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        # First start and last completion per name, for throughput
+        self.windows = {}
+
+    def record(self, name, latency, status_code=None, error=False):
+        self.latencies[name].append(latency)
+        end = time.perf_counter()
+        first, last = self.windows.get(name, (end - latency, end))
+        self.windows[name] = (min(first, end - latency), max(last, end))
+        if status_code == 429:
+            self.throttled[name] += 1
+        elif error or status_code is None or status_code >= 400:
+            self.errors[name] += 1
+
+    def report(self):
+        rows = []
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            count = len(latencies)
+            first, last = self.windows[name]
+            rows.append(
+                {
+                    "name": name,
+                    "count": count,
+                    # Over this name's own submit-to-complete window, so the
+                    # tail of other requests (e.g. job polling) does not skew it
+                    "throughput": count / max(last - first, 1e-9),
+                    "error_rate": self.errors[name] / count,
+                    "throttled_rate": self.throttled[name] / count,
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1],
+                }
+            )
+        return rows
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def load_traffic(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_body(entry, images, system_id, rng):
+    body = dict(entry.get("body") or {})
+    if "files" in entry:
+        low, high = entry["files"]
+        count = rng.randint(low, high)
+        body["files"] = [
+            {"systemId": system_id, "path": rng.choice(images)} for _ in range(count)
+        ]
+    return body
+
+
+async def send(client, entry, args, stats, rng):
+    name = entry["name"]
+    # Jobs are polled as the user who submitted them
+    token = rng.choice(args.tokens)
+    start = time.perf_counter()
+    try:
+        response = await client.request(
+            entry.get("method", "GET"),
+            entry["path"],
+            json=(
+                build_body(entry, args.images, args.system_id, rng)
+                if entry.get("method", "GET") != "GET"
+                else None
+            ),
+            headers={"X-Tapis-Token": token},
+        )
+    except httpx.HTTPError:
+        stats.record(name, time.perf_counter() - start, error=True)
+        return
+    stats.record(name, time.perf_counter() - start, response.status_code)
+
+    if entry.get("poll") and response.status_code < 400:
+        await poll_job(
+            client, name, response.json()["task_id"], token, start, args, stats
+        )
+
+
+async def poll_job(client, name, task_id, token, submitted, args, stats):
+    headers = {"X-Tapis-Token": token}
+    while time.perf_counter() - submitted < args.job_timeout:
+        await asyncio.sleep(args.poll_interval)
+        start = time.perf_counter()
+        try:
+            response = await client.get(
+                f"/inference/jobs/{task_id}", params={"limit": 1}, headers=headers
+            )
+        except httpx.HTTPError:
+            stats.record(f"{name}:poll", time.perf_counter() - start, error=True)
+            continue
+        stats.record(f"{name}:poll", time.perf_counter() - start, response.status_code)
+        status = response.json().get("status") if response.status_code < 400 else None
+        if status in TERMINAL_STATUSES:
+            stats.record(
+                f"{name}:job",
+                time.perf_counter() - submitted,
+                error=status == "FAILURE",
+            )
+            return
+    stats.record(f"{name}:job", time.perf_counter() - submitted, error=True)
+
+
+def schedule(traffic, args, rng):
+    """Yield (offset seconds, entry) pairs for the run."""
+    if all("at" in entry for entry in traffic):
+        for entry in sorted(traffic, key=lambda e: e["at"]):
+            yield entry["at"] / args.speed, entry
+        return
+
+    weights = [entry.get("weight", 1) for entry in traffic]
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(args.rate)
+        if offset >= args.duration:
+            return
+        yield offset, rng.choices(traffic, weights=weights)[0]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    traffic = load_traffic(args.traffic)
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.max_connections)
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.request_timeout, limits=limits
+    ) as client:
+        start = time.perf_counter()
+        tasks = []
+        for offset, entry in schedule(traffic, args, rng):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, entry, args, stats, rng)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return stats.report(), elapsed
+
+
+def print_report(rows, elapsed):
+    print(f"Elapsed: {elapsed:.1f}s")
+    header = (
+        f"{'name':<24}{'count':>7}{'req/s':>8}{'err%':>7}{'429%':>7}"
+        f"{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['name']:<24}{row['count']:>7}{row['throughput']:>8.2f}"
+            f"{row['error_rate']:>7.1%}{row['throttled_rate']:>7.1%}"
+            f"{row['p50']:>8.3f}{row['p95']:>8.3f}{row['p99']:>8.3f}{row['max']:>8.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8080/api")
+    parser.add_argument("--token", required=True, help="Comma separated tokens")
+    parser.add_argument("--traffic", default=DEFAULT_TRAFFIC)
+    parser.add_argument("--images", default="", help="Comma separated image paths")
+    parser.add_argument("--system-id", default="designsafe.storage.default")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests/s")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--job-timeout", type=float, default=600.0)
+    parser.add_argument("--request-timeout", type=float, default=180.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-output", help="Also write the report as JSON here")
+    args = parser.parse_args()
+    args.tokens = args.token.split(",")
+    args.images = [p for p in args.images.split(",") if p] or ["/image.jpg"]
+
+    rows, elapsed = asyncio.run(run(args))
+    print_report(rows, elapsed)
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump({"elapsed": elapsed, "endpoints": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()